@@ -0,0 +1,25 @@
+# (C) 2011 copyright by Peter Bouda
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for pyannotation. The module generator writes synthetic
+corpus files of a configurable size, the module run times the main
+operations of the library on those files and prints the results as
+JSON:
+
+  $ PYTHONPATH=src python -m benchmarks.run --scales 1 10 100 --output results.json
+
+The module scaling fails if the running time of an operation grows
+faster than linear with the size of the corpus:
+
+  $ PYTHONPATH=src python -m benchmarks.scaling
+
+The module importtime checks the import time of the corpus reader:
+
+  $ PYTHONPATH=src python -m benchmarks.importtime
+
+The module checks compares the results of the optimized operations with
+the expected ones:
+
+  $ PYTHONPATH=src python -m benchmarks.checks
+"""
+__all__ = [ 'generator', 'run', 'scaling', 'importtime', 'checks' ]
@@ -0,0 +1,200 @@
+# (C) 2011 copyright by Peter Bouda
+# -*- coding: utf-8 -*-
+"""
+Checks the results of operations that were rewritten for speed. Each
+check runs on a generated file and prints whether the result is the
+expected one:
+
+  $ PYTHONPATH=src python -m benchmarks.checks
+
+The script exits with status 1 if one of the checks fails.
+"""
+
+import io
+import os
+import re
+import sys
+import bz2
+import zlib
+import shutil
+import argparse
+import tempfile
+
+import pyannotation.data
+import pyannotation.compression
+import pyannotation.elan.data
+
+from benchmarks.generator import CorpusGenerator
+from benchmarks.run import loadReader
+
+
+def checkEafXmlRoundTrip(directory):
+    """Edits an utterance of a tree, writes the tree with getAsEafXml()
+    and reads the written file again: the edits must be in it."""
+    filepath = os.path.join(directory, "roundtrip.eaf")
+    CorpusGenerator().writeEaf(filepath, 20)
+    tree = loadReader(filepath, pyannotation.data.EAF).annotationtrees[0][1]
+    utterance = tree.getTree()[0]
+    tree.setUtterance(utterance[0], u"edited utterance")
+    tree.setTranslation(utterance[3][0][0], u"edited translation")
+    tree.setIlElementForWordId(utterance[2][0][0], tree.ilElementForString(u"editedword ed-ited X-Y"))
+    xml = tree.getAsEafXml("A-utterance", "A-words", "A-morpheme", "A-gloss", "A-translation")
+
+    written = os.path.join(directory, "roundtrip-written.eaf")
+    f = open(written, "wb")
+    try:
+        f.write(xml)
+    finally:
+        f.close()
+    tree2 = loadReader(written, pyannotation.data.EAF).annotationtrees[0][1]
+    utterances = [ u for u in tree2.getTree() if u[0] == utterance[0] ]
+    if len(utterances) != 1:
+        return False
+    utterance2 = utterances[0]
+    word = utterance2[2][0]
+    return utterance2[1] == u"edited utterance" \
+        and utterance2[3][0][1] == u"edited translation" \
+        and word[1] == u"editedword" \
+        and [ m[1] for m in word[2] ] == [ u"ed", u"ited" ] \
+        and [ g[1] for m in word[2] for g in m[2] ] == [ u"X", u"Y" ]
+
+def gzipCompress(data):
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+def checkConcatenatedStreams(directory):
+    """Decompresses concatenated streams: several small ones that end in
+    the same chunk and larger ones that cross the chunks."""
+    compressors = [ gzipCompress, bz2.compress ]
+    if pyannotation.compression.lzma != None:
+        compressors.append(pyannotation.compression.lzma.compress)
+    chunk = pyannotation.compression.CHUNK_SIZE
+    members = [
+        [ b"aaa", b"bbb", b"ccc" ],
+        [ b"a" * chunk, b"b", b"c" * (2 * chunk + 1), b"d", b"e" ],
+        [ os.urandom(chunk - 10), b"x", os.urandom(chunk + 10) ]
+    ]
+    for compress in compressors:
+        for parts in members:
+            data = b"".join([ compress(part) for part in parts ])
+            f = pyannotation.compression.openAnnotationFile(io.BytesIO(data))
+            try:
+                if f.read() != b"".join(parts):
+                    return False
+            finally:
+                f.close()
+    return True
+
+def timeOrderEaf(timeslots):
+    slots = []
+    for tsId, tsValue in timeslots:
+        if tsValue == None:
+            slots.append('<TIME_SLOT TIME_SLOT_ID="%s"/>' % tsId)
+        else:
+            slots.append('<TIME_SLOT TIME_SLOT_ID="%s" TIME_VALUE="%i"/>' % (tsId, tsValue))
+    xml = '<ANNOTATION_DOCUMENT><HEADER/><TIME_ORDER>%s</TIME_ORDER></ANNOTATION_DOCUMENT>' % "".join(slots)
+    return pyannotation.elan.data.Eaf(io.BytesIO(xml.encode("utf-8")))
+
+def checkInsertTimeSlots(directory):
+    """Inserts time slots into time orders with and without time values
+    at the end; the new slots must be in the order of their values."""
+    cases = [
+        ([], [ ("tsX", 10) ], [ "tsX" ]),
+        ([ ("ts1", 0), ("ts2", 20) ], [ ("tsX", 30), ("tsY", 25) ], [ "ts1", "ts2", "tsY", "tsX" ]),
+        ([ ("ts1", 0), ("ts2", 20) ], [ ("tsX", 10) ], [ "ts1", "tsX", "ts2" ]),
+        ([ ("ts1", 0), ("ts3", 20), ("ts2", None) ], [ ("tsX", 10) ], [ "ts1", "tsX", "ts3", "ts2" ]),
+        ([ ("ts1", 0), ("ts2", None) ], [ ("tsX", 10) ], [ "ts1", "ts2", "tsX" ])
+    ]
+    for timeslots, newTimeslots, expected in cases:
+        eaf = timeOrderEaf(timeslots)
+        eaf.insertTimeSlots(newTimeslots)
+        ids = [ ts.attrib['TIME_SLOT_ID'] for ts in eaf.getTimeOrderTree() ]
+        if ids != expected:
+            return False
+    return True
+
+def checkTruncatedStreams(directory):
+    """Reads compressed streams that are cut off: they must raise
+    EOFError instead of returning part of the data."""
+    compressors = [ gzipCompress, bz2.compress ]
+    if pyannotation.compression.lzma != None:
+        compressors.append(pyannotation.compression.lzma.compress)
+    data = os.urandom(pyannotation.compression.CHUNK_SIZE) + b"x" * (4 * pyannotation.compression.CHUNK_SIZE)
+    for compress in compressors:
+        compressed = compress(data)
+        for end in (len(compressed) // 2, len(compressed) - 1):
+            f = pyannotation.compression.openAnnotationFile(io.BytesIO(compressed[:end]))
+            try:
+                f.read()
+                return False
+            except EOFError:
+                pass
+            finally:
+                f.close()
+    return True
+
+def checkEafBackends(directory):
+    """Loads the same .eaf file with all backends; the trees must be the
+    same. Annotation values of only whitespace are empty in the pythonic
+    and streaming backends, they are checked against each other."""
+    filepath = os.path.join(directory, "backends.eaf")
+    CorpusGenerator().writeEaf(filepath, 20)
+    trees = [ loadReader(filepath, pyannotation.data.EAF, backend).annotationtrees[0][1].getTree()
+              for backend in ("lxml", "pythonic", "streaming") ]
+    if trees[0] != trees[1] or trees[1] != trees[2]:
+        return False
+
+    f = open(filepath, "rb")
+    data = f.read().decode("utf-8")
+    f.close()
+    values = [ u"   ", u"\n\t", u" a&amp;b ", u"a &lt; b" ]
+    count = [ 0 ]
+    def replaceValue(match):
+        count[0] = count[0] + 1
+        if count[0] % 7 == 0:
+            return u"<ANNOTATION_VALUE>%s</ANNOTATION_VALUE>" % values[(count[0] // 7) % len(values)]
+        return match.group(0)
+    data = re.sub(u"<ANNOTATION_VALUE>[^<]*</ANNOTATION_VALUE>", replaceValue, data)
+    filepath = os.path.join(directory, "backends-whitespace.eaf")
+    f = open(filepath, "wb")
+    f.write(data.encode("utf-8"))
+    f.close()
+    trees = [ loadReader(filepath, pyannotation.data.EAF, backend).annotationtrees[0][1].getTree()
+              for backend in ("pythonic", "streaming") ]
+    return trees[0] == trees[1]
+
+CHECKS = [
+    ("AnnotationTree.getAsEafXml", checkEafXmlRoundTrip),
+    ("compression.openAnnotationFile", checkConcatenatedStreams),
+    ("compression.openAnnotationFile.truncated", checkTruncatedStreams),
+    ("Eaf.insertTimeSlots", checkInsertTimeSlots),
+    ("addFile.eaf.backends", checkEafBackends),
+]
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Check the results of the optimized operations of pyannotation.")
+    parser.add_argument("--only", nargs = "+", help = "run only checks whose name contains one of these")
+    args = parser.parse_args(argv)
+
+    failed = []
+    directory = tempfile.mkdtemp(prefix = "pyannotation-checks-")
+    try:
+        for name, check in CHECKS:
+            if args.only and not [o for o in args.only if o in name]:
+                continue
+            passed = check(directory)
+            sys.stderr.write("%-45s %s\n" % (name, "ok" if passed else "FAILED"))
+            if not passed:
+                failed.append(name)
+    finally:
+        shutil.rmtree(directory)
+
+    if len(failed) > 0:
+        sys.stderr.write("failed checks: %s\n" % ", ".join(failed))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+# (C) 2011 copyright by Peter Bouda
+# -*- coding: utf-8 -*-
+"""
+Generates synthetic, deterministic corpus files for the benchmarks. The
+same seed and size always give the same files. Supported are .eaf files
+(time aligned utterances with symbolic subdivision or time subdivision
+word tiers), .eaf files in the structure of Elan's Toolbox import,
+Toolbox .txt files and Kura .xml files.
+"""
+
+import io
+import random
+from xml.sax.saxutils import escape, quoteattr
+
+SYLLABLES = [ u"ka", u"ti", u"mo", u"re", u"su", u"la", u"ni", u"po", u"vu",
+              u"şe", u"ğa", u"dü", u"kö", u"xa", u"ıs", u"ço" ]
+AFFIX_GLOSSES = [ u"PL", u"1SG", u"2SG", u"3SG", u"PAST", u"DIR", u"LOC",
+                  u"ACC", u"GEN", u"NEG", u"CV", u"ANOM", u"3SG:O", u"3SG:A" ]
+POS_TAGS = [ u"N", u"V", u"ADJ", u"ADV", u"PRO", u"DET" ]
+PARTICIPANTS = [ u"A", u"B" ]
+
+
+class CorpusGenerator(object):
+    """
+    Creates utterances from a fixed random lexicon. Each utterance is a
+    tuple (words, translation, participant), each word is a tuple (pos,
+    morphemes) and each morpheme a tuple (morpheme, list of glosses).
+    A small part of the morphemes is glossed inconsistently, like in
+    real corpora.
+    """
+
+    def __init__(self, seed = 1, lexiconSize = 500, wordsPerUtterance = (3, 9), affixesPerWord = (0, 3)):
+        self.seed = seed
+        self.wordsPerUtterance = wordsPerUtterance
+        self.affixesPerWord = affixesPerWord
+        r = random.Random(seed)
+        self.stems = []
+        for i in range(lexiconSize):
+            stem = u"".join(r.choice(SYLLABLES) for j in range(r.randint(1, 3)))
+            self.stems.append((stem, u"gloss%i" % i, r.choice(POS_TAGS)))
+        self.affixes = []
+        for gloss in AFFIX_GLOSSES:
+            self.affixes.append((r.choice(SYLLABLES), gloss.split(u":")))
+
+    def utterances(self, count):
+        r = random.Random(self.seed + count)
+        for i in range(count):
+            words = []
+            for j in range(r.randint(*self.wordsPerUtterance)):
+                stem, gloss, pos = r.choice(self.stems)
+                if r.random() < 0.02:
+                    gloss = gloss + u"'"
+                morphemes = [ (stem, [gloss]) ]
+                for k in range(r.randint(*self.affixesPerWord)):
+                    affix, glosses = r.choice(self.affixes)
+                    morphemes.append((affix, list(glosses)))
+                words.append((pos, morphemes))
+            translation = u" ".join(m[0][1][0] for (p, m) in words)
+            yield (words, translation, PARTICIPANTS[i % len(PARTICIPANTS)])
+
+    def wordString(self, morphemes):
+        return u"".join(m for (m, g) in morphemes)
+
+    def morphemeString(self, morphemes):
+        return u"-".join(m for (m, g) in morphemes)
+
+    def glossString(self, morphemes):
+        return u"-".join(u":".join(g) for (m, g) in morphemes)
+
+    ########## Elan
+
+    def writeEaf(self, filepath, count, timeAlignedWords = False):
+        """
+        Writes an .eaf file with count utterances. For each participant
+        there is a time aligned utterance tier with word, morpheme, gloss,
+        part of speech and translation tiers. The word tier is a symbolic
+        subdivision of the utterance tier, or a time subdivision if
+        timeAlignedWords is True.
+        """
+        w = EafWriter()
+        for (words, translation, participant) in self.utterances(count):
+            p = participant
+            utteranceId = w.nextAnnotationId()
+            utterance = u" ".join(self.wordString(m) for (pos, m) in words)
+            start = w.nextTimeSlot(len(w.timeslots) * 1000)
+            if timeAlignedWords:
+                bounds = [start]
+                for k in range(len(words) - 1):
+                    bounds.append(w.nextTimeSlot(None))
+            end = w.nextTimeSlot(len(w.timeslots) * 1000)
+            w.addAlignable(p + u"-utterance", utteranceId, start, end, utterance)
+            w.addRef(p + u"-translation", w.nextAnnotationId(), utteranceId, None, translation)
+            prevWord = None
+            for k, (pos, morphemes) in enumerate(words):
+                wordId = w.nextAnnotationId()
+                if timeAlignedWords:
+                    wordEnd = end
+                    if k + 1 < len(bounds):
+                        wordEnd = bounds[k + 1]
+                    w.addAlignable(p + u"-words", wordId, bounds[k], wordEnd, self.wordString(morphemes))
+                else:
+                    w.addRef(p + u"-words", wordId, utteranceId, prevWord, self.wordString(morphemes))
+                prevWord = wordId
+                w.addRef(p + u"-pos", w.nextAnnotationId(), wordId, None, pos)
+                prevMorpheme = None
+                for (morpheme, glosses) in morphemes:
+                    morphemeId = w.nextAnnotationId()
+                    w.addRef(p + u"-morpheme", morphemeId, wordId, prevMorpheme, morpheme)
+                    prevMorpheme = morphemeId
+                    prevGloss = None
+                    for gloss in glosses:
+                        glossId = w.nextAnnotationId()
+                        w.addRef(p + u"-gloss", glossId, morphemeId, prevGloss, gloss)
+                        prevGloss = glossId
+        wordType = u"words"
+        if timeAlignedWords:
+            wordType = u"word"
+        for p in PARTICIPANTS:
+            locale = u"tr"
+            w.addTier(p + u"-utterance", u"utterance", None, locale, p)
+            w.addTier(p + u"-words", wordType, p + u"-utterance", locale, p)
+            w.addTier(p + u"-pos", u"part of speech", p + u"-words", u"en", p)
+            w.addTier(p + u"-morpheme", u"morpheme", p + u"-words", locale, p)
+            w.addTier(p + u"-gloss", u"gloss", p + u"-morpheme", u"en", p)
+            w.addTier(p + u"-translation", u"translation", p + u"-utterance", u"en", p)
+        w.addLinguisticType(u"utterance", None, True)
+        w.addLinguisticType(u"words", u"Symbolic_Subdivision", False)
+        w.addLinguisticType(u"word", u"Time_Subdivision", True)
+        w.addLinguisticType(u"part of speech", u"Symbolic_Association", False)
+        w.addLinguisticType(u"morpheme", u"Symbolic_Subdivision", False)
+        w.addLinguisticType(u"gloss", u"Symbolic_Subdivision", False)
+        w.addLinguisticType(u"translation", u"Symbolic_Association", False)
+        w.write(filepath)
+
+    def writeEafFromToolbox(self, filepath, count):
+        """
+        Writes an .eaf file with count utterances in the tier structure
+        of Elan's Toolbox import: a time aligned "ref" tier with the
+        child tiers "tx", "mo", "gl" and "ft".
+        """
+        w = EafWriter()
+        for i, (words, translation, participant) in enumerate(self.utterances(count)):
+            refId = w.nextAnnotationId()
+            start = w.nextTimeSlot(i * 1000)
+            end = w.nextTimeSlot(i * 1000 + 900)
+            w.addAlignable(u"ref", refId, start, end, u"%05i" % i)
+            w.addRef(u"tx", w.nextAnnotationId(), refId, None, u" ".join(self.wordString(m) for (pos, m) in words))
+            prev = None
+            for (pos, morphemes) in words:
+                moId = w.nextAnnotationId()
+                w.addRef(u"mo", moId, refId, prev, self.morphemeString(morphemes))
+                w.addRef(u"gl", w.nextAnnotationId(), moId, None, self.glossString(morphemes))
+                prev = moId
+            w.addRef(u"ft", w.nextAnnotationId(), refId, None, translation)
+        w.addTier(u"ref", u"ref", None, u"tr", u"A")
+        w.addTier(u"tx", u"tx", u"ref", u"tr", u"A")
+        w.addTier(u"mo", u"mo", u"ref", u"tr", u"A")
+        w.addTier(u"gl", u"gl", u"mo", u"en", u"A")
+        w.addTier(u"ft", u"ft", u"ref", u"en", u"A")
+        w.addLinguisticType(u"ref", None, True)
+        w.addLinguisticType(u"tx", u"Symbolic_Association", False)
+        w.addLinguisticType(u"mo", u"Symbolic_Subdivision", False)
+        w.addLinguisticType(u"gl", u"Symbolic_Association", False)
+        w.addLinguisticType(u"ft", u"Symbolic_Association", False)
+        w.write(filepath)
+
+    ########## Toolbox
+
+    def writeToolbox(self, filepath, count):
+        """
+        Writes a Toolbox .txt file with count records, each with the
+        markers \\ref, \\tx, \\mo, \\gl and \\ft.
+        """
+        f = io.open(filepath, "w", encoding="utf-8")
+        f.write(u"\\_sh v3.0  400  Text\n\n")
+        for i, (words, translation, participant) in enumerate(self.utterances(count)):
+            f.write(u"\\ref %05i\n" % i)
+            f.write(u"\\tx %s\n" % u" ".join(self.wordString(m) for (pos, m) in words))
+            f.write(u"\\mo %s\n" % u" ".join(self.morphemeString(m) for (pos, m) in words))
+            f.write(u"\\gl %s\n" % u" ".join(self.glossString(m) for (pos, m) in words))
+            f.write(u"\\ft %s\n\n" % translation)
+        # the parser processes a record when the next one starts
+        f.write(u"\\ref end\n")
+        f.close()
+
+    ########## Kura
+
+    def writeKura(self, filepath, count):
+        """
+        Writes a Kura .xml file with count phrases.
+        """
+        f = io.open(filepath, "w", encoding="utf-8")
+        f.write(u'<?xml version="1.0" encoding="UTF-8"?>\n<interlinear-text>\n')
+        f.write(u'<item type="title">Generated %i</item>\n<phrases>\n' % count)
+        for i, (words, translation, participant) in enumerate(self.utterances(count)):
+            f.write(u'<phrase>\n<item type="number">%i</item>\n' % i)
+            f.write(u'<item type="text">%s</item>\n' % escape(u" ".join(self.wordString(m) for (pos, m) in words)))
+            f.write(u'<item type="TR" full="Translation">%s</item>\n<words>\n' % escape(translation))
+            for j, (pos, morphemes) in enumerate(words):
+                f.write(u'<word>\n<item type="typ">FORM</item>\n<item type="number">%i</item>\n' % j)
+                f.write(u'<item type="text">%s</item>\n<morphemes>\n' % escape(self.wordString(morphemes)))
+                for k, (morpheme, glosses) in enumerate(morphemes):
+                    f.write(u'<morph>\n<item type="typ">FORM</item>\n<item type="number">%i</item>\n' % k)
+                    f.write(u'<item type="text">%s</item>\n' % escape(morpheme))
+                    for gloss in glosses:
+                        if k == 0:
+                            f.write(u'<item type="GL" full="None">%s</item>\n' % escape(gloss))
+                        else:
+                            f.write(u'<item type="ABBR" full="None">%s</item>\n' % escape(gloss))
+                    f.write(u'</morph>\n')
+                f.write(u'</morphemes>\n</word>\n')
+            f.write(u'</words>\n</phrase>\n')
+        f.write(u'</phrases>\n</interlinear-text>\n')
+        f.close()
+
+
+class EafWriter(object):
+    """Collects tiers, time slots and annotations and writes them as
+    .eaf file."""
+
+    def __init__(self):
+        self.lastAnnotationId = 0
+        self.timeslots = []
+        self.annotations = {}
+        self.tiers = []
+        self.linguisticTypes = []
+
+    def nextAnnotationId(self):
+        self.lastAnnotationId = self.lastAnnotationId + 1
+        return u"a%i" % self.lastAnnotationId
+
+    def nextTimeSlot(self, value):
+        self.timeslots.append(value)
+        return u"ts%i" % len(self.timeslots)
+
+    def addAlignable(self, idTier, idAnnotation, ts1, ts2, value):
+        self.annotations.setdefault(idTier, []).append(
+            u'<ALIGNABLE_ANNOTATION ANNOTATION_ID="%s" TIME_SLOT_REF1="%s" TIME_SLOT_REF2="%s">\n'
+            u'<ANNOTATION_VALUE>%s</ANNOTATION_VALUE>\n</ALIGNABLE_ANNOTATION>' % (idAnnotation, ts1, ts2, escape(value)))
+
+    def addRef(self, idTier, idAnnotation, annRef, prevAnn, value):
+        prev = u""
+        if prevAnn != None:
+            prev = u' PREVIOUS_ANNOTATION="%s"' % prevAnn
+        self.annotations.setdefault(idTier, []).append(
+            u'<REF_ANNOTATION ANNOTATION_ID="%s" ANNOTATION_REF="%s"%s>\n'
+            u'<ANNOTATION_VALUE>%s</ANNOTATION_VALUE>\n</REF_ANNOTATION>' % (idAnnotation, annRef, prev, escape(value)))
+
+    def addTier(self, idTier, linguisticType, parent, locale, participant):
+        self.tiers.append((idTier, linguisticType, parent, locale, participant))
+
+    def addLinguisticType(self, idType, constraints, timeAlignable):
+        self.linguisticTypes.append((idType, constraints, timeAlignable))
+
+    def write(self, filepath):
+        f = io.open(filepath, "w", encoding="utf-8")
+        f.write(u'<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write(u'<ANNOTATION_DOCUMENT AUTHOR="" DATE="2011-01-01T00:00:00+01:00" FORMAT="2.6" VERSION="2.6">\n')
+        f.write(u'<HEADER MEDIA_FILE="" TIME_UNITS="milliseconds">\n')
+        f.write(u'<PROPERTY NAME="lastUsedAnnotationId">%i</PROPERTY>\n</HEADER>\n' % self.lastAnnotationId)
+        f.write(u'<TIME_ORDER>\n')
+        for i, value in enumerate(self.timeslots):
+            if value == None:
+                f.write(u'<TIME_SLOT TIME_SLOT_ID="ts%i"/>\n' % (i + 1))
+            else:
+                f.write(u'<TIME_SLOT TIME_SLOT_ID="ts%i" TIME_VALUE="%i"/>\n' % (i + 1, value))
+        f.write(u'</TIME_ORDER>\n')
+        for (idTier, linguisticType, parent, locale, participant) in self.tiers:
+            attributes = u'DEFAULT_LOCALE=%s LINGUISTIC_TYPE_REF=%s PARTICIPANT=%s' % (quoteattr(locale), quoteattr(linguisticType), quoteattr(participant))
+            if parent != None:
+                attributes = attributes + u' PARENT_REF=%s' % quoteattr(parent)
+            f.write(u'<TIER %s TIER_ID=%s>\n' % (attributes, quoteattr(idTier)))
+            for annotation in self.annotations.get(idTier, []):
+                f.write(u'<ANNOTATION>\n%s\n</ANNOTATION>\n' % annotation)
+            f.write(u'</TIER>\n')
+        for (idType, constraints, timeAlignable) in self.linguisticTypes:
+            attributes = u''
+            if constraints != None:
+                attributes = u'CONSTRAINTS=%s ' % quoteattr(constraints)
+            f.write(u'<LINGUISTIC_TYPE %sGRAPHIC_REFERENCES="false" LINGUISTIC_TYPE_ID=%s TIME_ALIGNABLE="%s"/>\n'
+                    % (attributes, quoteattr(idType), timeAlignable and u"true" or u"false"))
+        f.write(u'</ANNOTATION_DOCUMENT>\n')
+        f.close()
@@ -0,0 +1,68 @@
+# (C) 2011 copyright by Peter Bouda
+# -*- coding: utf-8 -*-
+"""
+Checks that importing pyannotation.corpusreader stays cheap: the import
+must not load the modules of the file formats or lxml, and it must not
+take more than --budget seconds longer than starting the interpreter:
+
+  $ PYTHONPATH=src python -m benchmarks.importtime
+
+The script exits with status 1 if one of the checks fails.
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+import timeit
+
+# modules that must only be imported when a file is added
+LAZY_MODULES = [ "lxml", "pyannotation.elan.data", "pyannotation.toolbox.data", "pyannotation.kura.data", "elixir" ]
+
+
+def startupTime(statement, repeat):
+    """Returns the best time of repeat fresh interpreters running
+    statement, in seconds."""
+    best = None
+    for i in range(repeat):
+        start = timeit.default_timer()
+        subprocess.check_call([ sys.executable, "-c", statement ], env = os.environ)
+        t = timeit.default_timer() - start
+        if best == None or t < best:
+            best = t
+    return best
+
+def importedModules(module):
+    """Returns the names of all modules loaded by importing module."""
+    output = subprocess.check_output([ sys.executable, "-c",
+        "import sys; import %s; print('\\n'.join(sys.modules.keys()))" % module ], env = os.environ)
+    return set(output.decode("utf-8").split())
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Check the import time of pyannotation.corpusreader.")
+    parser.add_argument("--module", default = "pyannotation.corpusreader")
+    parser.add_argument("--budget", type = float, default = 0.025,
+                        help = "seconds the import may add to the start of the interpreter")
+    parser.add_argument("--repeat", type = int, default = 10)
+    args = parser.parse_args(argv)
+
+    failed = False
+    loaded = [ m for m in LAZY_MODULES if m in importedModules(args.module) ]
+    if len(loaded) > 0:
+        sys.stderr.write("import %s loads: %s\n" % (args.module, ", ".join(loaded)))
+        failed = True
+
+    base = startupTime("pass", args.repeat)
+    seconds = startupTime("import %s" % args.module, args.repeat) - base
+    sys.stderr.write("import %s: %.4fs, budget %.4fs\n" % (args.module, seconds, args.budget))
+    if seconds > args.budget:
+        failed = True
+
+    if failed:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+# (C) 2011 copyright by Peter Bouda
+# -*- coding: utf-8 -*-
+"""
+Runs the benchmarks on generated corpus files of several sizes and
+prints the results as JSON. Scale 1 means --base utterances per file,
+scale 10 ten times as many etc.:
+
+  $ PYTHONPATH=src python -m benchmarks.run --scales 1 10 100 --output results.json
+
+Use --only to run only the benchmarks whose name contains one of the
+given strings. A benchmark that takes longer than --max-seconds is
+skipped at the larger scales and reported with "skipped": true.
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import platform
+import tempfile
+import timeit
+
+import pyannotation.data
+import pyannotation.corpusreader
+import pyannotation.elan.converter
+import pyannotation.kura.data
+import pyannotation.kura.converter
+import pyannotation.interlinear
+
+from benchmarks.generator import CorpusGenerator
+
+EAF_BACKENDS = [ "lxml", "pythonic", "streaming" ]
+
+
+def timeit_best(function, repeat):
+    """Returns the best time of repeat calls of function, in seconds."""
+    best = None
+    for i in range(repeat):
+        start = timeit.default_timer()
+        function()
+        t = timeit.default_timer() - start
+        if best == None or t < best:
+            best = t
+    return best
+
+
+class NullStream(object):
+    """A text stream that discards what is written."""
+
+    def write(self, s):
+        pass
+
+
+def loadReader(filepath, filetype, backend = None):
+    cr = pyannotation.corpusreader.GlossCorpusReader()
+    cr.addFile(filepath, filetype, backend = backend)
+    return cr
+
+
+class BenchmarkRunner(object):
+
+    def __init__(self, directory, base = 25, repeat = 3, only = None, maxSeconds = None):
+        self.directory = directory
+        self.base = base
+        self.repeat = repeat
+        self.only = only
+        self.maxSeconds = maxSeconds
+        self.generator = CorpusGenerator()
+        self.results = []
+        # benchmarks that took longer than maxSeconds are skipped at
+        # larger scales
+        self.tooSlow = set()
+
+    def generate(self, scale):
+        count = self.base * scale
+        files = {
+            'eaf' : os.path.join(self.directory, "corpus-%i.eaf" % scale),
+            'eaf-time' : os.path.join(self.directory, "corpus-time-%i.eaf" % scale),
+            'eaf-toolbox' : os.path.join(self.directory, "corpus-toolbox-%i.eaf" % scale),
+            'toolbox' : os.path.join(self.directory, "corpus-%i.txt" % scale),
+            'kura' : os.path.join(self.directory, "corpus-%i.xml" % scale)
+        }
+        self.generator.writeEaf(files['eaf'], count)
+        self.generator.writeEaf(files['eaf-time'], count, timeAlignedWords = True)
+        self.generator.writeEafFromToolbox(files['eaf-toolbox'], count)
+        self.generator.writeToolbox(files['toolbox'], count)
+        self.generator.writeKura(files['kura'], count)
+        return files
+
+    def measure(self, name, scale, function):
+        if self.only and not [o for o in self.only if o in name]:
+            return
+        result = {
+            'name' : name,
+            'scale' : scale,
+            'utterances' : self.base * scale,
+            'seconds' : None
+        }
+        self.results.append(result)
+        if name in self.tooSlow:
+            result['skipped'] = True
+            sys.stderr.write("%-45s %5ix    skipped\n" % (name, scale))
+            return
+        seconds = timeit_best(function, self.repeat)
+        result['seconds'] = seconds
+        if self.maxSeconds != None and seconds > self.maxSeconds:
+            self.tooSlow.add(name)
+        sys.stderr.write("%-45s %5ix %10.4fs\n" % (name, scale, seconds))
+
+    def run(self, scales):
+        for scale in scales:
+            files = self.generate(scale)
+            self.runEaf(scale, files)
+            self.runToolbox(scale, files)
+            self.runKura(scale, files)
+        return self.results
+
+    def runEaf(self, scale, files):
+        for backend in EAF_BACKENDS:
+            self.measure("addFile.eaf.%s" % backend, scale,
+                lambda: loadReader(files['eaf'], pyannotation.data.EAF, backend))
+            self.measure("addFile.eaf-time.%s" % backend, scale,
+                lambda: loadReader(files['eaf-time'], pyannotation.data.EAF, backend))
+            self.measure("addFile.eaffromtoolbox.%s" % backend, scale,
+                lambda: loadReader(files['eaf-toolbox'], pyannotation.data.EAFFROMTOOLBOX, backend))
+
+        cr = loadReader(files['eaf'], pyannotation.data.EAF)
+        tree = cr.annotationtrees[0][1]
+        self.measure("AnnotationTree.parse.eaf", scale, tree.parse)
+
+        def appendFilter():
+            f = pyannotation.data.AnnotationTreeFilter()
+            f.setGlossFilter(r"PAST")
+            f.setMorphemeFilter(r"^ka")
+            f.setBooleanOperation(f.OR)
+            tree.appendFilter(f)
+            tree.popFilter()
+        self.measure("AnnotationTree.appendFilter", scale, appendFilter)
+
+        for accessor in [ "words", "sents", "sentsWithTranslations", "morphemes",
+                          "taggedMorphemes", "taggedWords", "taggedSents",
+                          "taggedSentsWithTranslations" ]:
+            self.measure("GlossCorpusReader.%s" % accessor, scale, getattr(cr, accessor))
+
+        self.measure("AnnotationTree.getAsEafXml", scale,
+            lambda: tree.getAsEafXml("A-utterance", "A-words", "A-morpheme", "A-gloss", "A-translation"))
+
+        text = open(files['eaf'], 'rb').read().decode('utf-8')
+        self.measure("elan.Convert.toAg", scale,
+            lambda: pyannotation.elan.converter.Convert.toAg(text))
+        self.measure("elan.Convert.toAgXslt", scale,
+            lambda: pyannotation.elan.converter.Convert.toAgXslt(text))
+
+        for format in pyannotation.interlinear.FORMATS:
+            self.measure("interlinear.renderTree.%s" % format, scale,
+                lambda: pyannotation.interlinear.renderTree(tree, NullStream(), format = format))
+
+    def runToolbox(self, scale, files):
+        self.measure("addFile.toolbox", scale,
+            lambda: loadReader(files['toolbox'], pyannotation.data.TOOLBOX))
+
+    def runKura(self, scale, files):
+        def parseKura():
+            tree = pyannotation.kura.data.KuraTree(files['kura'])
+            tree.parse()
+        self.measure("KuraTree.parse", scale, parseKura)
+
+        text = open(files['kura'], 'rb').read().decode('utf-8')
+        self.measure("kura.Convert.toHtmllgr", scale,
+            lambda: pyannotation.kura.converter.Convert.toHtmllgr(text))
+        self.measure("kura.Convert.toTextwolines", scale,
+            lambda: pyannotation.kura.converter.Convert.toTextwolines(text))
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Run the pyannotation benchmarks.")
+    parser.add_argument("--scales", type = int, nargs = "+", default = [1, 10, 100])
+    parser.add_argument("--base", type = int, default = 25, help = "utterances per file at scale 1")
+    parser.add_argument("--repeat", type = int, default = 3)
+    parser.add_argument("--only", nargs = "+", help = "run only benchmarks whose name contains one of these")
+    parser.add_argument("--max-seconds", type = float, default = 30.0,
+                        help = "skip a benchmark at larger scales once it took longer than this")
+    parser.add_argument("--output", help = "write the JSON results to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp(prefix = "pyannotation-benchmarks-")
+    try:
+        runner = BenchmarkRunner(directory, args.base, args.repeat, args.only, args.max_seconds)
+        results = runner.run(args.scales)
+    finally:
+        shutil.rmtree(directory)
+
+    report = {
+        'python' : platform.python_version(),
+        'platform' : platform.platform(),
+        'base' : args.base,
+        'repeat' : args.repeat,
+        'results' : results
+    }
+    output = json.dumps(report, indent = 2, sort_keys = True)
+    if args.output:
+        f = open(args.output, "w")
+        f.write(output)
+        f.close()
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
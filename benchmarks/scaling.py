@@ -0,0 +1,253 @@
+# (C) 2011 copyright by Peter Bouda
+# -*- coding: utf-8 -*-
+"""
+Checks how the running time of the main operations grows with the size
+of the corpus. Each check is timed on generated files of several sizes,
+the growth exponent k of time ~ size^k is fitted with least squares and
+the check fails if k is larger than the limit of the check. A linear
+operation has an exponent around 1, an accidentally quadratic one
+around 2:
+
+  $ PYTHONPATH=src python -m benchmarks.scaling
+
+The script exits with status 1 if one of the checks fails, so that it
+can be run before each release.
+"""
+
+import os
+import gc
+import sys
+import math
+import shutil
+import argparse
+import tempfile
+
+import pyannotation.data
+import pyannotation.corpusreader
+import pyannotation.elan.data
+import pyannotation.ngrams
+
+from benchmarks.generator import CorpusGenerator
+from benchmarks.run import timeit_best, loadReader
+
+# the limit for linear and log-linear operations; leaves room for the
+# noise of the measurements, but not for quadratic growth
+LINEAR = 1.35
+
+
+def fitExponent(sizes, seconds):
+    """Returns the slope of the least squares line through the points
+    (log size, log seconds)."""
+    xs = [math.log(s) for s in sizes]
+    ys = [math.log(max(t, 1e-9)) for t in seconds]
+    mx = sum(xs) / len(xs)
+    my = sum(ys) / len(ys)
+    sxy = sum((x - mx) * (y - my) for x, y in zip(xs, ys))
+    sxx = sum((x - mx) ** 2 for x in xs)
+    return sxy / sxx
+
+
+class ScalingCheck(object):
+    """
+    A check has a name, the maximal growth exponent and a function that
+    gets the generated files of one size and returns the function to
+    time. The setup is not timed.
+    """
+
+    def __init__(self, name, maxExponent, setup):
+        self.name = name
+        self.maxExponent = maxExponent
+        self.setup = setup
+
+
+def setupEafValues(files):
+    eaf = pyannotation.elan.data.Eaf(files['eaf'])
+    ids = [ (idTier, id) for idTier in ("A-words", "B-words")
+           for id in eaf.getRefAnnotationIdsForTier(idTier) ]
+    def run():
+        eaf.resetAnnotationIndex()
+        for idTier, id in ids:
+            eaf.getAnnotationValueForAnnotation(idTier, id)
+    return run
+
+def setupEafRefAnnotations(files):
+    eaf = pyannotation.elan.data.Eaf(files['eaf'])
+    ids = [ (idTier, id) for idTier in ("A-utterance", "B-utterance")
+           for id in eaf.getAlignableAnnotationIdsForTier(idTier) ]
+    def run():
+        eaf.resetAnnotationIndex()
+        for idTier, id in ids:
+            eaf.getRefAnnotationIdsForTier(idTier.replace("utterance", "words"), id)
+    return run
+
+def setupEafAlignableAnnotations(files):
+    eaf = pyannotation.elan.data.Eaf(files['eaf-time'])
+    ids = [ (idTier, id) for idTier in ("A-utterance", "B-utterance")
+           for id in eaf.getAlignableAnnotationIdsForTier(idTier) ]
+    def run():
+        eaf.resetAnnotationIndex()
+        for idTier, id in ids:
+            eaf.getSubAnnotationIdsForAnnotationInTier(id, idTier, idTier.replace("utterance", "words"))
+    return run
+
+def setupAddFile(key, filetype, backend = None):
+    def setup(files):
+        return lambda: loadReader(files[key], filetype, backend)
+    return setup
+
+def setupGetWordById(files):
+    tree = loadReader(files['eaf'], pyannotation.data.EAF).annotationtrees[0][1]
+    ids = [ w[0] for u in tree.getTree() for w in u[2] ]
+    def run():
+        tree.resetIndex()
+        for id in ids:
+            tree.getWordById(id)
+    return run
+
+def setupRemoveUtterances(files):
+    # removes a fixed number of utterances, one by one; every removal
+    # may be linear in the size of the file, but not more
+    tree = loadReader(files['eaf'], pyannotation.data.EAF).annotationtrees[0][1]
+    ids = tree.getUtteranceIds()
+    ids = ids[::max(1, len(ids) // 10)][:10]
+    def run():
+        for id in ids:
+            tree.removeUtteranceWithId(id)
+    return run
+
+def setupAppendFilter(files):
+    tree = loadReader(files['eaf'], pyannotation.data.EAF).annotationtrees[0][1]
+    def run():
+        for gloss in ("PAST", "PL", "1SG"):
+            f = pyannotation.data.AnnotationTreeFilter()
+            f.setGlossFilter(gloss)
+            tree.appendFilter(f)
+        tree.clearFilters()
+    return run
+
+def setupConcordance(files):
+    # the first query builds the index once, the others run on it; the
+    # runner calls the setup again for every repetition
+    reader = loadReader(files['eaf'], pyannotation.data.EAF)
+    def run():
+        for gloss in ("PAST", "PL", "1SG"):
+            for line in reader.concordance(gloss, key = "gloss", sort = "left"):
+                pass
+        for gloss in ("PAST", "PL", "1SG"):
+            for line in reader.concordance(gloss, key = "gloss", sort = "right"):
+                pass
+    return run
+
+def setupNgrams(files):
+    # a small budget, so that the larger files are counted in many runs
+    def run():
+        counter = pyannotation.ngrams.NgramCounter(maxN = 3, key = "gloss", memoryBudget = 2000)
+        try:
+            counter.addFiles([ files['eaf'] ], pyannotation.data.EAF)
+            for collocation in counter.collocations(3, minCount = 2):
+                pass
+        finally:
+            counter.close()
+    return run
+
+SCALING_CHECKS = [
+    ScalingCheck("Eaf.getAnnotationValueForAnnotation", LINEAR, setupEafValues),
+    ScalingCheck("Eaf.getRefAnnotationIdsForTier", LINEAR, setupEafRefAnnotations),
+    ScalingCheck("Eaf.getAlignableAnnotationIdsForTier", LINEAR, setupEafAlignableAnnotations),
+    ScalingCheck("addFile.eaf.lxml", LINEAR, setupAddFile('eaf', pyannotation.data.EAF, "lxml")),
+    ScalingCheck("addFile.eaf-time.lxml", LINEAR, setupAddFile('eaf-time', pyannotation.data.EAF, "lxml")),
+    ScalingCheck("addFile.eaf.pythonic", LINEAR, setupAddFile('eaf', pyannotation.data.EAF, "pythonic")),
+    ScalingCheck("addFile.toolbox", LINEAR, setupAddFile('toolbox', pyannotation.data.TOOLBOX)),
+    ScalingCheck("addFile.kura", LINEAR, setupAddFile('kura', pyannotation.data.KURA)),
+    ScalingCheck("AnnotationTree.getWordById", LINEAR, setupGetWordById),
+    ScalingCheck("AnnotationTree.removeUtteranceWithId", LINEAR, setupRemoveUtterances),
+    ScalingCheck("AnnotationTree.appendFilter", LINEAR, setupAppendFilter),
+    ScalingCheck("CorpusReader.concordance", LINEAR, setupConcordance),
+    ScalingCheck("NgramCounter.collocations", LINEAR, setupNgrams),
+]
+
+
+class ScalingRunner(object):
+
+    def __init__(self, directory, base = 100, repeat = 3, only = None):
+        self.directory = directory
+        self.base = base
+        self.repeat = repeat
+        self.only = only
+        self.generator = CorpusGenerator()
+
+    def generate(self, scale):
+        count = self.base * scale
+        files = {
+            'eaf' : os.path.join(self.directory, "corpus-%i.eaf" % scale),
+            'eaf-time' : os.path.join(self.directory, "corpus-time-%i.eaf" % scale),
+            'toolbox' : os.path.join(self.directory, "corpus-%i.txt" % scale),
+            'kura' : os.path.join(self.directory, "corpus-%i.xml" % scale)
+        }
+        self.generator.writeEaf(files['eaf'], count)
+        self.generator.writeEaf(files['eaf-time'], count, timeAlignedWords = True)
+        self.generator.writeToolbox(files['toolbox'], count)
+        self.generator.writeKura(files['kura'], count)
+        return files
+
+    def run(self, scales):
+        checks = [ c for c in SCALING_CHECKS
+                  if not self.only or [o for o in self.only if o in c.name] ]
+        filesForScale = dict((scale, self.generate(scale)) for scale in scales)
+        results = []
+        for check in checks:
+            seconds = []
+            for scale in scales:
+                # the removal changes the tree, so every repetition needs
+                # a fresh setup; the garbage collector is disabled while
+                # timing, like timeit does, its full collections add noise
+                best = None
+                for i in range(self.repeat):
+                    function = check.setup(filesForScale[scale])
+                    gc.collect()
+                    gc.disable()
+                    try:
+                        t = timeit_best(function, 1)
+                    finally:
+                        gc.enable()
+                    if best == None or t < best:
+                        best = t
+                seconds.append(best)
+            exponent = fitExponent([ self.base * s for s in scales ], seconds)
+            result = {
+                'name' : check.name,
+                'seconds' : seconds,
+                'exponent' : exponent,
+                'maxExponent' : check.maxExponent,
+                'passed' : exponent <= check.maxExponent
+            }
+            sys.stderr.write("%-45s %6.2f <= %4.2f %s\n" % (check.name, exponent,
+                check.maxExponent, "ok" if result['passed'] else "FAILED"))
+            results.append(result)
+        return results
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Check the growth of the running times of pyannotation.")
+    parser.add_argument("--scales", type = int, nargs = "+", default = [1, 2, 4, 8])
+    parser.add_argument("--base", type = int, default = 100, help = "utterances per file at scale 1")
+    parser.add_argument("--repeat", type = int, default = 3)
+    parser.add_argument("--only", nargs = "+", help = "run only checks whose name contains one of these")
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp(prefix = "pyannotation-scaling-")
+    try:
+        runner = ScalingRunner(directory, args.base, args.repeat, args.only)
+        results = runner.run(args.scales)
+    finally:
+        shutil.rmtree(directory)
+
+    failed = [ r['name'] for r in results if not r['passed'] ]
+    if len(failed) > 0:
+        sys.stderr.write("super-linear growth in: %s\n" % ", ".join(failed))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -39,6 +39,16 @@ import re
 result2 = [(s, translations) for (s, translations) in cr.taggedSentsWithTranslations() for t in translations if re.search(r"\bhome\b", t[1])]
 print(result2)
 
+# concordance from the index of the corpus reader
+import pyannotation.concordance
+print("\nconcordance for word \"bir\":")
+for line in cr.concordance('bir', left = 5, right = 5):
+    print(pyannotation.concordance.formatLine(line))
+
+print("\nconcordance for gloss \"ANOM\", sorted by the right context:")
+for line in cr.concordance('ANOM', key = 'gloss', left = 3, right = 3, sort = 'right'):
+    print(pyannotation.concordance.formatLine(line))
+
 # NLTK concordance
 try:
     import nltk.text
@@ -1,4 +1,16 @@
+import sys
 from distutils.core import setup
+from distutils.command.build_py import build_py
+
+class BuildPy(build_py):
+    # pyannotation.aio uses the asyncio syntax of Python 3.6, it is left
+    # out on older versions
+    def find_package_modules(self, package, package_dir):
+        modules = build_py.find_package_modules(self, package, package_dir)
+        if sys.version_info < (3, 6):
+            modules = [ m for m in modules if (m[0], m[1]) != ('pyannotation', 'aio') ]
+        return modules
+
 setup(name='pyannotation',
       version='0.3.0',
       description='Python Linguistic Annotation Library',
@@ -9,4 +21,5 @@ setup(name='pyannotation',
       packages=[ 'pyannotation', 'pyannotation.ag', 'pyannotation.elan', 'pyannotation.kura', 'pyannotation.toolbox' ],
       package_dir={'pyannotation': 'src/pyannotation'},
       package_data={'pyannotation': ['xsl/*.xsl', 'xsd/*.xsd']},
+      cmdclass={'build_py': BuildPy},
       )
@@ -1,3 +1,9 @@
 # (C) 2009 copyright by Peter Bouda
 # -*- coding: utf-8 -*-
-__all__ = [ 'data', 'corpusreader' ]
+__all__ = [ 'data', 'corpusreader', 'profiling', 'memory', 'mapreduce', 'manifest', 'compression', 'concordance', 'ngrams', 'sketches', 'consistency', 'interlinear' ]
+
+def stats():
+    """Returns a snapshot of the counters and timers of the opt-in
+    instrumentation, see pyannotation.profiling."""
+    from pyannotation import profiling
+    return profiling.stats()
@@ -4,14 +4,19 @@
 Classes for database storage of annotation graphs.
 The database model uses Elixir as ORM. It is
 not usable yet.
+
+The model is not bound to a database when the module is imported,
+call bind() first.
 """
 __author__ =  'Peter Bouda'
 __version__=  '0.1.1'
 
 from elixir import *
 
-metadata.bind = "sqlite:///movies.sqlite"
-metadata.bind.echo = True
+def bind(url = "sqlite:///movies.sqlite", echo = True):
+    """Binds the model to the database at url."""
+    metadata.bind = url
+    metadata.bind.echo = echo
 
 class AGSet(Entity):
     agsetid = Field(Unicode(50), primary_key=True)
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+# (C) 2011 copyright by Peter Bouda
+"""
+asyncio API to add many files to a CorpusReader without blocking the
+event loop. Needs Python 3.6 or later, so the module is not in the
+__all__ of pyannotation and has to be imported explicitly.
+
+The files are read in the default executor of the loop, so that slow
+(network) storage does not block the loop, and parsed in a thread pool.
+At most "concurrency" files are read or parsed at the same time, which
+bounds the memory for file contents that wait for the parser.
+
+  trees = await reader.addFilesAsync(paths, pyannotation.data.EAF, concurrency = 8,
+                                     progress = lambda done, total, filepath, tree: ...)
+
+  async for filepath, tree in pyannotation.aio.iterAnnotationTrees(reader, paths, pyannotation.data.EAF):
+      ...
+"""
+
+import io
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+
+def readFile(filepath):
+    with open(filepath, 'rb') as f:
+        return f.read()
+
+async def loadAnnotationTree(reader, index, filepath, filetype, semaphore, executor, kwargs):
+    loop = asyncio.get_event_loop()
+    async with semaphore:
+        data = await loop.run_in_executor(None, readFile, filepath)
+        tree = await loop.run_in_executor(executor,
+            functools.partial(reader.createAnnotationTree, io.BytesIO(data), filetype, **kwargs))
+    return index, filepath, tree
+
+async def iterIndexedAnnotationTrees(reader, filepaths, filetype, concurrency = 4, executor = None, **kwargs):
+    semaphore = asyncio.Semaphore(concurrency)
+    ownExecutor = executor == None
+    if ownExecutor:
+        executor = ThreadPoolExecutor(concurrency)
+    tasks = [ asyncio.ensure_future(loadAnnotationTree(reader, i, filepath, filetype, semaphore, executor, kwargs))
+             for i, filepath in enumerate(filepaths) ]
+    try:
+        for future in asyncio.as_completed(tasks):
+            yield await future
+    finally:
+        for task in tasks:
+            task.cancel()
+        if ownExecutor:
+            executor.shutdown(wait = False)
+
+async def iterAnnotationTrees(reader, filepaths, filetype, concurrency = 4, executor = None, **kwargs):
+    """Reads and parses the files and yields (filepath, AnnotationTree)
+    as soon as each tree is complete. The trees are not added to the
+    reader. Files of unknown type are skipped."""
+    async for index, filepath, tree in iterIndexedAnnotationTrees(reader, filepaths, filetype, concurrency, executor, **kwargs):
+        if tree != None:
+            yield filepath, tree
+
+async def addFilesAsync(reader, filepaths, filetype, concurrency = 4, progress = None, executor = None, **kwargs):
+    """Reads and parses the files and adds their trees to the reader, in
+    the order of filepaths, when all files are done. Returns the list of
+    new [filepath, AnnotationTree] entries.
+    concurrency: the maximal number of files read or parsed at once.
+    progress: called as progress(done, total, filepath, tree) each time a
+        file is complete.
+    executor: the executor for the parser, by default a thread pool with
+        concurrency threads.
+    The other keyword arguments are passed on to CorpusReader.addFile()."""
+    filepaths = list(filepaths)
+    trees = [ None ] * len(filepaths)
+    done = 0
+    async for index, filepath, tree in iterIndexedAnnotationTrees(reader, filepaths, filetype, concurrency, executor, **kwargs):
+        trees[index] = tree
+        done = done + 1
+        if progress != None:
+            progress(done, len(filepaths), filepath, tree)
+    added = [ [filepath, tree] for filepath, tree in zip(filepaths, trees) if tree != None ]
+    reader.annotationtrees.extend(added)
+    return added
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+# (C) 2011 copyright by Peter Bouda
+"""
+Transparent decompression of annotation files. openAnnotationFile()
+gets a path or a binary file object and returns a binary file object
+that delivers the decompressed data, so that the parsers read
+compressed files without a temporary copy. The compression is detected
+from the first bytes of the data, not from the file name:
+
+  gzip (.gz), bzip2 (.bz2), xz (.xz, needs the module lzma) and
+  Zstandard (.zst, needs the package zstandard)
+"""
+
+import io
+import zlib
+import bz2
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CHUNK_SIZE = 65536
+
+def gzipDecompressor():
+    # 16 + MAX_WBITS: expect the gzip header and trailer
+    return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+def lzmaDecompressor():
+    if lzma == None:
+        raise IOError("xz compressed file, but the module lzma is not available")
+    return lzma.LZMADecompressor()
+
+def zstdDecompressor():
+    if zstandard == None:
+        raise IOError("Zstandard compressed file, but the package zstandard is not installed")
+    return zstandard.ZstdDecompressor().decompressobj()
+
+# magic bytes -> function that returns a new decompressor object
+COMPRESSIONS = [
+    (b"\x1f\x8b", gzipDecompressor),
+    (b"BZh", bz2.BZ2Decompressor),
+    (b"\xfd7zXZ\x00", lzmaDecompressor),
+    (b"\x28\xb5\x2f\xfd", zstdDecompressor)
+]
+MAGIC_LENGTH = max(len(magic) for magic, decompressor in COMPRESSIONS)
+
+
+def isStreamFinished(decompressor):
+    """True if the decompressor read the end of its stream."""
+    if hasattr(decompressor, 'eof'):
+        return decompressor.eof
+    # the decompressors of Python 2 have no eof: after the end of the
+    # stream more data goes to unused_data (zlib) or raises EOFError (bz2)
+    if hasattr(decompressor, 'copy'):
+        decompressor = decompressor.copy()
+    try:
+        decompressor.decompress(b"\0")
+    except EOFError:
+        return True
+    except Exception:
+        return False
+    return len(getattr(decompressor, 'unused_data', b"")) > 0
+
+
+class DecompressingStream(io.RawIOBase):
+    """
+    A raw stream that reads compressed data from a file object and
+    returns the decompressed data. Concatenated streams, like the ones
+    of "cat a.gz b.gz", are decompressed one after the other. A stream
+    that is cut off raises EOFError.
+    """
+
+    def __init__(self, fileobj, createDecompressor, closeFile = True):
+        io.RawIOBase.__init__(self)
+        self.fileobj = fileobj
+        self.createDecompressor = createDecompressor
+        self.decompressor = createDecompressor()
+        self.closeFile = closeFile
+        self.buffer = b""
+        self.eof = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while len(self.buffer) == 0 and not self.eof:
+            data = self.fileobj.read(CHUNK_SIZE)
+            if not data:
+                self.eof = True
+                if not isStreamFinished(self.decompressor):
+                    raise EOFError("compressed file ended before the end of the stream")
+                if hasattr(self.decompressor, 'flush'):
+                    self.buffer = self.decompressor.flush()
+                break
+            parts = []
+            while data:
+                if getattr(self.decompressor, 'eof', False):
+                    self.decompressor = self.createDecompressor()
+                try:
+                    parts.append(self.decompressor.decompress(data))
+                except EOFError:
+                    # the last stream ended exactly at the end of a chunk
+                    self.decompressor = self.createDecompressor()
+                    parts.append(self.decompressor.decompress(data))
+                # one or more streams start in this chunk
+                data = getattr(self.decompressor, 'unused_data', b"")
+                if data:
+                    self.decompressor = self.createDecompressor()
+            self.buffer = b"".join(parts)
+        n = min(len(b), len(self.buffer))
+        b[:n] = self.buffer[:n]
+        self.buffer = self.buffer[n:]
+        return n
+
+    def close(self):
+        if self.closeFile and not self.closed:
+            self.fileobj.close()
+        io.RawIOBase.close(self)
+
+
+def peekMagic(fileobj):
+    """Returns the first bytes of a file object without consuming them,
+    None if that is not possible."""
+    if hasattr(fileobj, 'peek'):
+        return fileobj.peek(MAGIC_LENGTH)[:MAGIC_LENGTH]
+    if hasattr(fileobj, 'seekable') and not fileobj.seekable():
+        return None
+    try:
+        position = fileobj.tell()
+    except (AttributeError, IOError):
+        return None
+    magic = fileobj.read(MAGIC_LENGTH)
+    fileobj.seek(position)
+    return magic
+
+def decompressorForMagic(magic):
+    if magic != None:
+        for prefix, decompressor in COMPRESSIONS:
+            if magic.startswith(prefix):
+                return decompressor
+    return None
+
+def isCompressed(file):
+    """Returns True if the file at the path or the file object is
+    compressed in one of the supported formats."""
+    if hasattr(file, 'read'):
+        return decompressorForMagic(peekMagic(file)) != None
+    f = io.open(file, 'rb')
+    try:
+        return decompressorForMagic(f.read(MAGIC_LENGTH)) != None
+    finally:
+        f.close()
+
+def openAnnotationFile(file):
+    """Opens the file at the path, or takes the binary file object, and
+    returns a binary file object with the decompressed data. Files that
+    are not compressed are returned as they are."""
+    if hasattr(file, 'read'):
+        fileobj = file
+        closeFile = False
+    else:
+        fileobj = io.open(file, 'rb')
+        closeFile = True
+    decompressor = decompressorForMagic(peekMagic(fileobj))
+    if decompressor == None:
+        return fileobj
+    return io.BufferedReader(DecompressingStream(fileobj, decompressor, closeFile), CHUNK_SIZE)
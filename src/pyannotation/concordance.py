@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+# (C) 2011 copyright by Peter Bouda
+"""
+Keyword in context (KWIC) concordances for corpus readers, without NLTK.
+
+A ConcordanceIndex stores the words, morphemes or glosses of all
+utterances of a corpus reader once, together with a dict from each
+token to its positions. Queries look up the positions in the dict
+instead of scanning the corpus, and the lines are created only when
+they are consumed:
+
+  for line in cr.concordance("bir", left = 5, right = 5):
+      print(pyannotation.concordance.formatLine(line))
+
+  for line in cr.concordance("ANOM", key = "gloss", left = 1, right = 1, unit = "utterances", sort = "right"):
+      ...
+
+The corpus reader keeps one index per key, so that repeated queries use
+the same index. Files added to the reader later are indexed on the next
+query.
+"""
+
+import pyannotation.corpusreader
+
+# the tokens that can be searched
+KEYS = ("word", "morpheme", "gloss")
+
+# the units of the context
+UNITS = ("tokens", "utterances")
+
+# sort orders of the lines; None keeps the order of the corpus
+SORTS = (None, "left", "right")
+
+
+def wordTokens(utterance):
+    return [ word[1] for word in utterance[2] if len(word) > 0 and word[1] != '' ]
+
+def morphemeTokens(utterance):
+    return [ morpheme[1] for word in utterance[2] if len(word) > 0
+            for morpheme in word[2] if morpheme[1] != '' ]
+
+def glossTokens(utterance):
+    return [ gloss[1] for word in utterance[2] if len(word) > 0
+            for morpheme in word[2] for gloss in morpheme[2] if gloss[1] != '' ]
+
+TOKENIZERS = {
+    "word" : wordTokens,
+    "morpheme" : morphemeTokens,
+    "gloss" : glossTokens
+}
+
+
+class ConcordanceIndex(object):
+    """
+    A positional index of the tokens of a corpus reader. Each utterance
+    that passes the locale and participant filters of the reader is
+    stored as the list of its tokens, positions are (number of the
+    utterance, number of the token) tuples.
+    """
+
+    def __init__(self, reader, key = "word"):
+        if key not in KEYS:
+            raise ValueError("unknown key: %s" % key)
+        if key != "word" and reader.interlineartype != pyannotation.corpusreader.GLOSS:
+            raise ValueError("the key %s needs a GlossCorpusReader" % key)
+        self.reader = reader
+        self.key = key
+        self.tokenize = TOKENIZERS[key]
+        self.reset()
+
+    def reset(self):
+        # the trees that are already indexed
+        self.trees = []
+        self.filters = (self.reader.locale, self.reader.participant)
+        # per utterance: its tokens, file and id
+        self.utterances = []
+        self.files = []
+        self.utteranceIds = []
+        # token -> list of positions
+        self.positions = {}
+
+    def update(self):
+        """Indexes the files added to the reader since the last update.
+        The index is rebuilt if files were removed or the filters of the
+        reader changed."""
+        trees = [ tree for (filepath, tree) in self.reader.annotationtrees ]
+        if self.filters != (self.reader.locale, self.reader.participant) or \
+                len(trees) < len(self.trees) or \
+                [ t for t, u in zip(self.trees, trees) if t is not u ]:
+            self.reset()
+        for i in range(len(self.trees), len(self.reader.annotationtrees)):
+            filepath, tree = self.reader.annotationtrees[i]
+            self.addTree(i, tree)
+            self.trees.append(tree)
+
+    def addTree(self, fileNumber, tree):
+        for utterance in self.reader.filteredUtterances(tree):
+            tokens = self.tokenize(utterance)
+            u = len(self.utterances)
+            self.utterances.append(tokens)
+            self.files.append(fileNumber)
+            self.utteranceIds.append(utterance[0])
+            for t, token in enumerate(tokens):
+                self.positions.setdefault(token, []).append((u, t))
+
+    def count(self, query):
+        """Returns how often the token occurs in the corpus."""
+        self.update()
+        return len(self.positions.get(query, []))
+
+    def findPositions(self, query):
+        """Returns the positions of the query, a token or a list of
+        tokens that must follow each other in one utterance."""
+        self.update()
+        if isinstance(query, (list, tuple)):
+            if len(query) == 0:
+                return []
+            found = []
+            for (u, t) in self.positions.get(query[0], []):
+                if self.utterances[u][t:t + len(query)] == list(query):
+                    found.append((u, t))
+            return found
+        return self.positions.get(query, [])
+
+    def context(self, u, t, length, left, right, unit):
+        """Returns the (left, match, right) token lists of a position."""
+        tokens = self.utterances[u]
+        leftTokens = tokens[:t]
+        rightTokens = tokens[t + length:]
+        if unit == "tokens":
+            return leftTokens[max(0, len(leftTokens) - left):], tokens[t:t + length], rightTokens[:right]
+        # whole utterances before and after, within the same file
+        before = u
+        while before > 0 and u - before < left and self.files[before - 1] == self.files[u]:
+            before = before - 1
+        after = u
+        while after + 1 < len(self.utterances) and after - u < right and self.files[after + 1] == self.files[u]:
+            after = after + 1
+        for i in range(u - 1, before - 1, -1):
+            leftTokens = self.utterances[i] + leftTokens
+        for i in range(u + 1, after + 1):
+            rightTokens = rightTokens + self.utterances[i]
+        return leftTokens, tokens[t:t + length], rightTokens
+
+    def concordance(self, query, left = 5, right = 5, unit = "tokens", sort = None):
+        """
+        Yields the concordance lines of the query as tuples (filepath,
+        utterance id, left context, match, right context). The contexts
+        and the match are lists of tokens.
+        query: a token or a list of tokens that follow each other.
+        left, right: the size of the contexts, in tokens or utterances.
+        unit: "tokens" or "utterances". With "utterances" the contexts
+            contain the rest of the utterance of the match and the given
+            number of utterances before and after it in the same file.
+        sort: None for the order of the corpus, "left" to sort by the
+            left context, beginning with the token next to the match, or
+            "right" to sort by the right context.
+        """
+        if unit not in UNITS:
+            raise ValueError("unknown unit: %s" % unit)
+        if sort not in SORTS:
+            raise ValueError("unknown sort order: %s" % sort)
+        positions = self.findPositions(query)
+        length = 1
+        if isinstance(query, (list, tuple)):
+            length = len(query)
+        if sort == "left":
+            positions = sorted(positions, key = lambda p: self.context(p[0], p[1], length, left, 0, unit)[0][::-1])
+        elif sort == "right":
+            positions = sorted(positions, key = lambda p: self.context(p[0], p[1], length, 0, right, unit)[2])
+        else:
+            # the list of the index may grow while the lines are consumed
+            positions = list(positions)
+        for (u, t) in positions:
+            leftTokens, match, rightTokens = self.context(u, t, length, left, right, unit)
+            yield (self.reader.annotationtrees[self.files[u]][0], self.utteranceIds[u],
+                   leftTokens, match, rightTokens)
+
+
+def formatLine(line, width = 40):
+    """Returns a concordance line as string with the match in the middle,
+    the contexts are cut to width characters."""
+    filepath, utteranceId, leftTokens, match, rightTokens = line
+    leftString = u" ".join(leftTokens)[-width:]
+    rightString = u" ".join(rightTokens)[:width]
+    return u"%s %s %s" % (leftString.rjust(width), u" ".join(match), rightString)
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+# (C) 2011 copyright by Peter Bouda
+"""
+Checks how consistently the morphemes of a corpus are glossed.
+
+GlossConsistency counts in one pass how often each morpheme has each
+gloss. The morphemes and glosses are coded as integers, the table of
+morpheme x gloss counts is a sparse dict that only contains the pairs
+that occur. For rare pairs it keeps the files and utterances where they
+occur. outliers() then reports the glosses that are used for only a
+small share of the occurrences of a morpheme, which are often typos or
+outdated glosses:
+
+  consistency = pyannotation.consistency.analyzeFiles(glob.glob("corpus/*.eaf"), pyannotation.data.EAF, processes = 4)
+  for outlier in consistency.outliers(minCount = 10, maxShare = 0.05):
+      print(outlier['morpheme'], outlier['gloss'], outlier['expected'], outlier['locations'])
+
+The glosses of a morpheme are joined with ":", so "3SG:O" is one gloss
+label.
+"""
+
+import pyannotation.mapreduce
+
+# the pairs are coded as morpheme code * PAIR_FACTOR + gloss code
+PAIR_FACTOR = 1 << 32
+
+
+class GlossConsistency(object):
+    """
+    The sparse morpheme x gloss contingency table of a corpus.
+    maxLocations: the number of (filepath, utterance id) locations kept
+        for each morpheme/gloss pair. Outliers are rare, so their
+        locations are complete as long as they occur at most that often.
+    countUnglossed: if True, morphemes without gloss are counted with the
+        gloss "".
+    """
+
+    def __init__(self, maxLocations = 20, countUnglossed = False):
+        self.maxLocations = maxLocations
+        self.countUnglossed = countUnglossed
+        self.morphemes = []
+        self.morphemeCodes = {}
+        self.glosses = []
+        self.glossCodes = {}
+        self.filepaths = []
+        self.filepathCodes = {}
+        # pair code -> count
+        self.counts = {}
+        # morpheme code -> count
+        self.morphemeCounts = {}
+        # pair code -> list of (filepath code, utterance id)
+        self.locations = {}
+
+    def morphemeCode(self, morpheme):
+        code = self.morphemeCodes.get(morpheme)
+        if code == None:
+            code = len(self.morphemes)
+            self.morphemeCodes[morpheme] = code
+            self.morphemes.append(morpheme)
+        return code
+
+    def glossCode(self, gloss):
+        code = self.glossCodes.get(gloss)
+        if code == None:
+            code = len(self.glosses)
+            self.glossCodes[gloss] = code
+            self.glosses.append(gloss)
+        return code
+
+    def filepathCode(self, filepath):
+        code = self.filepathCodes.get(filepath)
+        if code == None:
+            code = len(self.filepaths)
+            self.filepathCodes[filepath] = code
+            self.filepaths.append(filepath)
+        return code
+
+    def add(self, morpheme, gloss, filepathCode, utteranceId, count = 1):
+        m = self.morphemeCode(morpheme)
+        pair = m * PAIR_FACTOR + self.glossCode(gloss)
+        self.counts[pair] = self.counts.get(pair, 0) + count
+        self.morphemeCounts[m] = self.morphemeCounts.get(m, 0) + count
+        locations = self.locations.setdefault(pair, [])
+        if len(locations) < self.maxLocations:
+            locations.append((filepathCode, utteranceId))
+
+    def addUtterance(self, utterance, filepathCode):
+        # add() inlined, this is the inner loop of the analysis
+        counts = self.counts
+        morphemeCodes = self.morphemeCodes
+        glossCodes = self.glossCodes
+        morphemeCounts = self.morphemeCounts
+        locations = self.locations
+        for word in utterance[2]:
+            for morpheme in word[2]:
+                if morpheme[1] == '':
+                    continue
+                glosses = morpheme[2]
+                if len(glosses) == 1:
+                    gloss = glosses[0][1]
+                else:
+                    gloss = ":".join([ g[1] for g in glosses if g[1] != '' ])
+                if gloss == '' and not self.countUnglossed:
+                    continue
+                m = morphemeCodes.get(morpheme[1])
+                if m == None:
+                    m = self.morphemeCode(morpheme[1])
+                g = glossCodes.get(gloss)
+                if g == None:
+                    g = self.glossCode(gloss)
+                pair = m * PAIR_FACTOR + g
+                count = counts.get(pair, 0)
+                counts[pair] = count + 1
+                morphemeCounts[m] = morphemeCounts.get(m, 0) + 1
+                if count < self.maxLocations:
+                    locations.setdefault(pair, []).append((filepathCode, utterance[0]))
+
+    def addTree(self, reader, filepath, tree):
+        filepathCode = self.filepathCode(filepath)
+        for utterance in reader.filteredUtterances(tree):
+            self.addUtterance(utterance, filepathCode)
+
+    def addReader(self, reader):
+        for (filepath, tree) in reader.annotationtrees:
+            self.addTree(reader, filepath, tree)
+
+    def merge(self, other):
+        """Adds the counts of the other table, its codes are translated
+        to the codes of this one."""
+        filepathCodes = [ self.filepathCode(f) for f in other.filepaths ]
+        morphemeCodes = [ self.morphemeCode(m) for m in other.morphemes ]
+        glossCodes = [ self.glossCode(g) for g in other.glosses ]
+        for pair, count in other.counts.items():
+            m = morphemeCodes[pair // PAIR_FACTOR]
+            newPair = m * PAIR_FACTOR + glossCodes[pair % PAIR_FACTOR]
+            self.counts[newPair] = self.counts.get(newPair, 0) + count
+            self.morphemeCounts[m] = self.morphemeCounts.get(m, 0) + count
+            locations = self.locations.setdefault(newPair, [])
+            for (f, utteranceId) in other.locations.get(pair, [])[:self.maxLocations - len(locations)]:
+                locations.append((filepathCodes[f], utteranceId))
+        return self
+
+    def glossesForMorpheme(self, morpheme):
+        """Returns a list of (gloss, count) tuples of the morpheme, the
+        most frequent first."""
+        m = self.morphemeCodes.get(morpheme)
+        if m == None:
+            return []
+        return [ (self.glosses[pair % PAIR_FACTOR], count)
+                 for pair, count in self.glossPairs().get(m, []) ]
+
+    def glossPairs(self):
+        # morpheme code -> list of (pair code, count), the most frequent first
+        pairs = {}
+        for pair, count in self.counts.items():
+            pairs.setdefault(pair // PAIR_FACTOR, []).append((pair, count))
+        for m in pairs:
+            pairs[m].sort(key = lambda p: (-p[1], self.glosses[p[0] % PAIR_FACTOR]))
+        return pairs
+
+    def inconsistentMorphemes(self):
+        """Returns the morphemes with more than one gloss."""
+        return sorted(self.morphemes[m] for m, pairs in self.glossPairs().items() if len(pairs) > 1)
+
+    def outliers(self, minCount = 5, maxShare = 0.1):
+        """
+        Returns the rare glosses of frequent morphemes as list of dicts,
+        ordered by morpheme and gloss. Each dict has the morpheme, the
+        rare gloss, its count, the count of the morpheme, the most
+        frequent gloss as "expected" with its count, and the list of
+        (filepath, utterance id) locations of the rare gloss.
+        minCount: only morphemes that occur at least this often.
+        maxShare: the largest share of the occurrences of the morpheme
+            that a gloss may have to be reported.
+        """
+        outliers = []
+        for m, pairs in self.glossPairs().items():
+            total = self.morphemeCounts[m]
+            if total < minCount or len(pairs) < 2:
+                continue
+            expectedPair, expectedCount = pairs[0]
+            for pair, count in pairs[1:]:
+                if float(count) / total > maxShare:
+                    continue
+                outliers.append({
+                    'morpheme' : self.morphemes[m],
+                    'gloss' : self.glosses[pair % PAIR_FACTOR],
+                    'count' : count,
+                    'morphemeCount' : total,
+                    'expected' : self.glosses[expectedPair % PAIR_FACTOR],
+                    'expectedCount' : expectedCount,
+                    'locations' : [ (self.filepaths[f], utteranceId) for (f, utteranceId) in self.locations.get(pair, []) ]
+                })
+        outliers.sort(key = lambda o: (o['morpheme'], o['gloss']))
+        return outliers
+
+
+class GlossConsistencyJob(pyannotation.mapreduce.MapReduceJob):
+    """Builds a GlossConsistency table with pyannotation.mapreduce."""
+
+    def __init__(self, maxLocations = 20, countUnglossed = False):
+        self.maxLocations = maxLocations
+        self.countUnglossed = countUnglossed
+
+    def emptyResult(self):
+        return GlossConsistency(self.maxLocations, self.countUnglossed)
+
+    def mapTree(self, reader, filepath, tree, result):
+        result.addTree(reader, filepath, tree)
+        return result
+
+    def merge(self, result, partial):
+        return result.merge(partial)
+
+
+def analyzeReader(reader, maxLocations = 20, countUnglossed = False):
+    """Returns the GlossConsistency of the files of a GlossCorpusReader."""
+    consistency = GlossConsistency(maxLocations, countUnglossed)
+    consistency.addReader(reader)
+    return consistency
+
+def analyzeFiles(filepaths, filetype, processes = None, maxLocations = 20, countUnglossed = False, backend = None, **readerArgs):
+    """Reads the files in worker processes and returns their merged
+    GlossConsistency, see pyannotation.mapreduce.mapReduce() for the
+    parameters."""
+    job = GlossConsistencyJob(maxLocations, countUnglossed)
+    return pyannotation.mapreduce.mapReduce(job, filepaths, filetype, processes = processes,
+                                            backend = backend, **readerArgs)
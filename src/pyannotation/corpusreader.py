@@ -9,15 +9,36 @@ http://nltk.googlecode.com/svn/trunk/doc/howto/corpus.html
 
 import os, glob
 import re
-from pyannotation.elan.data import EafAnnotationFileObject
-from pyannotation.elan.data import EafFromToolboxAnnotationFileObject
-from pyannotation.toolbox.data import ToolboxAnnotationFileObject
+import sys
 from pyannotation.data import AnnotationTree
 import pyannotation
 
 # interlinear types: WORDS means "no interlinear"
 (GLOSS, WORDS, POS) = range(3)
 
+# file type -> module and class of its annotation file object and the
+# default backend. The modules of the file formats and their
+# dependencies (lxml) are only imported when the first file of that
+# type is added.
+ANNOTATION_FILE_OBJECTS = {
+    pyannotation.data.EAF : ("pyannotation.elan.data", "EafAnnotationFileObject", "lxml"),
+    pyannotation.data.EAFFROMTOOLBOX : ("pyannotation.elan.data", "EafFromToolboxAnnotationFileObject", "pythonic"),
+    pyannotation.data.TOOLBOX : ("pyannotation.toolbox.data", "ToolboxAnnotationFileObject", None),
+    pyannotation.data.KURA : ("pyannotation.kura.data", "KuraAnnotationFileObject", None)
+}
+
+def createAnnotationFileObject(filepath, filetype, backend = None):
+    """Imports the module for the file type and returns the annotation
+    file object for the file, None if the file type is unknown."""
+    if filetype not in ANNOTATION_FILE_OBJECTS:
+        return None
+    moduleName, className, defaultBackend = ANNOTATION_FILE_OBJECTS[filetype]
+    __import__(moduleName)
+    cls = getattr(sys.modules[moduleName], className)
+    if defaultBackend == None:
+        return cls(filepath)
+    return cls(filepath, backend or defaultBackend)
+
 class CorpusReader(object):
     """
     The base class for all corpus readers. It provides
@@ -34,15 +55,30 @@ class CorpusReader(object):
         self.glosstierTypes = None
         self.interlineartype = WORDS
         self.annotationtrees = []
+        self.concordanceIndexes = {}
+
+    def addFile(self, filepath, filetype, locale = None, participant = None, utterancetierTypes = None, wordtierTypes = None, translationtierTypes = None, morphemetierTypes = None, glosstierTypes = None, postierTypes = None, backend = None):
+        """
+        Adds a file to the corpus.
+        backend: selects how .eaf files are loaded. "lxml" keeps the whole
+            document and is needed to write the file, "pythonic" loads the
+            annotations into indexed dicts and is faster for read-only
+            corpus access, "streaming" fills the same dicts directly while
+            reading the file and is the cheapest. The default is "lxml"
+            for EAF and "pythonic" for EAFFROMTOOLBOX files.
+        """
+        annotationTree = self.createAnnotationTree(filepath, filetype, locale, participant, utterancetierTypes, wordtierTypes, translationtierTypes, morphemetierTypes, glosstierTypes, postierTypes, backend)
+        if annotationTree != None:
+            self.annotationtrees.append([filepath, annotationTree])
 
-    def addFile(self, filepath, filetype, locale = None, participant = None, utterancetierTypes = None, wordtierTypes = None, translationtierTypes = None, morphemetierTypes = None, glosstierTypes = None, postierTypes = None):
-        annotationFileObject = None
-        if filetype == pyannotation.data.EAF:
-            annotationFileObject = EafAnnotationFileObject(filepath)
-        elif filetype == pyannotation.data.EAFFROMTOOLBOX:
-            annotationFileObject = EafFromToolboxAnnotationFileObject(filepath)
-        elif filetype == pyannotation.data.TOOLBOX:
-            annotationFileObject = ToolboxAnnotationFileObject(filepath)
+    def createAnnotationTree(self, filepath, filetype, locale = None, participant = None, utterancetierTypes = None, wordtierTypes = None, translationtierTypes = None, morphemetierTypes = None, glosstierTypes = None, postierTypes = None, backend = None):
+        """
+        Reads a file and returns its parsed AnnotationTree without adding
+        it to the corpus, None if the file type is unknown. The parameters
+        are the same as for addFile(). filepath may also be an open file
+        object.
+        """
+        annotationFileObject = createAnnotationFileObject(filepath, filetype, backend)
         if annotationFileObject != None:
             annotationTierHandler = annotationFileObject.createTierHandler()
 
@@ -89,7 +125,20 @@ class CorpusReader(object):
                     annotationTierHandler.setTranslationtierType(self.translationtierTypes)
 
             annotationTree.parse()
-            self.annotationtrees.append([filepath, annotationTree])
+            return annotationTree
+        return None
+
+    def filteredUtterances(self, tree):
+        """
+        Yields the utterances of the annotation tree that pass the locale
+        and participant filters of the corpus reader.
+        """
+        for utterance in tree.getTree():
+            if self.locale != None and utterance[4] != self.locale:
+                continue
+            if self.participant != None and utterance[5] != self.participant:
+                continue
+            yield utterance
 
     def words(self):
         """
@@ -147,6 +196,55 @@ class CorpusReader(object):
                     sents.append((words, utterance[3]))
         return sents
 
+    @classmethod
+    def fromManifest(cls, manifest, shard = 0, of = 1, weight = "size", backend = None, **kwargs):
+        """
+        Creates a corpus reader and adds the files of one shard of a
+        manifest, see pyannotation.manifest.
+        manifest: a Manifest or the path of a saved manifest.
+        shard, of: the number of the shard and the number of shards.
+        weight: "size" or "annotations", see Manifest.partition().
+        The other keyword arguments are passed to the constructor.
+        """
+        from pyannotation.manifest import Manifest
+        if not isinstance(manifest, Manifest):
+            manifest = Manifest.load(manifest)
+        reader = cls(**kwargs)
+        for entry in manifest.shard(shard, of, weight):
+            reader.addFile(entry['path'], entry['filetype'], backend = backend)
+        return reader
+
+    def concordanceIndex(self, key = "word"):
+        """
+        Returns the positional index of the words, morphemes or glosses
+        ("word", "morpheme" or "gloss") of the corpus, see
+        pyannotation.concordance. The index is built on the first call
+        and reused afterwards.
+        """
+        if key not in self.concordanceIndexes:
+            from pyannotation.concordance import ConcordanceIndex
+            self.concordanceIndexes[key] = ConcordanceIndex(self, key)
+        return self.concordanceIndexes[key]
+
+    def concordance(self, query, key = "word", left = 5, right = 5, unit = "tokens", sort = None):
+        """
+        Yields the keyword in context lines of a word, morpheme or gloss
+        as tuples (filepath, utterance id, left context, match, right
+        context). See ConcordanceIndex.concordance() for the parameters.
+        """
+        return self.concordanceIndex(key).concordance(query, left, right, unit, sort)
+
+    def addFilesAsync(self, filepaths, filetype, concurrency = 4, progress = None, executor = None, **kwargs):
+        """
+        Adds many files to the corpus without blocking the asyncio event
+        loop, use it as "await reader.addFilesAsync(paths, filetype)".
+        Needs Python 3.6, see pyannotation.aio for the parameters.
+        """
+        if sys.version_info < (3, 6):
+            raise RuntimeError("addFilesAsync needs Python 3.6")
+        from pyannotation import aio
+        return aio.addFilesAsync(self, filepaths, filetype, concurrency, progress, executor, **kwargs)
+
 
 class PosCorpusReader(CorpusReader):
     """
@@ -199,6 +297,7 @@ class PosCorpusReader(CorpusReader):
         self.translationtierTypes = translationtierTypes
         self.interlineartype = POS
         self.annotationtrees = []
+        self.concordanceIndexes = {}
 
     def taggedWords(self):
         """
@@ -329,6 +428,7 @@ class GlossCorpusReader(CorpusReader):
         self.translationtierTypes = translationtierTypes
         self.interlineartype = GLOSS
         self.annotationtrees = []
+        self.concordanceIndexes = {}
 
     def morphemes(self):
         """
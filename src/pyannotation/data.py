@@ -88,6 +88,66 @@ class AnnotationFileTierHandler(object):
     def getParticipantForTier(self, idTier):
         pass
 
+def compileSplitter(pattern):
+    """Returns a function that splits a string at the regular expression
+    pattern. Character classes of one plain character like "[-]" split
+    with str.split(), which gives the same result faster."""
+    match = re.match(r"^\[([^\\\]\^])\]$", pattern)
+    if match:
+        separator = match.group(1)
+        return lambda text: text.split(separator)
+    return re.compile(pattern).split
+
+
+class IlElementTokenizer(object):
+    """
+    Builds the ilElements of an utterance from aligned lists of words and
+    of the morpheme and gloss strings of each word, in the same way as
+    AnnotationFileParser.ilElementForString() for "word morphemes
+    glosses". The separators are compiled once per parser, the ids
+    are counted in a local variable and returned with the elements.
+    """
+
+    def __init__(self, morphemeSep = r"[-]", glossSep = r"[:]"):
+        self.splitMorphemes = compileSplitter(morphemeSep)
+        self.splitGlosses = compileSplitter(glossSep)
+
+    def ilElements(self, words, morphemeWords, glossWords, nextId):
+        """Returns the list of ilElements and the next free id. The ids
+        are "a<n>" beginning with nextId; morphemeWords and glossWords
+        may be shorter than words."""
+        splitMorphemes = self.splitMorphemes
+        splitGlosses = self.splitGlosses
+        ilElements = []
+        for i, word in enumerate(words):
+            il = ""
+            gloss = ""
+            if i < len(morphemeWords):
+                il = morphemeWords[i]
+            if i < len(glossWords):
+                gloss = glossWords[i]
+            if " " in word or " " in il or " " in gloss:
+                # the fields of ilElementForString() are separated by spaces
+                arrT = (u"%s %s %s" % (word, il, gloss)).split(" ")
+                word, il, gloss = arrT[0], arrT[1], arrT[2]
+            ilElement = [ "a%i" % nextId, word, [] ]
+            nextId = nextId + 1
+            morphemes = ilElement[2]
+            arrGloss = splitMorphemes(gloss)
+            for j, morpheme in enumerate(splitMorphemes(il)):
+                g = ""
+                if j < len(arrGloss):
+                    g = arrGloss[j]
+                glosses = []
+                for g2 in splitGlosses(g):
+                    glosses.append([ "a%i" % nextId, g2 ])
+                    nextId = nextId + 1
+                morphemes.append([ "a%i" % nextId, morpheme, glosses ])
+                nextId = nextId + 1
+            ilElements.append(ilElement)
+        return ilElements, nextId
+
+
 class AnnotationFileParser(object):
     """Just the interface of the Builders."""
 
@@ -96,6 +156,8 @@ class AnnotationFileParser(object):
         self.MORPHEME_BOUNDARY_PARSE = morphemeSep
         self.GLOSS_BOUNDARY_PARSE = glossSep
         self.lastUsedAnnotationId = 0
+        self.splitWords = compileSplitter(wordSep)
+        self.tokenizer = IlElementTokenizer(morphemeSep, glossSep)
 
     def parse(self):
         pass
@@ -106,6 +168,14 @@ class AnnotationFileParser(object):
     def removeAnnotationsWithRef(self, idRefAnn):
         pass
 
+    def removeAnnotationsWithIds(self, idsAnnotations):
+        """Removes all annotations with the given ids and all annotations
+        that refer to them. Builders should override this with a batch
+        implementation, the default just removes one id after the other."""
+        for idAnnotation in idsAnnotations:
+            self.removeAnnotationWithId(idAnnotation)
+            self.removeAnnotationsWithRef(idAnnotation)
+
     def updatePrevAnnotationForAnnotation(self, idAnnotation, idPrevAnn = None):
         pass
 
@@ -118,19 +188,15 @@ class AnnotationFileParser(object):
             il = arrT[1]
         if len(arrT) > 2:
             gloss = arrT[2]
-        ilElement = [ "a%i" % self.useNextAnnotationId(), word, [] ]
-        arrIl = re.split(self.MORPHEME_BOUNDARY_PARSE, il)
-        arrGloss = re.split(self.MORPHEME_BOUNDARY_PARSE, gloss)
-        for i in range(len(arrIl)):
-            g = ""
-            if i < len(arrGloss):
-                g = arrGloss[i]
-            arrG = re.split(self.GLOSS_BOUNDARY_PARSE, g)
-            arrG2 = []
-            for g2 in arrG:
-                arrG2.append([ "a%i" % self.useNextAnnotationId(), g2])
-            ilElement[2].append([ "a%i" % self.useNextAnnotationId(), arrIl[i], arrG2 ])
-        return ilElement
+        return self.ilElementsForWords([word], [il], [gloss])[0]
+
+    def ilElementsForWords(self, words, morphemeWords, glossWords):
+        """Returns the ilElements of the words of an utterance, the
+        morphemes and glosses of each word are strings joined with the
+        separators; see IlElementTokenizer."""
+        ilElements, self.lastUsedAnnotationId = self.tokenizer.ilElements(
+            words, morphemeWords, glossWords, self.lastUsedAnnotationId)
+        return ilElements
 
     def getLastUsedAnnotationId(self):
         return self.lastUsedAnnotationId
@@ -150,14 +216,36 @@ class AnnotationTree(object):
         self.GLOSS_BOUNDARY_BUILD = glossSep
         self.filters = []
         self.filteredUtteranceIds = [[]]
+        self.index = None
 
     def getTree(self):
         return self.tree
 
     def parse(self):
         self.tree = self.builder.parse()
+        self.resetIndex()
         self.resetFilters()
 
+    def resetIndex(self):
+        """Has to be called after utterances or words were added to or
+        removed from the tree."""
+        self.index = None
+
+    def getIndex(self):
+        """Returns a dict with the utterances by id and the words by id,
+        each as a list of [utterance, word] in the order of the tree, so
+        that lookups by id do not have to walk the whole tree."""
+        if self.index == None:
+            utterances = {}
+            words = {}
+            for utterance in self.tree:
+                if utterance[0] not in utterances:
+                    utterances[utterance[0]] = utterance
+                for word in utterance[2]:
+                    words.setdefault(word[0], []).append([utterance, word])
+            self.index = { 'utterances' : utterances, 'words' : words }
+        return self.index
+
     def getNextAnnotationId(self):
         return self.builder.getNextAnnotationId()
 
@@ -174,16 +262,16 @@ class AnnotationTree(object):
         return [utterance[0] for utterance in self.tree if utterance[6] == tierId]
 
     def getUtteranceById(self, utteranceId):
-        for utterance in self.tree:
-            if utterance[0] == utteranceId:
-                return utterance[1]
+        utterance = self.getIndex()['utterances'].get(utteranceId)
+        if utterance != None:
+            return utterance[1]
         return ''
 
     def setUtterance(self, utteranceId, strUtterance):
-        for utterance in self.tree:
-            if utterance[0] == utteranceId:
-                utterance[1] = strUtterance
-                return True
+        utterance = self.getIndex()['utterances'].get(utteranceId)
+        if utterance != None:
+            utterance[1] = strUtterance
+            return True
         return False
         
     def getTranslationById(self, translationId):
@@ -210,26 +298,25 @@ class AnnotationTree(object):
         return False
 
     def getWordById(self, wordId):
-        for utterance in self.tree:
-            for word in utterance[2]:
-                if word[0] == wordId:
-                    return word[1]
+        words = self.getIndex()['words'].get(wordId)
+        if words:
+            return words[0][1][1]
         return ''
 
     def getWordIdsForUtterance(self, utteranceId):
-        for utterance in self.tree:
-            if utterance[0] == utteranceId:
-                return [w[0] for w in utterance[2]]
+        utterance = self.getIndex()['utterances'].get(utteranceId)
+        if utterance != None:
+            return [w[0] for w in utterance[2]]
         return []
 
     def getTranslationsForUtterance(self, utteranceId):
-        for utterance in self.tree:
-            if utterance[0] == utteranceId:
-                return utterance[3]
+        utterance = self.getIndex()['utterances'].get(utteranceId)
+        if utterance != None:
+            return utterance[3]
         return ''
 
     def getMorphemeStringForWord(self, wordId):
-        m = [morpheme[1] for u in self.tree for w in u[2] if w[0] == wordId for morpheme in w[2]]
+        m = [morpheme[1] for u, w in self.getIndex()['words'].get(wordId, []) for morpheme in w[2]]
         return self.MORPHEME_BOUNDARY_BUILD.join(m)
 
     def ilElementForString(self, text):
@@ -237,19 +324,18 @@ class AnnotationTree(object):
 
     def getGlossStringForWord(self, wordId):
         l = []
-        for u in self.tree:
-            for w in u[2]:
-                if w[0] == wordId:
-                    for m in w[2]:
-                        f = [gloss[1] for gloss in m[2]]
-                        l.append(self.GLOSS_BOUNDARY_BUILD.join(f))
+        for u, w in self.getIndex()['words'].get(wordId, []):
+            for m in w[2]:
+                f = [gloss[1] for gloss in m[2]]
+                l.append(self.GLOSS_BOUNDARY_BUILD.join(f))
         return self.MORPHEME_BOUNDARY_BUILD.join(l)
 
     def setIlElementForWordId(self, wordId, ilElement):
-        for u in self.tree:
+        words = self.getIndex()['words'].get(wordId)
+        if words:
+            u, w = words[0]
             for i in range(len(u[2])):
-                w = u[2][i]
-                if w[0] == wordId:
+                if u[2][i] is w:
                     # fill the new ilElement with old Ids, generate new Ids for new elements
                     ilElement[0] = wordId
                     for j in range(len(ilElement[2])):
@@ -263,44 +349,62 @@ class AnnotationTree(object):
                             else:
                                 ilElement[2][j][2][k][0] = "a%i" % self.getNextAnnotationId()
                     u[2][i] = ilElement
+                    words[0][1] = ilElement
                     return True
         return False
 
+    def getAnnotationIdsForWord(self, word):
+        ids = []
+        for m in word[2]:
+            for g in m[2]:
+                ids.append(g[0])
+            ids.append(m[0])
+        ids.append(word[0])
+        return [id for id in ids if id != '']
+
+    def getAnnotationIdsForUtterance(self, utterance):
+        ids = []
+        for w in utterance[2]:
+            ids.extend(self.getAnnotationIdsForWord(w))
+        for t in utterance[3]:
+            if t[0] != '':
+                ids.append(t[0])
+        if utterance[0] != '':
+            ids.append(utterance[0])
+        return ids
+
     def removeUtteranceWithId(self, utteranceId):
-        i = 0
+        return self.removeUtterancesWithIds([utteranceId]) > 0
+
+    def removeUtterancesWithIds(self, utteranceIds):
+        """Removes all utterances with the given ids from the tree and
+        all their annotations from the file. The annotations are
+        collected first and then removed by the builder in one batch.
+        Returns the number of removed utterances."""
+        utteranceIds = set(utteranceIds)
+        annotationIds = []
+        tree = []
         for utterance in self.tree:
-            if utterance[0] == utteranceId:
-                # found utterances, delete all elements from tree
-                for w in utterance[2]:
-                    for m in w[2]:
-                        for g in m[2]:
-                            self.builder.removeAnnotationWithId(g[0])
-                            self.builder.removeAnnotationsWithRef(g[0])
-                        self.builder.removeAnnotationWithId(m[0])
-                        self.builder.removeAnnotationsWithRef(m[0])
-                    self.builder.removeAnnotationWithId(w[0])
-                    self.builder.removeAnnotationsWithRef(w[0])
-                for t in utterance[3]:
-                    self.builder.removeAnnotationWithId(t[0])                    
-                    self.builder.removeAnnotationsWithRef(t[0])
-                self.builder.removeAnnotationWithId(utteranceId)
-                self.builder.removeAnnotationsWithRef(utteranceId)
-                self.tree.pop(i)
-                return True
-            i = i + 1
-        return False
+            if utterance[0] in utteranceIds:
+                annotationIds.extend(self.getAnnotationIdsForUtterance(utterance))
+            else:
+                tree.append(utterance)
+        if len(annotationIds) > 0:
+            self.builder.removeAnnotationsWithIds(annotationIds)
+        removed = len(self.tree) - len(tree)
+        self.tree[:] = tree
+        self.resetIndex()
+        return removed
 
     def removeWordWithId(self, wordId):
-        for utterance in self.tree:
+        words = self.getIndex()['words'].get(wordId)
+        if words:
+            utterance = words[0][0]
             i = 0
             for w in utterance[2]:
-                if w[0] == wordId:
-                    for m in w[2]:
-                        for g in m[2]:
-                            self.builder.removeAnnotationWithId(g[0])
-                            self.builder.removeAnnotationsWithRef(g[0])
-                        self.builder.removeAnnotationWithId(m[0])
-                        self.builder.removeAnnotationsWithRef(m[0])
+                if w is words[0][1]:
+                    morphemeIds = [id for id in self.getAnnotationIdsForWord(w) if id != wordId]
+                    self.builder.removeAnnotationsWithIds(morphemeIds)
                     self.builder.removeAnnotationWithId(wordId)
                     # link next word to prev, if those are there
                     if i > 0 and len(utterance[2]) > (i+1):
@@ -313,6 +417,7 @@ class AnnotationTree(object):
                         self.builder.updatePrevAnnotationForAnnotation(nextwordId)
                     self.builder.removeAnnotationsWithRef(wordId)
                     utterance[2].pop(i)
+                    self.resetIndex()
                     return True
                 i = i + 1
         return False
@@ -322,7 +427,8 @@ class AnnotationTree(object):
         
     def appendFilter(self, filter):
         self.filters.append(filter)
-        newFilteredUtterances = [utterance[0] for utterance in self.tree if utterance[0] in self.filteredUtteranceIds[-1] and filter.utterancePassesFilter(utterance)]
+        filteredUtteranceIds = set(self.filteredUtteranceIds[-1])
+        newFilteredUtterances = [utterance[0] for utterance in self.tree if utterance[0] in filteredUtteranceIds and filter.utterancePassesFilter(utterance)]
         self.filteredUtteranceIds.append(newFilteredUtterances)
         
     def lastFilter(self):
@@ -348,7 +454,8 @@ class AnnotationTree(object):
     def resetFilters(self):
         self.filteredUtteranceIds = [self.getUtteranceIds()]
         for filter in self.filters:
-            newFilteredUtterances = [utterance[0] for utterance in self.tree if utterance[0] in self.filteredUtteranceIds[-1] and filter.utterancePassesFilter(utterance)]
+            filteredUtteranceIds = set(self.filteredUtteranceIds[-1])
+            newFilteredUtterances = [utterance[0] for utterance in self.tree if utterance[0] in filteredUtteranceIds and filter.utterancePassesFilter(utterance)]
             self.filteredUtteranceIds.append(newFilteredUtterances)
 
 
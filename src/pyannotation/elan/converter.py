@@ -2,13 +2,198 @@
 # -*- coding: utf-8 -*-
 """
 A class to convert Elan's .eaf files to other formats.
+
+Convert.toAgFile() converts an .eaf file to an Annotation Graph XML file
+without loading the document, the AG XML is written while the .eaf file
+is read. The output is the same as the one of the XSLT stylesheet
+xsl/elan2ag.xsl, which is still available as Convert.toAgXslt():
+
+  pyannotation.elan.converter.Convert.toAgFile("corpus.eaf", "corpus.ag.xml")
 """
 __author__ =  'Peter Bouda'
 __version__=  '0.1.1'
 
 import os
+import io
 from lxml import etree
-from StringIO import StringIO
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import BytesIO as StringIO
+
+from pyannotation.compression import openAnnotationFile
+
+AG_PREFIX = u"from_elan:AG1:"
+
+AG_HEADER = u'''<?xml version="1.0" encoding="utf-8"?>
+<AGSet xmlns="http://www.ldc.upenn.edu/atlas/ag/" xmlns:xlink="http://www.w3.org/1999/xlink" xmlns:dc="http://purl.org/DC/documents/rec-dces-19990702.htm" id="from_elan" version="1.0">'''
+
+AG_FOOTER = u"</AG></AGSet>\n"
+
+# the elements that the stylesheet creates from its own templates are in
+# the XHTML namespace of the stylesheet
+XHTML_NAMESPACE = u' xmlns="http://www.w3.org/1999/xhtml"'
+
+# escaping of text and attribute values as done by libxml2
+TEXT_ESCAPES = [ (u"&", u"&amp;"), (u"<", u"&lt;"), (u">", u"&gt;"), (u"\r", u"&#13;") ]
+ATTRIBUTE_ESCAPES = TEXT_ESCAPES + [ (u'"', u"&quot;"), (u"\n", u"&#10;"), (u"\t", u"&#9;") ]
+
+def escapeText(text):
+    for c, entity in TEXT_ESCAPES:
+        if c in text:
+            text = text.replace(c, entity)
+    return text
+
+def escapeAttribute(value):
+    for c, entity in ATTRIBUTE_ESCAPES:
+        if c in value:
+            value = value.replace(c, entity)
+    return value
+
+def textElement(name, attributes, text):
+    """Returns the XML string of an element with the given attributes, a
+    list of (name, value) tuples, and text content."""
+    s = u"<" + name + u"".join([ u' %s="%s"' % (a, escapeAttribute(v)) for (a, v) in attributes ])
+    if text == None or text == u"":
+        return s + u"/>"
+    return s + u">" + escapeText(text) + u"</" + name + u">"
+
+def metadataElementName(tierId, suffix):
+    name = tierId + suffix
+    try:
+        etree.Element(name)
+    except ValueError:
+        raise ValueError("the tier id %s is not valid in the name of an AG metadata element" % tierId)
+    return name
+
+def iterElements(source, tags):
+    """Yields the events of iterparse() for the start and end tags of the
+    elements with the given names; the elements are removed from the
+    document when the end event was consumed."""
+    for event, element in etree.iterparse(source, events = ("start", "end"), tag = tags):
+        yield event, element
+        if event == "end":
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+
+def readEafSource(source, consumer):
+    """Calls consumer with a binary file object of the .eaf file at the
+    path or of the file object source. A file object is read from its
+    current position, and is set back to that position afterwards."""
+    if hasattr(source, 'read'):
+        position = source.tell()
+        try:
+            return consumer(openAnnotationFile(source))
+        finally:
+            source.seek(position)
+    f = openAnnotationFile(source)
+    try:
+        return consumer(f)
+    finally:
+        f.close()
+
+def scanEaf(f):
+    """Returns the tiers of the .eaf file as list of attribute dicts and
+    a dict from the ids of the alignable annotations to their time
+    slots."""
+    tiers = []
+    timeSlots = {}
+    for event, element in iterElements(f, ("TIER", "ANNOTATION", "ALIGNABLE_ANNOTATION", "TIME_SLOT")):
+        if event == "start":
+            if element.tag == "TIER":
+                tiers.append(dict(element.attrib))
+        elif element.tag == "ALIGNABLE_ANNOTATION":
+            annotationId = element.get("ANNOTATION_ID")
+            if annotationId not in timeSlots:
+                timeSlots[annotationId] = (element.get("TIME_SLOT_REF1", u""), element.get("TIME_SLOT_REF2", u""))
+    return tiers, timeSlots
+
+def annotationValue(annotation):
+    for value in annotation.iterfind("ANNOTATION_VALUE"):
+        if value.text:
+            return value.text
+    return u""
+
+def writeAg(source, out):
+    """
+    Converts the .eaf file at the path or the binary file object source
+    to Annotation Graph XML and writes it to the binary file object out.
+    The .eaf file is read twice: first for the tiers and the time slots
+    of the alignable annotations, which the metadata and the anchors of
+    the ref annotations need before they appear in the file, then again
+    to write the AG XML element by element.
+    """
+    tiers, timeSlots = readEafSource(source, scanEaf)
+    write = lambda s: out.write(s.encode("utf-8"))
+
+    def writeMetadata():
+        write(u'<AG id="from_elan:AG1" type="type" timeline="from_elan:Timeline1">')
+        metadata = []
+        for tier in tiers:
+            tierId = tier.get("TIER_ID", u"")
+            metadata.append(textElement(metadataElementName(tierId, u".ElanTier.DefaultLocale"), [], tier.get("DEFAULT_LOCALE")))
+            if "PARENT_REF" in tier:
+                metadata.append(textElement(metadataElementName(tierId, u".ElanTier.Parent"), [], tier["PARENT_REF"]))
+        if len(metadata) == 0:
+            write(u"<Metadata/>")
+        else:
+            write(u"<Metadata>" + u"".join(metadata) + u"</Metadata>")
+
+    def writeAnnotation(annotation, start, end, tierType, tierId):
+        write(u'<Annotation%s id="%s" type="%s" startAnchor="%s" endAnchor="%s">%s%s</Annotation>' % (
+            XHTML_NAMESPACE,
+            escapeAttribute(AG_PREFIX + annotation.get("ANNOTATION_ID", u"")),
+            escapeAttribute(tierType), escapeAttribute(AG_PREFIX + start), escapeAttribute(AG_PREFIX + end),
+            textElement(u"Feature", [ (u"name", u"description") ], annotationValue(annotation)),
+            textElement(u"Feature", [ (u"name", u"tier") ], tierId)))
+
+    def writeElements(f):
+        write(AG_HEADER)
+        timeUnits = None
+        agStarted = False
+        tierType = tierId = u""
+        for event, element in iterElements(f, ("HEADER", "TIME_ORDER", "TIME_SLOT", "TIER", "ANNOTATION")):
+            tag = element.tag
+            if event == "start":
+                if tag == "TIER" or tag == "TIME_ORDER":
+                    if not agStarted:
+                        writeMetadata()
+                        agStarted = True
+                    if tag == "TIER":
+                        tierType = element.get("LINGUISTIC_TYPE_REF", u"")
+                        tierId = element.get("TIER_ID", u"")
+            elif tag == "TIME_SLOT":
+                write(textElement(u"Anchor" + XHTML_NAMESPACE, [
+                    (u"id", AG_PREFIX + element.get("TIME_SLOT_ID", u"")),
+                    (u"offset", element.get("TIME_VALUE", u"")),
+                    (u"unit", timeUnits or u""), (u"signals", u"") ], None))
+            elif tag == "ANNOTATION":
+                for annotation in element.iterfind("ALIGNABLE_ANNOTATION"):
+                    writeAnnotation(annotation, annotation.get("TIME_SLOT_REF1", u""),
+                                    annotation.get("TIME_SLOT_REF2", u""), tierType, tierId)
+                for annotation in element.iterfind("REF_ANNOTATION"):
+                    start, end = timeSlots.get(annotation.get("ANNOTATION_REF"), (u"", u""))
+                    writeAnnotation(annotation, start, end, tierType, tierId)
+            elif tag == "HEADER":
+                units = element.get("TIME_UNITS", u"")
+                if not timeUnits:
+                    timeUnits = units
+                signals = [ textElement(u"Signal", [
+                        (u"id", u"from_elan:Timeline1:Signal%i" % (i + 1)),
+                        (u"mimeClass", m.get("MIME_TYPE", u"")), (u"mimeType", m.get("MIME_TYPE", u"")),
+                        (u"encoding", u"not determined"), (u"xlink:type", u"simple"),
+                        (u"xlink:href", m.get("MEDIA_URL", u"")), (u"unit", units) ], None)
+                    for i, m in enumerate(element.iterfind("MEDIA_DESCRIPTOR")) ]
+                if len(signals) == 0:
+                    write(u'<Timeline%s id="from_elan:Timeline1"/>' % XHTML_NAMESPACE)
+                else:
+                    write(u'<Timeline%s id="from_elan:Timeline1">%s</Timeline>' % (XHTML_NAMESPACE, u"".join(signals)))
+        if not agStarted:
+            writeMetadata()
+        write(AG_FOOTER)
+
+    readEafSource(source, writeElements)
 
 class Callable:
     def __init__(self, anycallable):
@@ -25,6 +210,37 @@ class Convert(object):
         
         ag_xml = pyannotation.elan.converter.Convert.toAg(elan_xml)
 
+        """
+        out = io.BytesIO()
+        writeAg(io.BytesIO(text.encode('utf-8')), out)
+        return out.getvalue().decode('utf-8')
+
+    toAg = Callable(toAg)
+
+    def toAgFile(eafFile, agFile):
+        """
+        Convert an .eaf file to an Annotation Graph XML file. Both
+        arguments are paths or binary file objects, the .eaf file may
+        be compressed. Call this as a static function:
+
+        pyannotation.elan.converter.Convert.toAgFile("corpus.eaf", "corpus.ag.xml")
+
+        """
+        if hasattr(agFile, 'write'):
+            writeAg(eafFile, agFile)
+            return
+        out = io.open(agFile, 'wb')
+        try:
+            writeAg(eafFile, out)
+        finally:
+            out.close()
+
+    toAgFile = Callable(toAgFile)
+
+    def toAgXslt(text):
+        """
+        Convert an Elan XML string to a Annotation Graph XML string with
+        the stylesheet xsl/elan2ag.xsl, which loads the whole document.
         """
         xsl_path = os.path.join(os.path.dirname(__file__), '..',  'xsl', 'elan2ag.xsl')
         xslt_doc = etree.parse(xsl_path)
@@ -35,5 +251,5 @@ class Convert(object):
         result = result.decode('utf-8')
         return result
  
-    toAg = Callable(toAg)
+    toAgXslt = Callable(toAgXslt)
  
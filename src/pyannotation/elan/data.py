@@ -11,7 +11,9 @@ EafTrees are read-/writeable.
 """
 
 import os, glob, re
+import bisect
 import pyannotation.data
+from pyannotation.compression import openAnnotationFile, isCompressed
 
 from copy import deepcopy
 
@@ -22,10 +24,31 @@ from xml.parsers import expat
 
 ############################################# Builders
 
+# backends to load .eaf files: "lxml" is the read-/writeable Eaf,
+# "pythonic" the read-only, indexed EafPythonic and "streaming" the
+# same EafPythonic, but filled directly from the expat events
+EAF_BACKENDS = ("lxml", "pythonic", "streaming")
+
+# runs of spaces in the utterances of Toolbox files
+MULTIPLE_SPACES = re.compile(r" +")
+
+def createEafForBackend(filepath, backend):
+    if backend == "lxml":
+        return Eaf(filepath)
+    elif backend == "pythonic":
+        return EafPythonic(filepath)
+    elif backend == "streaming":
+        eaf = EafPythonic()
+        eaf.loadStreaming(filepath)
+        return eaf
+    raise ValueError("unknown eaf backend: %s" % backend)
+
+
 class EafAnnotationFileObject(pyannotation.data.AnnotationFileObject):
 
-    def __init__(self, filepath):
+    def __init__(self, filepath, backend = "lxml"):
         pyannotation.data.AnnotationFileObject.__init__(self, filepath)
+        self.backend = backend
         self.setFilepath(filepath)
 
     def getFile(self):
@@ -36,7 +59,7 @@ class EafAnnotationFileObject(pyannotation.data.AnnotationFileObject):
 
     def setFilepath(self, filepath):
         self.filepath = filepath
-        self.file = Eaf(self.filepath)
+        self.file = createEafForBackend(self.filepath, self.backend)
 
     def createTierHandler(self):
         if self.tierHandler == None:
@@ -61,8 +84,9 @@ class EafAnnotationFileObject(pyannotation.data.AnnotationFileObject):
 
 class EafFromToolboxAnnotationFileObject(pyannotation.data.AnnotationFileObject):
 
-    def __init__(self, filepath):
+    def __init__(self, filepath, backend = "pythonic"):
         pyannotation.data.AnnotationFileObject.__init__(self, filepath)
+        self.backend = backend
         self.setFilepath(filepath)
 
     def getFile(self):
@@ -73,7 +97,7 @@ class EafFromToolboxAnnotationFileObject(pyannotation.data.AnnotationFileObject)
 
     def setFilepath(self, filepath):
         self.filepath = filepath
-        self.file = EafPythonic(self.filepath)
+        self.file = createEafForBackend(self.filepath, self.backend)
 
     def createTierHandler(self):
         if self.tierHandler == None:
@@ -102,89 +126,152 @@ class EafAnnotationFileTierHandler(pyannotation.data.AnnotationFileTierHandler):
         self.GLOSSTIER_TYPEREFS = [ "glosses", "gloss", "Glossen", "Gloss", "Glosse" ]
         self.POSTIER_TYPEREFS = [ "part of speech", "parts of speech", "Wortart", "Wortarten" ]
         self.TRANSLATIONTIER_TYPEREFS = [ "translation", "translations", u"Übersetzung",  u"Übersetzungen" ]
+        self.resetTierTree()
 
     def setUtterancetierType(self, type):
         if isinstance(type, list):
             self.UTTERANCETIER_TYPEREFS = type
         else:
             self.UTTERANCETIER_TYPEREFS = [type]
+        self.resetTierTree()
 
     def setWordtierType(self, type):
         if isinstance(type, list):
             self.WORDTIER_TYPEREFS = type
         else:
             self.WORDTIER_TYPEREFS = [type]
+        self.resetTierTree()
 
     def setMorphemetierType(self, type):
         if isinstance(type, list):
             self.MORPHEMETIER_TYPEREFS = type
         else:
             self.MORPHEMETIER_TYPEREFS = [type]
+        self.resetTierTree()
 
     def setGlosstierType(self, type):
         if isinstance(type, list):
             self.GLOSSTIER_TYPEREFS = type
         else:
             self.GLOSSTIER_TYPEREFS = [type]
+        self.resetTierTree()
 
     def setPostierType(self, type):
         if isinstance(type, list):
             self.POSTIER_TYPEREFS = type
         else:
             self.POSTIER_TYPEREFS = [type]
+        self.resetTierTree()
 
     def setTranslationtierType(self, type):
         if isinstance(type, list):
             self.TRANSLATIONTIER_TYPEREFS = type
         else:
             self.TRANSLATIONTIER_TYPEREFS = [type]
+        self.resetTierTree()
+
+    def getTypeRefsForRoles(self):
+        return {
+            'utterance' : self.UTTERANCETIER_TYPEREFS,
+            'word' : self.WORDTIER_TYPEREFS,
+            'morpheme' : self.MORPHEMETIER_TYPEREFS,
+            'gloss' : self.GLOSSTIER_TYPEREFS,
+            'pos' : self.POSTIER_TYPEREFS,
+            'translation' : self.TRANSLATIONTIER_TYPEREFS
+        }
+
+    def resetTierTree(self):
+        self.tierTree = None
+        self.tierIdsForType = {}
+        self.tierIdsForRole = {}
+
+    def getTierTree(self):
+        """Returns a dict tier id -> tier dict with the linguistic type,
+        time alignability, participant, locale, parent, child tier ids and
+        the roles (utterance, word, ...) of each tier. The tree is built
+        once from the file and cached until a tier is added or a tier
+        type is changed."""
+        if self.tierTree == None:
+            tierTree = {}
+            tierInfos = self.eaf.getTierInfos()
+            for idTier, info in tierInfos:
+                tier = dict(info)
+                tier['children'] = []
+                tier['roles'] = []
+                tierTree[idTier] = tier
+                self.tierIdsForType.setdefault(tier['linguistic_type'], []).append(idTier)
+            for idTier, info in tierInfos:
+                if info['parent'] in tierTree:
+                    tierTree[info['parent']]['children'].append(idTier)
+            for role, types in self.getTypeRefsForRoles().items():
+                for type in types:
+                    for idTier in self.tierIdsForType.get(type, []):
+                        tierTree[idTier]['roles'].append(role)
+            self.tierTree = tierTree
+        return self.tierTree
+
+    def getTierIdsForRole(self, role, parent = None):
+        tierTree = self.getTierTree()
+        if (role, parent) not in self.tierIdsForRole:
+            ret = []
+            for type in self.getTypeRefsForRoles()[role]:
+                for idTier in self.tierIdsForType.get(type, []):
+                    if parent == None or tierTree[idTier]['parent'] == parent:
+                        ret.append(idTier)
+            self.tierIdsForRole[(role, parent)] = ret
+        return list(self.tierIdsForRole[(role, parent)])
 
     def getUtterancetierIds(self, parent = None):
-        ret = []
-        for type in self.UTTERANCETIER_TYPEREFS:
-            ret.extend(self.eaf.getTierIdsForLinguisticType(type, parent))
-        return ret
+        return self.getTierIdsForRole('utterance', parent)
 
     def getWordtierIds(self, parent = None):
-        ret = []
-        for type in self.WORDTIER_TYPEREFS:
-            ret.extend(self.eaf.getTierIdsForLinguisticType(type, parent))
-        return ret
+        return self.getTierIdsForRole('word', parent)
 
     def getMorphemetierIds(self, parent = None):
-        ret = []
-        for type in self.MORPHEMETIER_TYPEREFS:
-            ret.extend(self.eaf.getTierIdsForLinguisticType(type, parent))
-        return ret
+        return self.getTierIdsForRole('morpheme', parent)
 
     def getGlosstierIds(self, parent = None):
-        ret = []
-        for type in self.GLOSSTIER_TYPEREFS:
-            ret.extend(self.eaf.getTierIdsForLinguisticType(type, parent))
-        return ret
+        return self.getTierIdsForRole('gloss', parent)
 
     def getPostierIds(self, parent = None):
-        ret = []
-        for type in self.POSTIER_TYPEREFS:
-            ret.extend(self.eaf.getTierIdsForLinguisticType(type, parent))
-        return ret
+        return self.getTierIdsForRole('pos', parent)
 
     def getTranslationtierIds(self, parent = None):
-        ret = []
-        for type in self.TRANSLATIONTIER_TYPEREFS:
-            ret.extend(self.eaf.getTierIdsForLinguisticType(type, parent))
+        return self.getTierIdsForRole('translation', parent)
+
+    def getChildTierIds(self, idTier):
+        return list(self.getTierTree()[idTier]['children'])
+
+    def getParentForTier(self, idTier):
+        return self.getTierTree()[idTier]['parent']
+
+    def isTimeAlignable(self, idTier):
+        return self.getTierTree()[idTier]['time_alignable']
+
+    def childTiersFor(self, idTier):
+        """Returns a dict tier id -> linguistic type of all tiers below
+        the tier, like Eaf.childTiersFor(), from the tier tree."""
+        tierTree = self.getTierTree()
+        ret = {}
+        stack = list(tierTree[idTier]['children']) if idTier in tierTree else []
+        while len(stack) > 0:
+            idChild = stack.pop()
+            if idChild not in ret:
+                ret[idChild] = tierTree[idChild]['linguistic_type']
+                stack.extend(tierTree[idChild]['children'])
         return ret
 
     def addTier(self, tierId, tierType, tierTypeConstraint, parentTier, tierDefaultLocale, tierParticipant):
         self.eaf.addTier(tierId, tierType, parentTier, tierDefaultLocale, tierParticipant)
         if not self.eaf.hasLinguisticType(tierType):
             self.eaf.addLinguisticType(tierType, tierTypeConstraint)
+        self.resetTierTree()
 
     def getLocaleForTier(self, idTier):
-        return self.eaf.getLocaleForTier(idTier)
+        return self.getTierTree()[idTier]['locale']
 
     def getParticipantForTier(self, idTier):
-        return self.eaf.getParticipantForTier(idTier)
+        return self.getTierTree()[idTier]['participant']
 
 
 class EafAnnotationFileParser(pyannotation.data.AnnotationFileParser):
@@ -213,8 +300,8 @@ class EafAnnotationFileParser(pyannotation.data.AnnotationFileParser):
                     utterance = self.eaf.getAnnotationValueForAnnotation(uTier, uId)
                     translations = []
                     ilElements = []
-                    locale = self.eaf.getLocaleForTier(uTier)
-                    participant = self.eaf.getParticipantForTier(uTier)
+                    locale = self.tierBuilder.getLocaleForTier(uTier)
+                    participant = self.tierBuilder.getParticipantForTier(uTier)
                     translationTierIds = self.tierBuilder.getTranslationtierIds(uTier)
                     for tTier in translationTierIds:
                         transIds = self.eaf.getSubAnnotationIdsForAnnotationInTier(uId, uTier, tTier)
@@ -233,8 +320,8 @@ class EafAnnotationFileParser(pyannotation.data.AnnotationFileParser):
         else: # if self.utterancesTiers != []
             for wTier in self.tierBuilder.getWordtierIds():
                 translations = []
-                locale = self.eaf.getLocaleForTier(wTier)
-                participant = self.eaf.getParticipantForTier(wTier)
+                locale = self.tierBuilder.getLocaleForTier(wTier)
+                participant = self.tierBuilder.getParticipantForTier(wTier)
                 wordsIds = self.eaf.getAnnotationIdsForTier(wTier)
                 for wordId in wordsIds:
                     ilElements.append(self.getIlElementForWordId(wordId, wTier))   
@@ -289,6 +376,9 @@ class EafAnnotationFileParser(pyannotation.data.AnnotationFileParser):
     def removeAnnotationsWithRef(self, idRefAnn):
         self.eaf.removeAnnotationsWithRef(idRefAnn)
 
+    def removeAnnotationsWithIds(self, idsAnnotations):
+        self.eaf.removeAnnotationsWithIds(idsAnnotations)
+
     def updatePrevAnnotationForAnnotation(self, idAnnotation, idPrevAnn = None):
         self.eaf.updatePrevAnnotationForAnnotation(idAnnotation, idPrevAnn)
 
@@ -393,58 +483,86 @@ class EafFromToolboxAnnotationFileParser(pyannotation.data.AnnotationFileParser)
         self.lastUsedAnnotationId = self.lastUsedAnnotationId + 1
         return self.lastUsedAnnotationId
 
+    def createTierPlan(self):
+        """
+        Returns the plan of the tiers for parse(), computed once per file:
+        the utterance tiers with locale and participant, the translation
+        and word tiers below "ref", the gloss tiers of each word tier, and
+        for each of these tiers the values of its annotations and its ref
+        annotations grouped by annotation ref. Tiers that are time
+        alignable have no groups, their annotations are looked up by time.
+        """
+        tierBuilder = self.tierBuilder
+        plan = {
+            'utteranceTiers' : [ (uTier, tierBuilder.getLocaleForTier(uTier), tierBuilder.getParticipantForTier(uTier))
+                                 for uTier in tierBuilder.getUtterancetierIds() ],
+            'translationTiers' : tierBuilder.getTranslationtierIds("ref"),
+            'wordTiers' : [ (wTier, tierBuilder.getGlosstierIds(wTier)) for wTier in tierBuilder.getWordtierIds("ref") ],
+            'values' : {},
+            'children' : {},
+            'refs' : {}
+        }
+        tierIds = set(plan['translationTiers'])
+        for wTier, glossTierIds in plan['wordTiers']:
+            tierIds.add(wTier)
+            tierIds.update(glossTierIds)
+        for idTier in tierIds:
+            plan['values'][idTier] = self.eaf.getAnnotationValuesForTier(idTier)
+            if not tierBuilder.isTimeAlignable(idTier):
+                plan['children'][idTier] = self.eaf.getRefAnnotationIdsByAnnotationRef(idTier)
+        plan['values']["ref"] = self.eaf.getAnnotationValuesForTier("ref")
+        # the annotation ref of each utterance
+        for uTier, locale, participant in plan['utteranceTiers']:
+            refs = {}
+            for annRef, ids in self.eaf.getRefAnnotationIdsByAnnotationRef(uTier).items():
+                for id in ids:
+                    refs[id] = annRef
+            plan['refs'][uTier] = refs
+        return plan
+
+    def getChildAnnotationIds(self, plan, idAnn, idTier, idSubTier):
+        children = plan['children'].get(idSubTier)
+        if children == None or idAnn == None:
+            return self.eaf.getSubAnnotationIdsForAnnotationInTier(idAnn, idTier, idSubTier)
+        return children.get(idAnn, [])
+
     def parse(self):
         tree = []
         self.utteranceTierIds = self.tierBuilder.getUtterancetierIds()
-        for uTier in self.utteranceTierIds:
+        plan = self.createTierPlan()
+        values = plan['values']
+        refValues = values["ref"]
+        for uTier, locale, participant in plan['utteranceTiers']:
+            refs = plan['refs'][uTier]
             utterancesIds = self.eaf.getAlignableAnnotationIdsForTier(uTier) + self.eaf.getRefAnnotationIdsForTier(uTier)
+            utteranceValues = self.eaf.getAnnotationValuesForTier(uTier)
             for uId in utterancesIds:
-                utterance = self.eaf.getAnnotationValueForAnnotation(uTier, uId)
-                utterance = re.sub(r" +", " ", utterance)
+                utterance = utteranceValues.get(uId, '')
+                if "  " in utterance:
+                    utterance = MULTIPLE_SPACES.sub(" ", utterance)
 
-                refId = self.eaf.getRefAnnotationIdForAnnotationId(uTier, uId)
-                toolboxId = self.eaf.getAnnotationValueForAnnotation("ref", refId)
+                refId = refs.get(uId)
+                toolboxId = refValues.get(refId, '')
 
                 translations = []
-                ilElements = []
-                locale = self.eaf.getLocaleForTier(uTier)
-                participant = self.eaf.getParticipantForTier(uTier)
-                translationTierIds = self.tierBuilder.getTranslationtierIds("ref")
-                for tTier in translationTierIds:
-                    transIds = self.eaf.getSubAnnotationIdsForAnnotationInTier(refId, "ref", tTier)
-                    for transId in transIds:
-                        trans = self.eaf.getAnnotationValueForAnnotation(tTier, transId)
+                for tTier in plan['translationTiers']:
+                    for transId in self.getChildAnnotationIds(plan, refId, "ref", tTier):
+                        trans = values[tTier].get(transId, '')
                         if trans != '':
                             translations.append([transId, trans])
-                
-                arrTextWords = re.split(self.WORD_BOUNDARY_PARSE, utterance)
-                arrTextWords = filter(lambda i: i != '', arrTextWords)
-                
+
+                arrTextWords = [ w for w in self.splitWords(utterance) if w != '' ]
+
                 arrMorphWords = []
                 arrGlossWords = []
-                wordTierIds = self.tierBuilder.getWordtierIds("ref")
-                for wTier in wordTierIds:
-                    wordsIds = self.eaf.getSubAnnotationIdsForAnnotationInTier(refId, "ref", wTier)
-                    for wordId in wordsIds:
-                        word = self.eaf.getAnnotationValueForAnnotation(wTier, wordId)
-                        arrMorphWords.append(word)
-                        glossTierIds = self.tierBuilder.getGlosstierIds(wTier)
+                for wTier, glossTierIds in plan['wordTiers']:
+                    for wordId in self.getChildAnnotationIds(plan, refId, "ref", wTier):
+                        arrMorphWords.append(values[wTier].get(wordId, ''))
                         for gTier in glossTierIds:
-                            glossIds = self.eaf.getSubAnnotationIdsForAnnotationInTier(wordId, wTier, gTier)
-                            for glossId in glossIds:
-                                gloss = self.eaf.getAnnotationValueForAnnotation(gTier, glossId)
-                                arrGlossWords.append(gloss)
-
-                for i,word in enumerate(arrTextWords):
-                    morphemes = ""
-                    glosses = ""
-                    if i < len(arrMorphWords):
-                        morphemes = arrMorphWords[i]
-                    if i < len(arrGlossWords):
-                        glosses = arrGlossWords[i]
-                    ilElement = self.ilElementForString("%s %s %s" % (word, morphemes, glosses))
-                    
-                    ilElements.append(ilElement)
+                            for glossId in self.getChildAnnotationIds(plan, wordId, wTier, gTier):
+                                arrGlossWords.append(values[gTier].get(glossId, ''))
+
+                ilElements = self.ilElementsForWords(arrTextWords, arrMorphWords, arrGlossWords)
                 if len(ilElements) == 0:
                     ilElements = [ ['', '',  [ ['', '',  [ ['',  ''] ] ] ] ] ]
 
@@ -456,7 +574,30 @@ class EafFromToolboxAnnotationFileParser(pyannotation.data.AnnotationFileParser)
 class Eaf(object):
 
     def __init__(self, file):
-        self.tree = ET.parse(file)
+        # lxml reads uncompressed files faster from the path
+        if hasattr(file, 'read') or isCompressed(file):
+            f = openAnnotationFile(file)
+            try:
+                self.tree = ET.parse(f)
+            finally:
+                if f is not file:
+                    f.close()
+        else:
+            self.tree = ET.parse(file)
+        # cached id counter for time slots, see getLastUsedTimeSlotId()
+        self.lastUsedTimeSlotId = None
+        # index of the annotations, see getAnnotationIndex()
+        self.annotationIndex = None
+
+    def __deepcopy__(self, memo):
+        # the annotation index holds the elements of this tree, the copy
+        # builds its own index from the copied tree
+        eaf = Eaf.__new__(Eaf)
+        for key, value in self.__dict__.items():
+            if key != 'annotationIndex':
+                setattr(eaf, key, deepcopy(value, memo))
+        eaf.annotationIndex = None
+        return eaf
 
     def tostring(self):
         return ET.tostring(self.tree.getroot(), pretty_print=True, encoding="utf-8")
@@ -523,6 +664,12 @@ class Eaf(object):
     def setLastUsedAnnotationId(self, newAnnotationId):
         """sets the header property last used annotation id"""
         a = self.tree.find("HEADER/PROPERTY[@NAME='lastUsedAnnotationId']")
+        if a is None:
+            header = self.tree.find("HEADER")
+            if header is None:
+                header = Element("HEADER")
+                self.tree.getroot().insert(0, header)
+            a = ET.SubElement(header, "PROPERTY", NAME="lastUsedAnnotationId")
         a.text = str(newAnnotationId)
 
     def getTierIdsForLinguisticType(self, type, parent = None):
@@ -535,6 +682,25 @@ class Eaf(object):
             ret.append(tier.attrib['TIER_ID'])
         return ret
 
+    def getTierInfos(self):
+        """returns a list of (tier id, dict) pairs in document order, each dict
+        contains linguistic type, time alignability, participant, locale and
+        parent of the tier"""
+        timeAlignable = {}
+        for lt in self.tree.findall("LINGUISTIC_TYPE"):
+            timeAlignable[lt.attrib.get('LINGUISTIC_TYPE_ID')] = (lt.attrib.get('TIME_ALIGNABLE') == 'true')
+        ret = []
+        for tier in self.tree.findall("TIER"):
+            linguisticType = tier.attrib.get('LINGUISTIC_TYPE_REF')
+            ret.append((tier.attrib['TIER_ID'], {
+                'linguistic_type' : linguisticType,
+                'time_alignable' : timeAlignable.get(linguisticType, False),
+                'participant' : tier.attrib.get('PARTICIPANT') or '',
+                'locale' : tier.attrib.get('DEFAULT_LOCALE') or '',
+                'parent' : tier.attrib.get('PARENT_REF')
+            }))
+        return ret
+
     def getParameterDictForTier(self, id):
         tier = self.tree.find("TIER[@TIER_ID='%s']" % id)
         return tier.attrib
@@ -634,13 +800,64 @@ class Eaf(object):
                 newIndex = i
         self.tree.getroot().insert(newIndex, newtier)                
 
+    def resetAnnotationIndex(self):
+        """has to be called whenever annotations are added or removed or
+        their time slots change"""
+        self.annotationIndex = None
+
+    def getAnnotationIndex(self):
+        """returns a dict with the annotation elements by id, the ref
+        annotation elements by tier and annotation ref, the ids of the ref
+        annotations by annotation ref and the alignable annotations of
+        each tier as sorted (start ts, id, end ts) tuples.
+        The index is built with one pass over the file on the first call,
+        so that the lookups of single annotations do not need an XPath
+        query over the whole tier."""
+        if self.annotationIndex == None:
+            annotations = {}
+            refAnnotations = {}
+            dependentAnnotationIds = {}
+            alignableAnnotations = {}
+            for tier in self.tree.findall("TIER"):
+                idTier = tier.attrib['TIER_ID']
+                alignable = []
+                for a in tier.iterfind("ANNOTATION/*"):
+                    id = a.attrib.get('ANNOTATION_ID')
+                    if a.tag == "ALIGNABLE_ANNOTATION":
+                        annotations[id] = (idTier, a)
+                        if id:
+                            alignable.append((int(re.sub(r"\D", '', a.attrib['TIME_SLOT_REF1'])),
+                                              id,
+                                              int(re.sub(r"\D", '', a.attrib['TIME_SLOT_REF2']))))
+                    elif a.tag == "REF_ANNOTATION":
+                        annotations[id] = (idTier, a)
+                        refAnnotations.setdefault((idTier, a.attrib['ANNOTATION_REF']), []).append(a)
+                        dependentAnnotationIds.setdefault(a.attrib['ANNOTATION_REF'], []).append(id)
+                alignable.sort()
+                alignableAnnotations[idTier] = alignable
+            self.annotationIndex = {
+                'annotations' : annotations,
+                'refAnnotations' : refAnnotations,
+                'dependentAnnotationIds' : dependentAnnotationIds,
+                'alignableAnnotations' : alignableAnnotations
+            }
+        return self.annotationIndex
+
+    def getAnnotationElement(self, idTier, idAnnotation, tag = None):
+        """returns the ALIGNABLE_ANNOTATION or REF_ANNOTATION element with
+        the given id in the given tier or None"""
+        a = self.getAnnotationIndex()['annotations'].get(idAnnotation)
+        if a == None or (idTier != None and a[0] != idTier) or (tag != None and a[1].tag != tag):
+            return None
+        return a[1]
+
     def getStartTsForAnnotation(self,  idTier,  idAnnotation):
-        a = self.tree.find("TIER[@TIER_ID='%s']/ANNOTATION/ALIGNABLE_ANNOTATION[@ANNOTATION_ID='%s']" % (idTier,  idAnnotation))
+        a = self.getAnnotationElement(idTier, idAnnotation, "ALIGNABLE_ANNOTATION")
         ret = a.attrib['TIME_SLOT_REF1']
         return ret
 
     def getEndTsForAnnotation(self,  idTier,  idAnnotation):
-        a = self.tree.find("TIER[@TIER_ID='%s']/ANNOTATION/ALIGNABLE_ANNOTATION[@ANNOTATION_ID='%s']" % (idTier,  idAnnotation))
+        a = self.getAnnotationElement(idTier, idAnnotation, "ALIGNABLE_ANNOTATION")
         ret = a.attrib['TIME_SLOT_REF2']
         return ret
 
@@ -665,7 +882,7 @@ class Eaf(object):
         return ret
 
     def getRefAnnotationIdForAnnotationId(self, idTier, idAnnotation):
-        a = self.tree.find( "TIER[@TIER_ID='%s']/ANNOTATION/REF_ANNOTATION[@ANNOTATION_ID='%s']" % (idTier, idAnnotation) )
+        a = self.getAnnotationElement(idTier, idAnnotation, "REF_ANNOTATION")
         if a is not None:
             return a.attrib["ANNOTATION_REF"]
         else:
@@ -673,24 +890,38 @@ class Eaf(object):
         
     def getRefAnnotationIdsForTier(self, idTier, annRef = None,  prevAnn = None):
         ret = []
-        foundann = []
-        prevs = {}
         if annRef == None:
             allAnnotations = self.tree.findall("TIER[@TIER_ID='%s']/ANNOTATION/REF_ANNOTATION" % idTier)
             for a in allAnnotations:
                 ret.append(a.attrib['ANNOTATION_ID'])
         else:
-            if prevAnn == None:
-                allAnnotations = self.tree.findall("TIER[@TIER_ID='%s']/ANNOTATION/REF_ANNOTATION[@ANNOTATION_REF='%s']" % (idTier, annRef))
-            else:
-                allAnnotations = self.tree.findall("TIER[@TIER_ID='%s']/ANNOTATION/REF_ANNOTATION[@ANNOTATION_REF='%s'][@PREVIOUS_ANNOTATION='%s']" % (idTier, annRef, prevAnn))
-            for a in allAnnotations:
-                if prevAnn == None and 'PREVIOUS_ANNOTATION' in a.attrib:
-                    continue
-                ret.append(a.attrib['ANNOTATION_ID'])
-                foundann.append(a.attrib['ANNOTATION_ID'])
-            for id in foundann:
-                ret.extend(self.getRefAnnotationIdsForTier(idTier, annRef,  id))
+            # the annotations with the same ref, grouped by their previous
+            # annotation; the chains are followed in this dict instead of
+            # querying the tier again for every link
+            idsByPrevAnn = {}
+            for a in self.getAnnotationIndex()['refAnnotations'].get((idTier, annRef), []):
+                idsByPrevAnn.setdefault(a.attrib.get('PREVIOUS_ANNOTATION'), []).append(a.attrib['ANNOTATION_ID'])
+            ret = self.getFollowingRefAnnotationIds(idsByPrevAnn, idsByPrevAnn.get(prevAnn, []))
+        return ret
+
+    def getRefAnnotationIdsByAnnotationRef(self, idTier):
+        """returns a dict annotation ref -> ids of the ref annotations of
+        the tier that refer to it, each list in the order of
+        getRefAnnotationIdsForTier(idTier, annRef)"""
+        ret = {}
+        for (idRefTier, annRef) in self.getAnnotationIndex()['refAnnotations']:
+            if idRefTier == idTier:
+                ret[annRef] = self.getRefAnnotationIdsForTier(idTier, annRef)
+        return ret
+
+    def getFollowingRefAnnotationIds(self, idsByPrevAnn, found):
+        # the given annotations, then the chains of annotations that
+        # follow each of them
+        ret = list(found)
+        for id in found:
+            following = idsByPrevAnn.get(id, [])
+            if len(following) > 0:
+                ret.extend(self.getFollowingRefAnnotationIds(idsByPrevAnn, following))
         return ret
 
     def appendRefAnnotationToTier(self, idTier, idAnnotation, strAnnotation, annRef, prevAnn = None):
@@ -705,32 +936,23 @@ class Eaf(object):
         eAnnVal = ET.SubElement(eRefAnn, "ANNOTATION_VALUE")
         eAnnVal.text = strAnnotation
         t.append(eAnnotation)
+        self.resetAnnotationIndex()
         return True
 
     def getAlignableAnnotationIdsForTier(self, id, startTs = None,  endTs = None):
+        # the annotations are sorted by the number of their start time slot
+        alignable = self.getAnnotationIndex()['alignableAnnotations'].get(id, [])
+        if startTs == None or endTs == None:
+            return [a[1] for a in alignable]
         ret = []
-        ts = {}
-        if startTs != None and endTs != None:
-            iStartTs = int(re.sub(r"\D", '', startTs))
-            iEndTs = int(re.sub(r"\D", '', endTs))
-        allAnnotations = self.tree.findall("TIER[@TIER_ID='%s']/ANNOTATION/ALIGNABLE_ANNOTATION" % id)
-        for a in allAnnotations:
-            aStartTs = a.attrib['TIME_SLOT_REF1']
-            aEndTs = a.attrib['TIME_SLOT_REF2']
-            iAStartTs = int(re.sub(r"\D", '', aStartTs))
-            iAEndTs = int(re.sub(r"\D", '', aEndTs))
-            if startTs != None and endTs != None:
-                if iStartTs > iAStartTs or iEndTs < iAEndTs:
-                    continue
-            id = None
-            v = []
-            id = a.attrib['ANNOTATION_ID']
-            if id:
-                ts[id] = iAStartTs
-        # sort ids via start timestamp
-        alist = sorted(ts.iteritems(), key=lambda (k,v): (v,k))
-        for k, v in alist:
-            ret.append(k)
+        iStartTs = int(re.sub(r"\D", '', startTs))
+        iEndTs = int(re.sub(r"\D", '', endTs))
+        for i in range(bisect.bisect_left(alignable, (iStartTs,)), len(alignable)):
+            iAStartTs, idAnn, iAEndTs = alignable[i]
+            if iAStartTs > iEndTs:
+                break
+            if iAEndTs <= iEndTs:
+                ret.append(idAnn)
         return ret
 
     def removeAllAnnotationsFromTier(self, idTier):
@@ -740,30 +962,80 @@ class Eaf(object):
             return False
         for a in annotations:
             t.remove(a)
+        self.resetAnnotationIndex()
         return True
 
     def removeAnnotationWithId(self, idAnnotation):
-        a = self.tree.find("TIER/ANNOTATION/ALIGNABLE_ANNOTATION[@ANNOTATION_ID='%s']" % idAnnotation)
+        a = self.getAnnotationElement(None, idAnnotation)
         if a != None:
             a.getparent().getparent().remove(a.getparent())
-        else:
-            a = self.tree.find("TIER/ANNOTATION/REF_ANNOTATION[@ANNOTATION_ID='%s']" % idAnnotation)
-            if a != None:
-                a.getparent().getparent().remove(a.getparent())
+            self.resetAnnotationIndex()
 
     def removeAnnotationsWithRef(self, idRefAnn):
         allAnnotations = self.tree.findall("TIER/ANNOTATION/REF_ANNOTATION[@ANNOTATION_REF='%s']" % idRefAnn)
         for a in allAnnotations:
             a.getparent().getparent().remove(a.getparent())
+        if len(allAnnotations) > 0:
+            self.resetAnnotationIndex()
+
+    def getDependentAnnotationIds(self, idsAnnotations):
+        """returns the given ids together with the ids of all annotations
+        that refer to them, directly or via other ref annotations"""
+        refIndex = self.getAnnotationIndex()['dependentAnnotationIds']
+        ret = set()
+        stack = list(idsAnnotations)
+        while stack:
+            id = stack.pop()
+            if id in ret:
+                continue
+            ret.add(id)
+            stack.extend(refIndex.get(id, []))
+        return ret
+
+    def removeAnnotationsWithIds(self, idsAnnotations):
+        """removes the annotations with the given ids and all annotations
+        that depend on them. The annotations are found in the annotation
+        index, which is updated instead of built again."""
+        ids = self.getDependentAnnotationIds(idsAnnotations)
+        index = self.getAnnotationIndex()
+        alignableTiers = set()
+        for id in ids:
+            a = index['annotations'].pop(id, None)
+            if a == None:
+                continue
+            idTier, element = a
+            annotation = element.getparent()
+            annotation.getparent().remove(annotation)
+            if element.tag == "REF_ANNOTATION":
+                annRef = element.attrib['ANNOTATION_REF']
+                index['refAnnotations'][(idTier, annRef)].remove(element)
+                index['dependentAnnotationIds'][annRef].remove(id)
+            else:
+                alignableTiers.add(idTier)
+        for idTier in alignableTiers:
+            index['alignableAnnotations'][idTier] = [ a for a in index['alignableAnnotations'][idTier]
+                                                     if a[1] not in ids ]
+
+    def getAnnotationValuesForTier(self, idTier):
+        """returns a dict annotation id -> value of all annotations of the
+        tier"""
+        ret = {}
+        for tier in self.tree.findall("TIER"):
+            if tier.attrib.get('TIER_ID') == idTier:
+                for value in tier.iter("ANNOTATION_VALUE"):
+                    id = value.getparent().get('ANNOTATION_ID')
+                    if id not in ret:
+                        ret[id] = value.text or ''
+        return ret
 
     def getAnnotationValueForAnnotation(self, idTier, idAnnotation):
         type = self.getLinguisticTypeForTier(idTier)
         ret = ''
         if self.linguisticTypeIsTimeAlignable(type):
-            a = self.tree.find("TIER[@TIER_ID='%s']/ANNOTATION/ALIGNABLE_ANNOTATION[@ANNOTATION_ID='%s']" % (idTier,  idAnnotation))
+            a = self.getAnnotationElement(idTier, idAnnotation, "ALIGNABLE_ANNOTATION")
             ret = a.findtext('ANNOTATION_VALUE')
         else:
-            a = self.tree.find("TIER[@TIER_ID='%s']/ANNOTATION/REF_ANNOTATION[@ANNOTATION_ID='%s']" % (idTier,  idAnnotation))
+            a = self.getAnnotationElement(idTier, idAnnotation, "REF_ANNOTATION")
             ret = a.findtext('ANNOTATION_VALUE')
         if ret == None:
             ret = ''
@@ -774,23 +1046,33 @@ class Eaf(object):
         ret = ''
         a = None
         if self.linguisticTypeIsTimeAlignable(type):
-            a = self.tree.find("TIER[@TIER_ID='%s']/ANNOTATION/ALIGNABLE_ANNOTATION[@ANNOTATION_ID='%s']/ANNOTATION_VALUE" % (idTier,  idAnnotation))
+            a = self.getAnnotationElement(idTier, idAnnotation, "ALIGNABLE_ANNOTATION")
         else:
-            a = self.tree.find("TIER[@TIER_ID='%s']/ANNOTATION/REF_ANNOTATION[@ANNOTATION_ID='%s']/ANNOTATION_VALUE" % (idTier,  idAnnotation))
+            a = self.getAnnotationElement(idTier, idAnnotation, "REF_ANNOTATION")
+        if a != None:
+            a = a.find("ANNOTATION_VALUE")
         if a == None:
             return False
         a.text = strAnnotation
         return True
 
     def getLastUsedTimeSlotId(self):
-        lastId = 0
-        timeslots = self.tree.findall("TIME_ORDER/TIME_SLOT")
-        for ts in timeslots:
-            i = ts.attrib['TIME_SLOT_ID']
-            i = int(re.sub(r"\D", "", i))
-            if i > lastId:
-                lastId = i
-        return lastId
+        """returns the highest time slot number, the time slots are only
+        scanned on the first call"""
+        if self.lastUsedTimeSlotId is None:
+            lastId = 0
+            timeslots = self.tree.findall("TIME_ORDER/TIME_SLOT")
+            for ts in timeslots:
+                i = ts.attrib['TIME_SLOT_ID']
+                i = int(re.sub(r"\D", "", i))
+                if i > lastId:
+                    lastId = i
+            self.lastUsedTimeSlotId = lastId
+        return self.lastUsedTimeSlotId
+
+    def useNextTimeSlotId(self):
+        self.lastUsedTimeSlotId = self.getLastUsedTimeSlotId() + 1
+        return "ts%i" % self.lastUsedTimeSlotId
 
     def addTimeOrder(self):
         times = self.tree.find("TIME_ORDER")
@@ -804,7 +1086,11 @@ class Eaf(object):
     def addTimeSlot(self, tsId, tsStartMs, tsEndMs=None):
         times = self.getTimeOrderTree()
         if tsId is None:
-            tsId = self.getLastUsedTimeSlotId() + 1
+            tsId = self.useNextTimeSlotId()
+        else:
+            i = re.sub(r"\D", "", str(tsId))
+            if i != "" and int(i) > self.getLastUsedTimeSlotId():
+                self.lastUsedTimeSlotId = int(i)
         newtimeslot = ET.SubElement(times,
                                     "TIME_SLOT",
                                     TIME_SLOT_ID = str(tsId),
@@ -812,41 +1098,142 @@ class Eaf(object):
         if tsEndMs is None:
             return tsId
         else:
-            return (tsId, addTimeSlot(None, tsEndMs))
+            return (tsId, self.addTimeSlot(None, tsEndMs))
+
+    def insertTimeSlots(self, timeslots):
+        """inserts a list of (id, time value) pairs into the time order,
+        keeping the time slots sorted by their time values"""
+        times = self.getTimeOrderTree()
+        timeslots = sorted(timeslots, key=lambda ts: ts[1])
+        newElements = []
+        for tsId, tsValue in timeslots:
+            e = Element("TIME_SLOT", TIME_SLOT_ID = str(tsId), TIME_VALUE = str(tsValue))
+            newElements.append((tsValue, e))
+        if len(newElements) == 0:
+            return
+        # fast path: all new time slots come after the existing ones; a
+        # last time slot without time value needs the merge
+        if len(times) == 0 or (times[-1].attrib.get('TIME_VALUE') is not None
+                               and int(times[-1].attrib['TIME_VALUE']) <= newElements[0][0]):
+            for tsValue, e in newElements:
+                times.append(e)
+            return
+        merged = []
+        j = 0
+        for ts in times:
+            value = ts.attrib.get('TIME_VALUE')
+            if value is not None:
+                while j < len(newElements) and newElements[j][0] < int(value):
+                    merged.append(newElements[j][1])
+                    j = j + 1
+            merged.append(ts)
+        for tsValue, e in newElements[j:]:
+            merged.append(e)
+        times[:] = merged
+
+    def compactTimeSlots(self, mergeDuplicates = False):
+        """removes all time slots that are not referenced by an annotation,
+        optionally merges time slots with the same time value and renumbers
+        the remaining time slots. Returns a dict with the number of removed
+        and merged time slots and the number of bytes saved."""
+        times = self.getTimeOrderTree()
+        bytesBefore = len(self.tostring())
+        alignables = self.tree.findall("TIER/ANNOTATION/ALIGNABLE_ANNOTATION")
+        referenced = set()
+        for a in alignables:
+            referenced.add(a.attrib.get('TIME_SLOT_REF1'))
+            referenced.add(a.attrib.get('TIME_SLOT_REF2'))
+        newIds = {}
+        idsForValue = {}
+        kept = []
+        removed = 0
+        merged = 0
+        for ts in times.findall("TIME_SLOT"):
+            tsId = ts.attrib['TIME_SLOT_ID']
+            if tsId not in referenced:
+                removed = removed + 1
+                continue
+            value = ts.attrib.get('TIME_VALUE')
+            if mergeDuplicates and value is not None and value in idsForValue:
+                newIds[tsId] = idsForValue[value]
+                merged = merged + 1
+                continue
+            newId = "ts%i" % (len(kept) + 1)
+            newIds[tsId] = newId
+            if value is not None:
+                idsForValue[value] = newId
+            ts.attrib['TIME_SLOT_ID'] = newId
+            kept.append(ts)
+        times[:] = kept
+        for a in alignables:
+            for ref in ('TIME_SLOT_REF1', 'TIME_SLOT_REF2'):
+                if ref in a.attrib:
+                    a.attrib[ref] = newIds.get(a.attrib[ref], a.attrib[ref])
+        self.lastUsedTimeSlotId = len(kept)
+        self.resetAnnotationIndex()
+        return {
+            'removedTimeSlots' : removed,
+            'mergedTimeSlots' : merged,
+            'bytesSaved' : bytesBefore - len(self.tostring())
+        }
 
     def setTsForAnnotation(self, idTier, idAnnotation, idTimeSlotStart, idTimeSlotEnd=None):
         times = self.getTimeOrderTree()
         if not self.linguisticTypeIsTimeAlignable(self.getLinguisticTypeForTier(idTier)):
             return False
-        a = self.tree.find("TIER[@TIER_ID='%s']/ANNOTATION/ALIGNABLE_ANNOTATION[@ANNOTATION_ID='%s']" % (idTier, idAnnotation))
+        a = self.getAnnotationElement(idTier, idAnnotation, "ALIGNABLE_ANNOTATION")
         if idTimeSlotStart is not None:
             a.attrib['TIME_SLOT_REF1'] = str(idTimeSlotStart)
         if idTimeSlotEnd is not None:
             a.attrib['TIME_SLOT_REF2'] = str(idTimeSlotEnd)
+        self.resetAnnotationIndex()
 
     def addAnnotationToTier(self, idTier, strAnnotation, tsStartMs = None, tsEndMs = None):
+        return self.addAnnotations(idTier, [ (strAnnotation, tsStartMs, tsEndMs) ])[0]
+
+    def addAnnotations(self, idTier, annotations):
+        """adds a list of (value, start ms, end ms) tuples as alignable
+        annotations to a tier and returns the new annotation ids. The ids
+        are allocated from counters, the time slots are inserted sorted and
+        the header property lastUsedAnnotationId is only updated once."""
         tsDefaultLengthMs = 500
-        idAnnotation = self.getLastUsedAnnotationId() + 1
-        self.setLastUsedAnnotationId(idAnnotation)
-        if tsStartMs is None:
-            tsStartMs = idAnnotation * tsDefaultLengthMs
+        tierelem = self.tree.find("TIER[@TIER_ID='%s']" % idTier)
+        if tierelem is None:
+            return []
+        lastId = self.getLastUsedAnnotationId()
+        ret = []
+        timeslots = []
+        alignableelems = []
+        for strAnnotation, tsStartMs, tsEndMs in annotations:
+            lastId = lastId + 1
+            if tsStartMs is None:
+                tsStartMs = lastId * tsDefaultLengthMs
             if tsEndMs is None:
                 tsEndMs = tsStartMs + tsDefaultLengthMs
-#        tiertype = self.getLinguisticTypeForTier(idTier)
-        tierelem = self.tree.find("TIER[@TIER_ID='%s']" % idTier)
-        annotationelem = ET.SubElement(tierelem, "ANNOTATION")
-        alignableelem = ET.SubElement(annotationelem, "ALIGNABLE_ANNOTATION")
-        annotationvalueelem = ET.SubElement(alignableelem, "ANNOTATION_VALUE")
-        alignableelem.attrib["ANNOTATION_ID"] = str(idAnnotation)
-        annotationvalueelem.text = strAnnotation
-        idTsStartMs = self.addTimeSlot(None, tsStartMs)
-        idTsEndMs = self.addTimeSlot(None, tsEndMs)
-        self.setTsForAnnotation(idTier, idAnnotation, idTsStartMs, idTsEndMs)
+            annotationelem = ET.SubElement(tierelem, "ANNOTATION")
+            alignableelem = ET.SubElement(annotationelem, "ALIGNABLE_ANNOTATION", ANNOTATION_ID = "a%i" % lastId)
+            annotationvalueelem = ET.SubElement(alignableelem, "ANNOTATION_VALUE")
+            annotationvalueelem.text = strAnnotation
+            timeslots.append((tsStartMs, len(alignableelems), 'TIME_SLOT_REF1'))
+            timeslots.append((tsEndMs, len(alignableelems), 'TIME_SLOT_REF2'))
+            alignableelems.append(alignableelem)
+            ret.append("a%i" % lastId)
+        # allocate time slot ids in the order of their time values
+        timeslots.sort(key=lambda ts: ts[0])
+        newTimeslots = []
+        for tsValue, i, ref in timeslots:
+            tsId = self.useNextTimeSlotId()
+            alignableelems[i].attrib[ref] = tsId
+            newTimeslots.append((tsId, tsValue))
+        self.insertTimeSlots(newTimeslots)
+        self.setLastUsedAnnotationId(lastId)
+        self.resetAnnotationIndex()
+        return ret
 
     def updatePrevAnnotationForAnnotation(self, idAnnotation, idPrevAnn = None):
         # this will just do nothing for time-aligned tiers
         # if idPrevAnn is None, then the attribute will be removed
-        a = self.tree.find("TIER/ANNOTATION/REF_ANNOTATION[@ANNOTATION_ID='%s']" % idAnnotation)
+        a = self.getAnnotationElement(None, idAnnotation, "REF_ANNOTATION")
         if a != None:
             if idPrevAnn == None:
                 del(a.attrib['PREVIOUS_ANNOTATION'])
@@ -858,75 +1245,174 @@ class Eaf(object):
         self.tree.write(filepath, encoding=encoding)
 
 class EafPythonic(object):
-    
-    def __init__(self, filename):
+    """A read-only representation of an .eaf file that stores tiers,
+    time slots and annotations in dicts. All annotations are indexed per
+    tier, so that the lookups of the parsers do not need to scan the
+    whole file. Supports all methods of Eaf that the parsers use."""
+
+    def __init__(self, filename = None):
         self.tiersDict = {}
+        self.tierIds = []
+        self.linguistictypesDict = {}
+        self.timeslotsDict = {}
+        self.timeslotIds = []
         self.alignableAnnotationsDict = {}
         self.refAnnotationsDict = {}
+        self.alignableAnnotationIdsByTier = {}
+        self.refAnnotationIdsByTier = {}
         self.refAnnotationsDictByTierAndAnnRef = {}
-        self.linguistictypesDict = {}
-        
+        self.refAnnotationIdsByPrevAnn = {}
+        self.orderedRefAnnotationIds = {}
+        self.timeslotKeys = {}
+        self.alignableStartKeysByTier = {}
+        self.lastUsedAnnotationId = None
+        if filename != None:
+            self.load(filename)
+
+    def load(self, filename):
         parser = Xml2Obj()
         rootElement = parser.parse(filename)
 
+        for headerElement in rootElement.getElements("HEADER"):
+            for propertyElement in headerElement.getElements("PROPERTY"):
+                if propertyElement.getAttribute("NAME") == "lastUsedAnnotationId":
+                    self.lastUsedAnnotationId = int(propertyElement.getData())
+
+        for timeOrderElement in rootElement.getElements("TIME_ORDER"):
+            for tsElement in timeOrderElement.getElements("TIME_SLOT"):
+                self.addTimeSlot(tsElement.getAttribute("TIME_SLOT_ID"), tsElement.getAttribute("TIME_VALUE"))
+
         for ltElement in rootElement.getElements("LINGUISTIC_TYPE"):
-            ta = False
-            idLt = ltElement.getAttribute("LINGUISTIC_TYPE_ID")
-            if ltElement.getAttribute("TIME_ALIGNABLE") == "true":
-                ta = True
-            self.linguistictypesDict[idLt] = ta
+            self.addLinguisticType(ltElement.getAttribute("LINGUISTIC_TYPE_ID"), ltElement.getAttribute("TIME_ALIGNABLE") == "true")
 
         for tierElement in rootElement.getElements("TIER"):
             idTier = tierElement.getAttribute("TIER_ID")
-            linguisticType = tierElement.getAttribute("LINGUISTIC_TYPE_REF")
-            timeAlignable = self.linguistictypesDict[linguisticType]
-            participant = tierElement.getAttribute("PARTICIPANT")
-            locale = tierElement.getAttribute("PARTICIPANT")
-            parent = tierElement.getAttribute("PARENT_REF")
-            
-            self.tiersDict[idTier] = {
-                'linguistic_type' : linguisticType,
-                'time_alignable' : timeAlignable,
-                'participant' : participant,
-                'locale' : locale,
-                'parent' : parent
-            }
-            
+            self.addTier(idTier,
+                         tierElement.getAttribute("LINGUISTIC_TYPE_REF"),
+                         tierElement.getAttribute("PARTICIPANT"),
+                         tierElement.getAttribute("DEFAULT_LOCALE"),
+                         tierElement.getAttribute("PARENT_REF"))
             for annotationElement in tierElement.getElements("ANNOTATION"):
-                if timeAlignable:
-                    for alignableElement in annotationElement.getElements("ALIGNABLE_ANNOTATION"):
-                        idAnn = alignableElement.getAttribute("ANNOTATION_ID")
-                        ts1 = alignableElement.getAttribute("TIME_SLOT_REF1")
-                        ts2 = alignableElement.getAttribute("TIME_SLOT_REF2")
-                        value = alignableElement.getElements("ANNOTATION_VALUE")[0].getData()
-                        self.alignableAnnotationsDict[idAnn] = {
-                            'id' : idAnn,
-                            'tierId' : idTier,
-                            'ts1' : ts1,
-                            'ts2' : ts2,
-                            'value' : value
-                        }
-                else:
-                    for refElement in annotationElement.getElements("REF_ANNOTATION"):
-                        idAnn = refElement.getAttribute("ANNOTATION_ID")
-                        annRef = refElement.getAttribute("ANNOTATION_REF")
-                        prevAnn = refElement.getAttribute("PREVIOUS_ANNOTATION")
-                        value = refElement.getElements("ANNOTATION_VALUE")[0].getData()
-                        self.refAnnotationsDict[idAnn] = {
-                            'id' : idAnn,
-                            'tierId' : idTier,
-                            'annRef' : annRef,
-                            'prevAnn' : prevAnn,
-                            'value' : value
-                        }
-                        idByTierAndAnnRef = "%s.%s" % (idTier, annRef)
-                        if idByTierAndAnnRef in self.refAnnotationsDictByTierAndAnnRef:
-                            self.refAnnotationsDictByTierAndAnnRef[idByTierAndAnnRef].append(idAnn)
-                        else:
-                            self.refAnnotationsDictByTierAndAnnRef[idByTierAndAnnRef] = [ idAnn ]
-                            
+                for alignableElement in annotationElement.getElements("ALIGNABLE_ANNOTATION"):
+                    self.addAlignableAnnotation(idTier,
+                                                alignableElement.getAttribute("ANNOTATION_ID"),
+                                                alignableElement.getAttribute("TIME_SLOT_REF1"),
+                                                alignableElement.getAttribute("TIME_SLOT_REF2"),
+                                                self.getValueOfAnnotationElement(alignableElement))
+                for refElement in annotationElement.getElements("REF_ANNOTATION"):
+                    self.addRefAnnotation(idTier,
+                                          refElement.getAttribute("ANNOTATION_ID"),
+                                          refElement.getAttribute("ANNOTATION_REF"),
+                                          refElement.getAttribute("PREVIOUS_ANNOTATION"),
+                                          self.getValueOfAnnotationElement(refElement))
+        self.buildIndexes()
+
+    def loadStreaming(self, filename):
+        """Loads the file without building an element tree first."""
+        Xml2EafPythonic(self).parse(filename)
+
+    def getValueOfAnnotationElement(self, element):
+        values = element.getElements("ANNOTATION_VALUE")
+        if len(values) == 0:
+            return ''
+        return values[0].getData()
+
+    ########## building the dicts
+
+    def addTimeSlot(self, idTimeSlot, value):
+        if value != None:
+            value = int(value)
+        self.timeslotsDict[idTimeSlot] = value
+        self.timeslotIds.append(idTimeSlot)
+
+    def addLinguisticType(self, idLinguisticType, timeAlignable):
+        self.linguistictypesDict[idLinguisticType] = timeAlignable
+
+    def addTier(self, idTier, linguisticType, participant, locale, parent):
+        self.tierIds.append(idTier)
+        self.tiersDict[idTier] = {
+            'linguistic_type' : linguisticType,
+            'time_alignable' : False,
+            'participant' : participant or '',
+            'locale' : locale or '',
+            'parent' : parent
+        }
+        self.alignableAnnotationIdsByTier[idTier] = []
+        self.refAnnotationIdsByTier[idTier] = []
+
+    def addAlignableAnnotation(self, idTier, idAnn, ts1, ts2, value):
+        self.alignableAnnotationsDict[idAnn] = {
+            'id' : idAnn,
+            'tierId' : idTier,
+            'ts1' : ts1,
+            'ts2' : ts2,
+            'value' : value
+        }
+        self.alignableAnnotationIdsByTier[idTier].append(idAnn)
+
+    def addRefAnnotation(self, idTier, idAnn, annRef, prevAnn, value):
+        self.refAnnotationsDict[idAnn] = {
+            'id' : idAnn,
+            'tierId' : idTier,
+            'annRef' : annRef,
+            'prevAnn' : prevAnn,
+            'value' : value
+        }
+        self.refAnnotationIdsByTier[idTier].append(idAnn)
+        if prevAnn == None:
+            self.refAnnotationsDictByTierAndAnnRef.setdefault((idTier, annRef), []).append(idAnn)
+        else:
+            self.refAnnotationIdsByPrevAnn.setdefault(prevAnn, []).append(idAnn)
+
+    def buildIndexes(self):
+        """Resolves the time alignability of the tiers and the sort keys of
+        the time slots and sorts the alignable annotations of each tier by
+        their start time. Has to be called after all data was added."""
+        for idTier in self.tierIds:
+            tier = self.tiersDict[idTier]
+            tier['time_alignable'] = self.linguistictypesDict.get(tier['linguistic_type'], False)
+        # time slots without a time value are sorted after the last time
+        # slot with a value that precedes them in the time order
+        lastValue = 0
+        for i, idTimeSlot in enumerate(self.timeslotIds):
+            value = self.timeslotsDict[idTimeSlot]
+            if value != None:
+                lastValue = value
+                self.timeslotKeys[idTimeSlot] = (value, 0, i)
+            else:
+                self.timeslotKeys[idTimeSlot] = (lastValue, 1, i)
+        for idTier in self.tierIds:
+            ids = self.alignableAnnotationIdsByTier[idTier]
+            ids.sort(key=lambda id: (self.getTimeSlotKey(self.alignableAnnotationsDict[id]['ts1']), id))
+            self.alignableStartKeysByTier[idTier] = [self.getTimeSlotKey(self.alignableAnnotationsDict[id]['ts1']) for id in ids]
+        if self.lastUsedAnnotationId == None:
+            lastId = 0
+            for idAnn in list(self.alignableAnnotationsDict) + list(self.refAnnotationsDict):
+                i = re.sub(r"\D", "", idAnn)
+                if i != '' and int(i) > lastId:
+                    lastId = int(i)
+            self.lastUsedAnnotationId = lastId
+        self.orderedRefAnnotationIds = {}
+
+    def getTimeSlotKey(self, idTimeSlot):
+        if idTimeSlot in self.timeslotKeys:
+            return self.timeslotKeys[idTimeSlot]
+        # not in the time order, fall back to the number in the id
+        return (int(re.sub(r"\D", "", idTimeSlot)), 2, 0)
+
+    ########## Eaf API
+
     def getLastUsedAnnotationId(self):
-        return 0
+        return self.lastUsedAnnotationId
+
+    def tiers(self):
+        ret = {}
+        for idTier in self.tierIds:
+            ret[idTier] = self.tiersDict[idTier]['linguistic_type']
+        return ret
+
+    def getTierInfos(self):
+        return [ (idTier, dict(self.tiersDict[idTier])) for idTier in self.tierIds ]
 
     def getLocaleForTier(self, idTier):
         return self.tiersDict[idTier]["locale"]
@@ -934,47 +1420,99 @@ class EafPythonic(object):
     def getParticipantForTier(self, idTier):
         return self.tiersDict[idTier]["participant"]
 
+    def getLinguisticTypeForTier(self, idTier):
+        return self.tiersDict[idTier]["linguistic_type"]
+
+    def linguisticTypeIsTimeAlignable(self, id):
+        return self.linguistictypesDict.get(id)
+
     def getTierIdsForLinguisticType(self, type, parent = None):
-        return [ id for id in self.tiersDict
+        return [ id for id in self.tierIds
                 if self.tiersDict[id]["linguistic_type"] == type
                 and (parent == None or self.tiersDict[id]["parent"] == parent)]
 
+    def getTimeValueForTimeSlot(self, idTimeSlot):
+        return self.timeslotsDict.get(idTimeSlot)
+
     def getRefAnnotationIdForAnnotationId(self, idTier, idAnnotation):
-        return self.refAnnotationsDict[idAnnotation]["annRef"]
+        if idAnnotation in self.refAnnotationsDict:
+            return self.refAnnotationsDict[idAnnotation]["annRef"]
+        return None
 
     def getRefAnnotationIdsForTier(self, idTier, annRef = None,  prevAnn = None):
-        if annRef != None and prevAnn == None:
-            idByTierIdAndAnnRef = "%s.%s" % (idTier, annRef)
-            if idByTierIdAndAnnRef in self.refAnnotationsDictByTierAndAnnRef:
-                return self.refAnnotationsDictByTierAndAnnRef[idByTierIdAndAnnRef]
-            else:
-                return []
-        else:
-            return [ id for id in self.refAnnotationsDict
-                    if self.refAnnotationsDict[id]["tierId"] == idTier
-                    and (annRef == None or self.refAnnotationsDict[id]["annRef"] == annRef)
-                    and (prevAnn == None or self.refAnnotationsDict[id]["prevAnn"] == prevAnn)]
+        if annRef == None:
+            return list(self.refAnnotationIdsByTier.get(idTier, []))
+        if prevAnn == None:
+            if (idTier, annRef) not in self.orderedRefAnnotationIds:
+                self.orderedRefAnnotationIds[(idTier, annRef)] = self.getFollowingRefAnnotationIds(idTier, annRef,
+                    self.refAnnotationsDictByTierAndAnnRef.get((idTier, annRef), []))
+            return list(self.orderedRefAnnotationIds[(idTier, annRef)])
+        found = [ id for id in self.refAnnotationIdsByPrevAnn.get(prevAnn, [])
+                 if self.refAnnotationsDict[id]["tierId"] == idTier
+                 and self.refAnnotationsDict[id]["annRef"] == annRef ]
+        return self.getFollowingRefAnnotationIds(idTier, annRef, found)
+
+    def getRefAnnotationIdsByAnnotationRef(self, idTier):
+        ret = {}
+        for idAnn in self.refAnnotationIdsByTier.get(idTier, []):
+            annRef = self.refAnnotationsDict[idAnn]["annRef"]
+            if annRef != None and annRef not in ret:
+                ret[annRef] = self.getRefAnnotationIdsForTier(idTier, annRef)
+        return ret
+
+    def getFollowingRefAnnotationIds(self, idTier, annRef, found):
+        # same order as Eaf.getRefAnnotationIdsForTier(): the given
+        # annotations, then the chains of annotations that follow them
+        ret = list(found)
+        for id in found:
+            following = [ f for f in self.refAnnotationIdsByPrevAnn.get(id, [])
+                         if self.refAnnotationsDict[f]["tierId"] == idTier
+                         and self.refAnnotationsDict[f]["annRef"] == annRef ]
+            if len(following) > 0:
+                ret.extend(self.getFollowingRefAnnotationIds(idTier, annRef, following))
+        return ret
 
     def getAlignableAnnotationIdsForTier(self, idTier, startTs = None,  endTs = None):
-        return [ id for id in self.alignableAnnotationsDict
-                if self.alignableAnnotationsDict[id]["tierId"] == idTier
-                and (startTs == None or self.alignableAnnotationsDict[id]["ts1"] == startTs)
-                and (endTs == None or self.alignableAnnotationsDict[id]["ts2"] == endTs)]
+        ids = self.alignableAnnotationIdsByTier.get(idTier, [])
+        if startTs == None or endTs == None:
+            return list(ids)
+        startKey = self.getTimeSlotKey(startTs)
+        endKey = self.getTimeSlotKey(endTs)
+        ret = []
+        keys = self.alignableStartKeysByTier[idTier]
+        for i in range(bisect.bisect_left(keys, startKey), len(ids)):
+            if keys[i] > endKey:
+                break
+            if self.getTimeSlotKey(self.alignableAnnotationsDict[ids[i]]["ts2"]) <= endKey:
+                ret.append(ids[i])
+        return ret
+
+    def getAnnotationIdsForTier(self, idTier):
+        if self.tiersDict[idTier]["time_alignable"]:
+            return self.getAlignableAnnotationIdsForTier(idTier)
+        else:
+            return self.getRefAnnotationIdsForTier(idTier)
 
     def getStartTsForAnnotation(self, idTier, idAnn):
-        return self.alignableAnntotationsDict[idAnn]["ts1"]
-        
+        return self.alignableAnnotationsDict[idAnn]["ts1"]
+
     def getEndTsForAnnotation(self, idTier, idAnn):
-        return self.alignableAnntotationsDict[idAnn]["ts2"]
+        return self.alignableAnnotationsDict[idAnn]["ts2"]
 
     def getAnnotationValueForAnnotation(self, idTier, idAnn):
-        if self.tiersDict[idTier]["time_alignable"]:
+        if idAnn in self.alignableAnnotationsDict:
             return self.alignableAnnotationsDict[idAnn]["value"]
-        else:
+        elif idAnn in self.refAnnotationsDict:
             return self.refAnnotationsDict[idAnn]["value"]
+        return ''
 
-    def getLinguisticTypeForTier(self, idTier):
-        return self.tiersDict[idTier]["linguistic_type"]
+    def getAnnotationValuesForTier(self, idTier):
+        ret = {}
+        for idAnn in self.alignableAnnotationIdsByTier.get(idTier, []):
+            ret[idAnn] = self.alignableAnnotationsDict[idAnn]["value"]
+        for idAnn in self.refAnnotationIdsByTier.get(idTier, []):
+            ret[idAnn] = self.refAnnotationsDict[idAnn]["value"]
+        return ret
 
     def getSubAnnotationIdsForAnnotationInTier(self, idAnn, idTier, idSubTier):
         ret = []
@@ -988,32 +1526,52 @@ class EafPythonic(object):
 
 class XmlElement(object):
     ''' A parsed XML element '''
-    
+
+    __slots__ = ('name', 'attributes', 'cdataParts', 'children', 'childrenByName')
+
     def __init__(self, name, attributes):
         # Record tagname and attributes dictionary
         self.name = name
         self.attributes = attributes
-        # Initialize the element's cdata and children to empty
-        self.cdata = ''
+        # Initialize the element's cdata and children to empty, cdata
+        # is collected in a list and only joined on access
+        self.cdataParts = [  ]
         self.children = [  ]
-        
+        self.childrenByName = {  }
+
     def addChild(self, element):
         self.children.append(element)
-        
+        if element.name in self.childrenByName:
+            self.childrenByName[element.name].append(element)
+        else:
+            self.childrenByName[element.name] = [ element ]
+
+    def addData(self, data):
+        self.cdataParts.append(data)
+
     def getAttribute(self, key):
         return self.attributes.get(key)
-        
+
     def getData(self):
-        return self.cdata
-    
+        if len(self.cdataParts) > 1:
+            self.cdataParts = [ ''.join(self.cdataParts) ]
+        if len(self.cdataParts) == 0:
+            return ''
+        return self.cdataParts[0]
+
+    cdata = property(getData)
+
     def getElements(self, name=''):
         if name:
-            return [c for c in self.children if c.name == name]
+            return list(self.childrenByName.get(name, [  ]))
         else:
             return list(self.children)
 
 class Xml2Obj(object):
-    
+
+    # bytes read from the file per call of the expat parser
+    BUFFER_SIZE = 65536
+
     def __init__(self):
         self.root = None
         self.nodeStack = [  ]
@@ -1021,7 +1579,7 @@ class Xml2Obj(object):
     def startElement(self, name, attributes):
         'Expat start element event handler'
         # Instantiate an Element object
-        element = XmlElement(name.encode( ), attributes)
+        element = XmlElement(str(name), attributes)
         # Push element onto the stack and make it a child of parent
         if self.nodeStack:
             parent = self.nodeStack[-1]
@@ -1037,18 +1595,111 @@ class Xml2Obj(object):
     def characterData(self, data):
         'Expat character data event handler'
         if data.strip( ):
-            #data = data.decode("utf-8")
-            #data = data.encode( )
-            element = self.nodeStack[-1]
-            element.cdata += data
+            self.nodeStack[-1].addData(data)
 
-    def parse(self, filename):
-        # Create an Expat parser
+    def createParser(self):
+        # Create an Expat parser that buffers character data, so that
+        # the text of an element arrives in as few events as possible
         Parser = expat.ParserCreate("utf-8")
+        Parser.buffer_text = True
+        Parser.buffer_size = self.BUFFER_SIZE
+        return Parser
+
+    def parse(self, filename):
+        Parser = self.createParser()
         # Set the Expat event handlers to our methods
         Parser.StartElementHandler = self.startElement
         Parser.EndElementHandler = self.endElement
         Parser.CharacterDataHandler = self.characterData
-        # Parse the XML File
-        ParserStatus = Parser.Parse(open(filename).read( ), 1)
+        # Parse the XML File in chunks; filename may also be a file
+        # object, compressed files are decompressed on the fly
+        f = openAnnotationFile(filename)
+        try:
+            Parser.ParseFile(f)
+        finally:
+            if f is not filename:
+                f.close()
         return self.root
+
+class Xml2EafPythonic(Xml2Obj):
+    """Loads an .eaf file directly into an EafPythonic object. The
+    annotation dicts are filled from the expat events, no element
+    tree is built."""
+
+    def __init__(self, eaf = None):
+        Xml2Obj.__init__(self)
+        if eaf == None:
+            eaf = EafPythonic()
+        self.eaf = eaf
+        self.idTier = None
+        self.annotation = None
+        self.isLastUsedAnnotationIdProperty = False
+        # list that collects the current character data, or None
+        self.data = None
+        self.value = ''
+
+    def startElement(self, name, attributes):
+        'Expat start element event handler'
+        if name == "ANNOTATION_VALUE":
+            self.data = [  ]
+        elif name == "ALIGNABLE_ANNOTATION" or name == "REF_ANNOTATION":
+            self.annotation = (name, attributes)
+        elif name == "TIER":
+            self.idTier = attributes.get("TIER_ID")
+            self.eaf.addTier(self.idTier,
+                             attributes.get("LINGUISTIC_TYPE_REF"),
+                             attributes.get("PARTICIPANT"),
+                             attributes.get("DEFAULT_LOCALE"),
+                             attributes.get("PARENT_REF"))
+        elif name == "TIME_SLOT":
+            self.eaf.addTimeSlot(attributes.get("TIME_SLOT_ID"), attributes.get("TIME_VALUE"))
+        elif name == "LINGUISTIC_TYPE":
+            self.eaf.addLinguisticType(attributes.get("LINGUISTIC_TYPE_ID"), attributes.get("TIME_ALIGNABLE") == "true")
+        elif name == "PROPERTY" and attributes.get("NAME") == "lastUsedAnnotationId":
+            self.isLastUsedAnnotationIdProperty = True
+            self.data = [  ]
+
+    def endElement(self, name):
+        'Expat end element event handler'
+        if name == "ALIGNABLE_ANNOTATION":
+            attributes = self.annotation[1]
+            self.eaf.addAlignableAnnotation(self.idTier,
+                                            attributes.get("ANNOTATION_ID"),
+                                            attributes.get("TIME_SLOT_REF1"),
+                                            attributes.get("TIME_SLOT_REF2"),
+                                            self.getValue())
+            self.annotation = None
+        elif name == "REF_ANNOTATION":
+            attributes = self.annotation[1]
+            self.eaf.addRefAnnotation(self.idTier,
+                                      attributes.get("ANNOTATION_ID"),
+                                      attributes.get("ANNOTATION_REF"),
+                                      attributes.get("PREVIOUS_ANNOTATION"),
+                                      self.getValue())
+            self.annotation = None
+        elif name == "ANNOTATION_VALUE":
+            self.value = ''.join(self.data)
+            self.data = None
+        elif name == "PROPERTY" and self.isLastUsedAnnotationIdProperty:
+            self.eaf.lastUsedAnnotationId = int(''.join(self.data))
+            self.isLastUsedAnnotationIdProperty = False
+            self.data = None
+        elif name == "TIER":
+            self.idTier = None
+
+    def getValue(self):
+        value = self.value
+        self.value = ''
+        return value
+
+    def characterData(self, data):
+        'Expat character data event handler'
+        # drops whitespace like Xml2Obj, so that both loaders fill the
+        # EafPythonic with the same values
+        if self.data != None and data.strip( ):
+            self.data.append(data)
+
+    def parse(self, filename):
+        Xml2Obj.parse(self, filename)
+        self.eaf.buildIndexes()
+        return self.eaf
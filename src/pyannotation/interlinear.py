@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+# (C) 2011 copyright by Peter Bouda
+"""
+Renders the utterances of an AnnotationTree of any file type as
+interlinear glossed text in HTML, LaTeX (gb4e) or plain text.
+
+The output is written utterance by utterance to a text stream, so that
+large files are never held in memory as one string. The morphemes and
+glosses of each word are aligned in columns; the width of each column is
+computed once per utterance and pads the plain text and the LaTeX source,
+in HTML it is the minimal width of the word:
+
+  tree = cr.annotationtrees[0][1]
+  f = io.open("turkish.html", "w", encoding = "utf-8")
+  pyannotation.interlinear.renderTree(tree, f, format = "html")
+
+Only the utterances that pass the filters of the tree, 50 per page:
+
+  pages = pyannotation.interlinear.pageCount(tree, 50, filtered = True)
+  for page in range(pages):
+      f = io.open("page%i.tex" % page, "w", encoding = "utf-8")
+      pyannotation.interlinear.renderTree(tree, f, format = "latex", filtered = True, page = page, pageSize = 50)
+"""
+
+import unicodedata
+
+FORMATS = ("html", "latex", "text")
+
+HTML_ESCAPES = [ (u"&", u"&amp;"), (u"<", u"&lt;"), (u">", u"&gt;"), (u'"', u"&quot;") ]
+
+LATEX_ESCAPES = {
+    u"\\" : u"\\textbackslash{}",
+    u"{" : u"\\{",
+    u"}" : u"\\}",
+    u"$" : u"\\$",
+    u"&" : u"\\&",
+    u"#" : u"\\#",
+    u"^" : u"\\textasciicircum{}",
+    u"_" : u"\\_",
+    u"%" : u"\\%",
+    u"~" : u"\\textasciitilde{}"
+}
+
+
+def escapeHtml(text):
+    text = u"" + text
+    for c, entity in HTML_ESCAPES:
+        if c in text:
+            text = text.replace(c, entity)
+    return text
+
+def escapeLatex(text):
+    return u"".join([ LATEX_ESCAPES.get(c, c) for c in text ])
+
+def displayWidth(text):
+    """Returns the number of columns the text takes in a monospaced font:
+    combining characters take none, wide east asian characters two."""
+    width = 0
+    for c in text:
+        if unicodedata.combining(c):
+            continue
+        if unicodedata.east_asian_width(c) in ("W", "F"):
+            width = width + 2
+        else:
+            width = width + 1
+    return width
+
+def wordColumns(tree, utterance):
+    """Returns the columns of the words of an utterance as list of
+    (word, morphemes, glosses) tuples of strings, joined with the
+    morpheme and gloss separators of the tree."""
+    columns = []
+    for word in utterance[2]:
+        if len(word) == 0:
+            continue
+        morphemes = tree.MORPHEME_BOUNDARY_BUILD.join([ m[1] for m in word[2] ])
+        glosses = tree.MORPHEME_BOUNDARY_BUILD.join(
+            [ tree.GLOSS_BOUNDARY_BUILD.join([ g[1] for g in m[2] ]) for m in word[2] ])
+        columns.append((u"" + word[1], u"" + morphemes, u"" + glosses))
+    return columns
+
+def columnWidths(columns, escape = None):
+    """Returns the width of each column, the widest of its strings after
+    escape() was applied to them."""
+    if escape == None:
+        escape = lambda s: s
+    return [ max([ displayWidth(escape(s)) for s in column ]) for column in columns ]
+
+def pad(text, width):
+    return text + u" " * (width - displayWidth(text))
+
+def selectUtterances(tree, utteranceIds = None, filtered = False):
+    """Returns the utterances of the tree in the order of the tree. With
+    utteranceIds only those utterances, with filtered only the
+    utterances that pass the filters of the tree."""
+    if filtered:
+        ids = set(tree.getFilteredUtteranceIds())
+        if utteranceIds != None:
+            ids = ids.intersection(utteranceIds)
+    elif utteranceIds != None:
+        ids = set(utteranceIds)
+    else:
+        return tree.getTree()
+    return [ utterance for utterance in tree.getTree() if utterance[0] in ids ]
+
+def pageCount(tree, pageSize, utteranceIds = None, filtered = False):
+    utterances = selectUtterances(tree, utteranceIds, filtered)
+    return max(1, (len(utterances) + pageSize - 1) // pageSize)
+
+
+class InterlinearWriter(object):
+    """
+    Writes interlinear text to a text stream, as plain text with the
+    number of the utterance in front of the first line. Subclasses
+    write the head and foot of other formats and render the utterances
+    in them.
+    """
+
+    # the escaping of the source, the widths of the columns are measured
+    # on the escaped strings
+    escape = None
+
+    def __init__(self, stream, tree, title = None, firstNumber = 1):
+        self.stream = stream
+        self.tree = tree
+        self.title = title
+        self.firstNumber = firstNumber
+
+    def writeHead(self):
+        pass
+
+    def writeFoot(self):
+        pass
+
+    def writeUtterance(self, number, utterance):
+        columns = wordColumns(self.tree, utterance)
+        widths = columnWidths(columns, self.escape)
+        translations = [ u"" + t[1] for t in utterance[3] if t[1] != "" ]
+        self.stream.write(self.renderUtterance(number, utterance, columns, widths, translations))
+
+    def renderUtterance(self, number, utterance, columns, widths, translations):
+        prefix = u"(%i) " % number
+        lines = []
+        for row in range(3):
+            if row > 0 and not [ c for c in columns if c[row] != u"" ]:
+                continue
+            line = u"  ".join([ pad(c[row], w) for c, w in zip(columns, widths) ]).rstrip()
+            lines.append(prefix + line)
+            prefix = u" " * len(prefix)
+        for translation in translations:
+            lines.append(u"%s'%s'" % (prefix, translation))
+        return u"\n".join(lines) + u"\n\n"
+
+
+class HtmlInterlinearWriter(InterlinearWriter):
+
+    def writeHead(self):
+        title = escapeHtml(self.title or u"")
+        self.stream.write(u'<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8"/>\n<title>%s</title>\n'
+            u'<style type="text/css">\n'
+            u'.word { display: inline-block; vertical-align: top; margin-right: 1em; font-family: monospace; }\n'
+            u'.gloss { font-variant: small-caps; }\n'
+            u'</style>\n</head>\n<body>\n' % title)
+        if self.title != None:
+            self.stream.write(u'<h1>%s</h1>\n' % title)
+
+    def writeFoot(self):
+        self.stream.write(u'</body>\n</html>\n')
+
+    def renderUtterance(self, number, utterance, columns, widths, translations):
+        parts = [ u'<div class="phrase" id="%s">\n<span class="number">(%i)</span>\n' % (escapeHtml(utterance[0]), number) ]
+        for (word, morphemes, glosses), width in zip(columns, widths):
+            parts.append(u'<span class="word" style="min-width: %ich"><span class="text">%s</span><br/>'
+                         u'<span class="morphemes">%s</span><br/><span class="gloss">%s</span></span>\n'
+                         % (width, escapeHtml(word), escapeHtml(morphemes), escapeHtml(glosses)))
+        for translation in translations:
+            parts.append(u'<div class="translation">\'%s\'</div>\n' % escapeHtml(translation))
+        parts.append(u'</div>\n')
+        return u"".join(parts)
+
+
+class LatexInterlinearWriter(InterlinearWriter):
+    """Writes gb4e examples, the lines of the source are aligned."""
+
+    escape = staticmethod(escapeLatex)
+
+    def writeHead(self):
+        # continue the numbering of the previous pages
+        if self.firstNumber > 1:
+            self.stream.write(u"\\setcounter{exx}{%i}\n\n" % (self.firstNumber - 1))
+
+    def renderUtterance(self, number, utterance, columns, widths, translations):
+        # \gll aligns two lines, use the morphemes if there are any
+        if [ c for c in columns if c[1] != u"" ]:
+            rows = (1, 2)
+        else:
+            rows = (0, 2)
+        lines = [ u"\\begin{exe}", u"\\ex" ]
+        for i, row in enumerate(rows):
+            line = u" ".join([ pad(escapeLatex(c[row]) or u"{}", w) for c, w in zip(columns, widths) ]).rstrip()
+            if i == 0:
+                lines.append(u"\\gll " + line + u" \\\\")
+            else:
+                lines.append(u"     " + line + u" \\\\")
+        for translation in translations:
+            lines.append(u"\\trans \\glq{}%s\\grq{}" % escapeLatex(translation))
+        lines.append(u"\\end{exe}")
+        return u"\n".join(lines) + u"\n\n"
+
+
+WRITERS = {
+    "html" : HtmlInterlinearWriter,
+    "latex" : LatexInterlinearWriter,
+    "text" : InterlinearWriter
+}
+
+
+def renderTree(tree, stream, format = "html", utteranceIds = None, filtered = False, page = None, pageSize = 100, title = None):
+    """
+    Writes the utterances of the AnnotationTree as interlinear text to
+    the text stream and returns the number of utterances written.
+    format: "html", "latex" or "text".
+    utteranceIds, filtered: see selectUtterances().
+    page: the number of the page to write, beginning with 0, of pageSize
+        utterances each; None writes all utterances. The utterances are
+        numbered through all pages.
+    title: the title of the HTML document.
+    """
+    if format not in WRITERS:
+        raise ValueError("unknown format: %s" % format)
+    utterances = selectUtterances(tree, utteranceIds, filtered)
+    first = 0
+    if page != None:
+        first = page * pageSize
+        utterances = utterances[first:first + pageSize]
+    writer = WRITERS[format](stream, tree, title, first + 1)
+    writer.writeHead()
+    for i, utterance in enumerate(utterances):
+        writer.writeUtterance(first + i + 1, utterance)
+    writer.writeFoot()
+    return len(utterances)
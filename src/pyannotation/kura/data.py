@@ -8,6 +8,13 @@ KuraTree is the class to access the data via a tree, which also
 contains the original .xml IDs. Because of this KuraTrees are
 read-/writeable. 
 
+KuraStreamReader reads the phrases of a file one after the other with
+iterparse and forgets each phrase when the next one is read, so that
+large files are processed in constant memory:
+
+  for phrase in pyannotation.kura.data.KuraStreamReader("corpus.xml"):
+      ...
+
 KuraCorpusReader implements a part of the corpus reader API
 described in the Natural Language Toolkit (NLTK):
 http://nltk.googlecode.com/svn/trunk/doc/howto/corpus.html
@@ -16,17 +23,106 @@ http://nltk.googlecode.com/svn/trunk/doc/howto/corpus.html
 
 from xml import etree
 from xml.etree.ElementTree import Element
+try:
+    import xml.etree.cElementTree as ElementTree
+except ImportError:
+    import xml.etree.ElementTree as ElementTree
+import pyannotation.data
+from pyannotation.compression import openAnnotationFile
+
+############################ Builders
+
+class KuraAnnotationFileObject(pyannotation.data.AnnotationFileObject):
+
+    def __init__(self, filepath):
+        pyannotation.data.AnnotationFileObject.__init__(self, filepath)
+        self.setFilepath(filepath)
+
+    def getFile(self):
+        return self.filepath
+
+    def getFilepath(self):
+        return self.filepath
+
+    def setFilepath(self, filepath):
+        self.filepath = filepath
+
+    def createParser(self):
+        if self.parser == None:
+            self.parser = KuraAnnotationFileParser(self, self.createTierHandler())
+        return self.parser
+
+    def createParserWords(self):
+        if self.parser == None:
+            self.parser = KuraAnnotationFileParserWords(self, self.createTierHandler())
+        return self.parser
+
+
+class KuraAnnotationFileParser(pyannotation.data.AnnotationFileParser):
+    """
+    Reads the phrases of a Kura file in one pass with KuraStreamReader.
+    The utterances get the ids of the phrases, the language of the file
+    as locale and no participant and tier.
+    """
+
+    def __init__(self, annotationFileObject, annotationFileTiers, wordSep = r"[ \n\t\r]+", morphemeSep = r"[-]", glossSep = r"[:]"):
+        pyannotation.data.AnnotationFileParser.__init__(self, annotationFileObject, annotationFileTiers, wordSep, morphemeSep, glossSep)
+        self.annotationFileObject = annotationFileObject
+
+    def parse(self):
+        reader = KuraStreamReader(self.annotationFileObject.getFilepath())
+        tree = []
+        for phrase in reader.readPhrases():
+            tree.append([ phrase[0], phrase[1], self.ilElementsForPhrase(phrase), phrase[3], reader.language, "", "" ])
+        return tree
+
+    def ilElementsForPhrase(self, phrase):
+        return phrase[2]
+
+
+class KuraAnnotationFileParserWords(KuraAnnotationFileParser):
+
+    def ilElementsForPhrase(self, phrase):
+        return [ [ word[0], word[1] ] for word in phrase[2] ]
+
+
+############################ Trees
 
 class KuraTree(object):
 
     def __init__(self, file):
-        self.kuraxml = KuraXML(file)
+        self.xml = None
         self.tree = []
         self.file = file
         self.MORPHEME_BOUNDARY = "-"
         self.GLOSS_BOUNDARY = ":"
 
+    def getKuraXml(self):
+        # the document is only loaded if the low level API is used
+        if self.xml == None:
+            self.xml = KuraXML(self.file)
+        return self.xml
+
+    kuraxml = property(getKuraXml)
+
     def parse(self):
+        if self.xml != None:
+            # the document is loaded and may have been changed
+            self.parseFromXml()
+            return
+        self.tree = []
+        self.phraseIds = []
+        for phrase in self.iterParse():
+            self.phraseIds.append(phrase[0])
+            self.tree.append(phrase)
+
+    def iterParse(self):
+        """Yields the phrases of the file like they are stored in the tree,
+        without keeping them."""
+        return iter(KuraStreamReader(self.file))
+
+    def parseFromXml(self):
+        self.tree = []
         self.phraseIds = self.kuraxml.getPhraseIds()
         for pId in self.phraseIds:
             phrase = self.kuraxml.getPhraseForId(pId)
@@ -62,10 +158,148 @@ class KuraTree(object):
             ilElement.append(morphElements)
         return ilElement
 
+class KuraStreamReader(object):
+    """
+    Reads a Kura .xml file with iterparse and yields one phrase at a time
+    as [ id, text, words, translations ], like the phrases of a
+    KuraTree. Elements without id get the same ids as in KuraXML. For
+    that the file is read twice, the first time only to count the
+    elements; file objects must be seekable. readPhrases() returns all
+    phrases after a single pass. The language of the file is available
+    as attribute "language" when the phrases are read.
+    """
+
+    ELEMENTS = ("phrase", "word", "morph")
+
+    def __init__(self, file):
+        self.file = file
+        self.position = 0
+        self.lastId = 0
+        self.language = ""
+
+    def open(self):
+        if hasattr(self.file, 'seek'):
+            self.file.seek(self.position)
+        return openAnnotationFile(self.file)
+
+    def countElements(self):
+        """Returns the last used id and the number of phrases, words and
+        morphs without id."""
+        counts = dict((tag, 0) for tag in self.ELEMENTS)
+        def countElement(element):
+            counts[element.tag] = counts[element.tag] + 1
+            return ""
+        for phrase in self.iterPhrases(countElement, False):
+            pass
+        return self.lastId, counts
+
+    def iterPhrases(self, assignId, createPhrases = True):
+        """Parses the file; assignId(element) returns the id of phrase,
+        word and morph elements without id."""
+        self.lastId = 0
+        path = []
+        f = self.open()
+        try:
+            for event, element in ElementTree.iterparse(f, events = ("start", "end")):
+                if event == "start":
+                    if element.tag in self.ELEMENTS:
+                        if 'id' in element.attrib:
+                            if int(element.attrib['id']) > self.lastId:
+                                self.lastId = int(element.attrib['id'])
+                        else:
+                            element.set('id', assignId(element))
+                    path.append(element)
+                    continue
+                path.pop()
+                if element.tag == "phrase" and len(path) > 0:
+                    if createPhrases and len(path) == 2 and path[1].tag == "phrases":
+                        yield phraseForElement(element)
+                    # the phrase is done, free its elements
+                    path[-1].remove(element)
+                elif element.tag == "item" and len(path) == 1 and element.get("type") == "language":
+                    self.language = (element.text or "").strip()
+        finally:
+            if f is not self.file:
+                f.close()
+
+    def __iter__(self):
+        if hasattr(self.file, 'tell'):
+            self.position = self.file.tell()
+        lastId, counts = self.countElements()
+        # KuraXML numbers all phrases, then all words, then all morphs
+        nextIds = {
+            'phrase' : lastId,
+            'word' : lastId + counts['phrase'],
+            'morph' : lastId + counts['phrase'] + counts['word']
+        }
+        def assignId(element):
+            id = "a%i" % nextIds[element.tag]
+            nextIds[element.tag] = nextIds[element.tag] + 1
+            return id
+        return self.iterPhrases(assignId)
+
+    def readPhrases(self):
+        """Returns the list of all phrases. The file is only read once,
+        the elements without id get temporary ids that are replaced when
+        the numbers of phrases and words are known."""
+        if hasattr(self.file, 'tell'):
+            self.position = self.file.tell()
+        counts = dict((tag, 0) for tag in self.ELEMENTS)
+        def assignId(element):
+            counts[element.tag] = counts[element.tag] + 1
+            return "\x00%s\x00%i" % (element.tag, counts[element.tag] - 1)
+        phrases = list(self.iterPhrases(assignId))
+        offsets = {
+            'phrase' : self.lastId,
+            'word' : self.lastId + counts['phrase'],
+            'morph' : self.lastId + counts['phrase'] + counts['word']
+        }
+        def finalId(id):
+            if id.startswith("\x00"):
+                empty, tag, number = id.split("\x00")
+                return "a%i" % (offsets[tag] + int(number))
+            return id
+        for phrase in phrases:
+            phrase[0] = finalId(phrase[0])
+            for translation in phrase[3]:
+                translation[0] = phrase[0]
+            for word in phrase[2]:
+                word[0] = finalId(word[0])
+                for morph in word[2]:
+                    morph[0] = finalId(morph[0])
+        return phrases
+
+def phraseForElement(phrase):
+    """Returns the phrase element as [ id, text, words, translations ]."""
+    pId = phrase.attrib["id"]
+    translationsWithIds = []
+    for item in phrase.findall("item[@type='TR']"):
+        translationsWithIds.append([pId, item.findtext(".")])
+    ilElements = []
+    for word in phrase.findall("words/word"):
+        morphElements = []
+        for morph in word.findall("morphemes/morph"):
+            glossElements = []
+            for item in morph.findall("item[@type='ABBR']") + morph.findall("item[@type='GL']"):
+                glossElements.append(['', item.findtext(".")])
+            morphElements.append([ morph.attrib["id"], morph.findtext("item[@type='text']"), glossElements ])
+        if len(morphElements) == 0:
+            morphElements = [[ '',  '',  [ ['',  ''] ]]]
+        ilElements.append([ word.attrib["id"], word.findtext("item[@type='text']"), morphElements ])
+    if len(ilElements) == 0:
+        ilElements = [ ['', '',  [ ['', '',  [ ['',  ''] ] ] ] ] ]
+    return [ pId, phrase.findtext("item[@type='text']"), ilElements, translationsWithIds ]
+
+
 class KuraXML(object):
 
     def __init__(self, file):
-        self.tree = etree.ElementTree.parse(file)
+        f = openAnnotationFile(file)
+        try:
+            self.tree = etree.ElementTree.parse(f)
+        finally:
+            if f is not file:
+                f.close()
 
         # phrases and words and morphs with ids
         aid = self.getLastUsedAnnotationId()
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+# (C) 2011 copyright by Peter Bouda
+"""
+Corpus manifests: a catalog of the files of a corpus with their sizes,
+number of annotations, tiers and participants, stored as JSON or in a
+SQLite database. A manifest is partitioned into shards of about the
+same size, so that several machines can each process one shard:
+
+  manifest = pyannotation.manifest.Manifest()
+  manifest.scan(glob.glob("corpus/*.eaf"), pyannotation.data.EAF)
+  manifest.save("corpus.json")
+
+  # on node i of n
+  cr = pyannotation.corpusreader.GlossCorpusReader.fromManifest("corpus.json", shard = i, of = n)
+"""
+
+import os
+import re
+import json
+import heapq
+import sqlite3
+from xml.etree import ElementTree
+
+import pyannotation.data
+from pyannotation.compression import openAnnotationFile
+
+# the weights for partitioning
+WEIGHTS = ("size", "annotations")
+
+
+def scanEaf(filepath, entry):
+    from pyannotation.elan.data import EafPythonic
+    eaf = EafPythonic()
+    eaf.loadStreaming(filepath)
+    entry['annotations'] = len(eaf.alignableAnnotationsDict) + len(eaf.refAnnotationsDict)
+    entry['tiers'] = list(eaf.tierIds)
+    entry['participants'] = sorted(set(eaf.getParticipantForTier(idTier) for idTier in eaf.tierIds
+                                       if eaf.getParticipantForTier(idTier)))
+
+def scanToolbox(filepath, entry):
+    # every line with a marker is one annotation, the markers are the tiers
+    annotations = 0
+    markers = []
+    f = openAnnotationFile(filepath)
+    try:
+        for line in f:
+            match = re.match(br"^\\(\S+)", line)
+            if match:
+                annotations = annotations + 1
+                marker = match.group(1).decode("utf-8")
+                if marker not in markers:
+                    markers.append(marker)
+    finally:
+        f.close()
+    entry['annotations'] = annotations
+    entry['tiers'] = markers
+    entry['participants'] = []
+
+def scanKura(filepath, entry):
+    annotations = 0
+    f = openAnnotationFile(filepath)
+    try:
+        for event, element in ElementTree.iterparse(f):
+            if element.tag in ("phrase", "word", "morph"):
+                annotations = annotations + 1
+            element.clear()
+    finally:
+        f.close()
+    entry['annotations'] = annotations
+    entry['tiers'] = []
+    entry['participants'] = []
+
+SCANNERS = {
+    pyannotation.data.EAF : scanEaf,
+    pyannotation.data.EAFFROMTOOLBOX : scanEaf,
+    pyannotation.data.TOOLBOX : scanToolbox,
+    pyannotation.data.KURA : scanKura
+}
+
+def scanFile(filepath, filetype):
+    """Returns the manifest entry of a file as dict."""
+    entry = {
+        'path' : filepath,
+        'filetype' : filetype,
+        'size' : os.path.getsize(filepath),
+        'annotations' : 0,
+        'tiers' : [],
+        'participants' : []
+    }
+    SCANNERS[filetype](filepath, entry)
+    return entry
+
+
+class Manifest(object):
+    """
+    A list of manifest entries. Each entry is a dict with the path, file
+    type, size in bytes, number of annotations, tier ids and participants
+    of one file.
+    """
+
+    def __init__(self, entries = None):
+        self.entries = list(entries or [])
+
+    def scan(self, filepaths, filetype):
+        """Scans the files and adds their entries."""
+        for filepath in filepaths:
+            self.entries.append(scanFile(filepath, filetype))
+
+    def totalSize(self, weight = "size"):
+        return sum(entry[weight] for entry in self.entries)
+
+    def partition(self, n, weight = "size"):
+        """Splits the entries into n shards with about the same sum of the
+        weight ("size" or "annotations"). The largest files are assigned
+        first, each to the shard with the smallest sum so far. The result
+        only depends on the entries, so every node computes the same
+        shards."""
+        if weight not in WEIGHTS:
+            raise ValueError("unknown weight: %s" % weight)
+        shards = [ [] for i in range(n) ]
+        heap = [ (0, i) for i in range(n) ]
+        for entry in sorted(self.entries, key = lambda e: (-e[weight], e['path'])):
+            total, i = heapq.heappop(heap)
+            shards[i].append(entry)
+            heapq.heappush(heap, (total + entry[weight], i))
+        for shard in shards:
+            shard.sort(key = lambda e: e['path'])
+        return shards
+
+    def shard(self, i, n, weight = "size"):
+        """Returns the entries of shard i of n."""
+        if i < 0 or i >= n:
+            raise ValueError("shard %i does not exist in %i shards" % (i, n))
+        return self.partition(n, weight)[i]
+
+    def save(self, path):
+        """Saves the manifest as SQLite database if path ends with
+        ".sqlite" or ".db", as JSON otherwise."""
+        if isSQLitePath(path):
+            self.saveSQLite(path)
+        else:
+            f = open(path, "w")
+            json.dump({ 'entries' : self.entries }, f, indent = 1, sort_keys = True)
+            f.close()
+
+    def saveSQLite(self, path):
+        db = sqlite3.connect(path)
+        try:
+            db.execute("DROP TABLE IF EXISTS files")
+            db.execute("CREATE TABLE files (path TEXT PRIMARY KEY, filetype INTEGER, size INTEGER, "
+                       "annotations INTEGER, tiers TEXT, participants TEXT)")
+            db.executemany("INSERT INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                [ (e['path'], e['filetype'], e['size'], e['annotations'],
+                   json.dumps(e['tiers']), json.dumps(e['participants'])) for e in self.entries ])
+            db.commit()
+        finally:
+            db.close()
+
+    @classmethod
+    def load(cls, path):
+        """Loads a manifest saved with save()."""
+        if isSQLitePath(path):
+            db = sqlite3.connect(path)
+            try:
+                rows = db.execute("SELECT path, filetype, size, annotations, tiers, participants "
+                                  "FROM files ORDER BY path").fetchall()
+            finally:
+                db.close()
+            return cls([ { 'path' : r[0], 'filetype' : r[1], 'size' : r[2], 'annotations' : r[3],
+                           'tiers' : json.loads(r[4]), 'participants' : json.loads(r[5]) }
+                         for r in rows ])
+        f = open(path)
+        data = json.load(f)
+        f.close()
+        return cls(data['entries'])
+
+
+def isSQLitePath(path):
+    return os.path.splitext(path)[1] in (".sqlite", ".db")
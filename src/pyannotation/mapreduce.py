@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+# (C) 2011 copyright by Peter Bouda
+"""
+Map-reduce statistics over corpus files with worker processes.
+
+The files are split into shards. Every worker process reads the files
+of one shard with its own corpus reader and maps each utterance into a
+partial result, normally a Counter or a dict of Counters. The partial
+results of the shards are merged in the reduce step, so the trees of
+the whole corpus are never held by one process:
+
+  job = pyannotation.mapreduce.TypeTokenJob("morpheme")
+  result = pyannotation.mapreduce.mapReduce(job, files, pyannotation.data.EAF, processes = 4)
+  print(result['types'], result['tokens'])
+
+Own statistics are computed with a FunctionJob and a map function that
+gets an utterance and returns the keys to count, or with a subclass of
+MapReduceJob. Jobs and map functions are sent to the workers with
+pickle, so they must be defined at module level.
+"""
+
+import multiprocessing
+from collections import Counter
+
+import pyannotation.corpusreader
+
+
+def mergeCounts(result, partial):
+    """Adds partial to result and returns result. Counters and numbers
+    are added, dicts are merged key by key."""
+    if result == None:
+        return partial
+    if partial == None:
+        return result
+    if isinstance(result, Counter):
+        result.update(partial)
+        return result
+    if isinstance(result, dict):
+        for key, value in partial.items():
+            result[key] = mergeCounts(result.get(key), value)
+        return result
+    return result + partial
+
+
+class MapReduceJob(object):
+    """
+    The base class of all jobs. mapUtterance() is called for every
+    utterance of the corpus that passes the locale and participant
+    filters of the reader, merge() merges two partial results and
+    finalize() turns the merged result into the result of the job.
+    The utterances are read with a reader of class readerClass.
+    """
+
+    readerClass = pyannotation.corpusreader.GlossCorpusReader
+
+    def emptyResult(self):
+        return Counter()
+
+    def mapUtterance(self, utterance, result):
+        pass
+
+    def mapTree(self, reader, filepath, tree, result):
+        for utterance in reader.filteredUtterances(tree):
+            self.mapUtterance(utterance, result)
+        return result
+
+    def merge(self, result, partial):
+        return mergeCounts(result, partial)
+
+    def finalize(self, result):
+        return result
+
+
+class TypeTokenJob(MapReduceJob):
+    """
+    Counts the words, morphemes, glosses or (morpheme, gloss) pairs of
+    the corpus. The result is a dict with the number of types and tokens
+    and the Counter of the types.
+    """
+
+    LEVELS = ("word", "morpheme", "gloss", "morphemeGloss")
+
+    def __init__(self, level = "word"):
+        if level not in self.LEVELS:
+            raise ValueError("unknown level: %s" % level)
+        self.level = level
+
+    def mapUtterance(self, utterance, result):
+        for word in utterance[2]:
+            if self.level == "word":
+                if word[1] != '':
+                    result[word[1]] += 1
+                continue
+            for morpheme in word[2]:
+                if self.level == "morpheme":
+                    if morpheme[1] != '':
+                        result[morpheme[1]] += 1
+                    continue
+                for gloss in morpheme[2]:
+                    if gloss[1] == '':
+                        continue
+                    if self.level == "gloss":
+                        result[gloss[1]] += 1
+                    else:
+                        result[(morpheme[1], gloss[1])] += 1
+
+    def finalize(self, result):
+        return {
+            'types' : len(result),
+            'tokens' : sum(result.values()),
+            'counts' : result
+        }
+
+
+class GlossInventoryJob(MapReduceJob):
+    """
+    Collects the inventory of glosses: a dict with the Counter of the
+    glosses and, for each gloss, the Counter of the morphemes that have
+    this gloss.
+    """
+
+    def emptyResult(self):
+        return { 'glosses' : Counter(), 'morphemes' : {} }
+
+    def mapUtterance(self, utterance, result):
+        for word in utterance[2]:
+            for morpheme in word[2]:
+                for gloss in morpheme[2]:
+                    if gloss[1] == '':
+                        continue
+                    result['glosses'][gloss[1]] += 1
+                    result['morphemes'].setdefault(gloss[1], Counter())[morpheme[1]] += 1
+
+
+class PosDistributionJob(MapReduceJob):
+    """
+    Counts the parts of speech for each participant. The result is a
+    dict: participant -> Counter of the parts of speech.
+    """
+
+    readerClass = pyannotation.corpusreader.PosCorpusReader
+
+    def emptyResult(self):
+        return {}
+
+    def mapUtterance(self, utterance, result):
+        counter = result.setdefault(utterance[5], Counter())
+        for word in utterance[2]:
+            for (id, pos) in word[2]:
+                if pos != '':
+                    counter[pos] += 1
+
+
+class FunctionJob(MapReduceJob):
+    """
+    A job for user defined statistics: mapFunction gets an utterance and
+    returns an iterable of keys or a dict key -> count, which are added
+    to a Counter. finalizeFunction, if given, gets the merged Counter.
+    """
+
+    def __init__(self, mapFunction, finalizeFunction = None, readerClass = None):
+        self.mapFunction = mapFunction
+        self.finalizeFunction = finalizeFunction
+        if readerClass != None:
+            self.readerClass = readerClass
+
+    def mapUtterance(self, utterance, result):
+        result.update(self.mapFunction(utterance))
+
+    def finalize(self, result):
+        if self.finalizeFunction != None:
+            return self.finalizeFunction(result)
+        return result
+
+
+def shards(filepaths, count):
+    """Splits the files into count shards of about the same size."""
+    count = max(1, min(count, len(filepaths)))
+    return [ filepaths[i::count] for i in range(count) ]
+
+def mapShard(args):
+    """Maps the files of one shard; runs in the worker processes."""
+    job, filetype, filepaths, readerArgs, backend = args
+    reader = job.readerClass(**readerArgs)
+    result = job.emptyResult()
+    for filepath in filepaths:
+        tree = reader.createAnnotationTree(filepath, filetype, backend = backend)
+        if tree != None:
+            result = job.mapTree(reader, filepath, tree, result)
+    return result
+
+def mapReduce(job, filepaths, filetype, processes = None, shardsPerProcess = 4, backend = None, **readerArgs):
+    """
+    Runs the job over the files and returns its result.
+    processes: the number of worker processes, by default the number of
+        CPUs. With processes = 1 everything runs in this process.
+    shardsPerProcess: the files are split into processes * shardsPerProcess
+        shards, so that the workers get new work while others are busy.
+    backend: the backend for .eaf files, see CorpusReader.addFile().
+    The other keyword arguments, for example locale or participant, are
+    passed to the constructor of the reader class of the job.
+    """
+    filepaths = list(filepaths)
+    if processes == None:
+        processes = multiprocessing.cpu_count()
+    tasks = [ (job, filetype, shard, readerArgs, backend)
+             for shard in shards(filepaths, processes * shardsPerProcess) ]
+    result = job.emptyResult()
+    if processes == 1 or len(tasks) <= 1:
+        for task in tasks:
+            result = job.merge(result, mapShard(task))
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            for partial in pool.imap_unordered(mapShard, tasks):
+                result = job.merge(result, partial)
+        finally:
+            pool.close()
+            pool.join()
+    return job.finalize(result)
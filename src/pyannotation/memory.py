@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+# (C) 2011 copyright by Peter Bouda
+"""
+Reports how much memory the files of a CorpusReader retain.
+
+memoryReport() returns for every entry in CorpusReader.annotationtrees
+the size of the document held by the file object, of the indexes of
+Eaf, EafPythonic and the AnnotationTree, of the nested annotation tree
+and of the filter state, together with the totals of the corpus and
+the largest files. The Python objects are sized with deepsizeof(). The lxml document of
+Eaf lives in memory of libxml2 that neither sys.getsizeof() nor
+tracemalloc can see, so its size is estimated from the number of nodes
+and attributes and the length of the strings.
+
+addFileTraced() adds a file to a CorpusReader and measures the memory
+the Python allocator retains for it with tracemalloc snapshots, if the
+module tracemalloc is available. The result is included in the report.
+
+  cr = pyannotation.corpusreader.GlossCorpusReader()
+  pyannotation.memory.addFileTraced(cr, "corpus.eaf", pyannotation.data.EAF)
+  report = pyannotation.memory.memoryReport(cr, top = 5)
+"""
+
+import sys
+import types
+import weakref
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+# sizes of the libxml2 structs on 64 bit platforms: xmlNode, and
+# xmlAttr with the text node of its value
+LIBXML2_NODE_BYTES = 120
+LIBXML2_ATTRIBUTE_BYTES = 216
+
+# objects that are shared and not owned by a file
+SHARED_TYPES = (type, types.ModuleType, types.FunctionType, types.MethodType,
+                types.BuiltinFunctionType)
+
+# annotation tree -> bytes retained while it was added, see addFileTraced()
+tracedBytes = weakref.WeakKeyDictionary()
+
+
+def deepsizeof(obj, seen = None):
+    """Returns the size of obj and of all objects it contains in bytes.
+    Follows dicts, lists, tuples, sets, instance dicts and slots, every
+    object is counted only once."""
+    if seen == None:
+        seen = set()
+    if id(obj) in seen or isinstance(obj, SHARED_TYPES):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            size = size + deepsizeof(k, seen) + deepsizeof(v, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size = size + deepsizeof(item, seen)
+    if hasattr(obj, '__dict__'):
+        size = size + deepsizeof(obj.__dict__, seen)
+    for slot in getattr(type(obj), '__slots__', ()):
+        if hasattr(obj, slot):
+            size = size + deepsizeof(getattr(obj, slot), seen)
+    return size
+
+def lxmlDocumentSize(document):
+    """Returns the estimated size of an lxml document in libxml2 memory."""
+    size = 0
+    for element in document.iter():
+        size = size + LIBXML2_NODE_BYTES + len(element.attrib) * LIBXML2_ATTRIBUTE_BYTES
+        for value in element.attrib.values():
+            size = size + len(value) + 1
+        for text in (element.text, element.tail):
+            if text != None:
+                size = size + LIBXML2_NODE_BYTES + len(text.encode("utf-8")) + 1
+    return size
+
+def fileObjectSizes(fileObject):
+    """Returns the size of the document and of the indexes of an Eaf or
+    EafPythonic object as tuple."""
+    if fileObject == None:
+        return (0, 0)
+    if hasattr(fileObject, 'tree') and hasattr(fileObject.tree, 'getroot'):
+        # Eaf: the lxml document and the lazily built annotation index,
+        # which refers to elements of the document
+        document = lxmlDocumentSize(fileObject.tree.getroot())
+        indexes = deepsizeof(getattr(fileObject, 'annotationIndex', None))
+        return (document, indexes)
+    # EafPythonic: the dicts are the document, the rest are indexes
+    documentAttributes = ('tiersDict', 'linguistictypesDict', 'timeslotsDict',
+                          'alignableAnnotationsDict', 'refAnnotationsDict')
+    seen = set()
+    document = sum(deepsizeof(getattr(fileObject, a, None), seen) for a in documentAttributes)
+    indexes = deepsizeof(fileObject, seen)
+    return (document, indexes)
+
+def fileMemoryReport(filepath, annotationTree):
+    """Returns a dict with the sizes in bytes of one annotation tree and
+    the file it was read from."""
+    fileObject = getattr(annotationTree.builder, 'eaf', None)
+    document, indexes = fileObjectSizes(fileObject)
+    seen = set()
+    tree = deepsizeof(annotationTree.tree, seen)
+    # the id index of the tree refers to the lists of the tree, only its
+    # own dicts are counted
+    indexes = indexes + deepsizeof(getattr(annotationTree, 'index', None), seen)
+    filters = deepsizeof(annotationTree.filters, seen) + deepsizeof(annotationTree.filteredUtteranceIds, seen)
+    ret = {
+        'file' : filepath,
+        'document' : document,
+        'indexes' : indexes,
+        'tree' : tree,
+        'filters' : filters,
+        'total' : document + indexes + tree + filters,
+        'traced' : tracedBytes.get(annotationTree)
+    }
+    return ret
+
+def memoryReport(corpusReader, top = 10):
+    """Returns a dict with a report for every file of the corpus reader,
+    the totals of the corpus and the top files with the largest total."""
+    files = [ fileMemoryReport(filepath, tree) for (filepath, tree) in corpusReader.annotationtrees ]
+    totals = {}
+    for key in ('document', 'indexes', 'tree', 'filters', 'total'):
+        totals[key] = sum(f[key] for f in files)
+    traced = [ f['traced'] for f in files if f['traced'] != None ]
+    totals['traced'] = sum(traced) if len(traced) > 0 else None
+    return {
+        'files' : files,
+        'totals' : totals,
+        'top' : sorted(files, key = lambda f: f['total'], reverse = True)[:top]
+    }
+
+def addFileTraced(corpusReader, filepath, filetype, **kwargs):
+    """Adds a file to the corpus reader and returns the number of bytes
+    that the Python allocator retains afterwards, measured with two
+    tracemalloc snapshots. Returns None if tracemalloc is not available.
+    The memory of libxml2 is not included."""
+    if tracemalloc == None:
+        corpusReader.addFile(filepath, filetype, **kwargs)
+        return None
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        count = len(corpusReader.annotationtrees)
+        corpusReader.addFile(filepath, filetype, **kwargs)
+        after = tracemalloc.take_snapshot()
+    finally:
+        if started:
+            tracemalloc.stop()
+    retained = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    if len(corpusReader.annotationtrees) > count:
+        tracedBytes[corpusReader.annotationtrees[-1][1]] = retained
+    return retained
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+# (C) 2011 copyright by Peter Bouda
+"""
+Counting of word, morpheme and gloss n-grams in external memory, and
+collocation scores.
+
+An NgramCounter counts all n-grams of order 1 to maxN of the utterances
+it gets, n-grams never cross utterance boundaries. When more distinct
+n-grams than memoryBudget are held in memory they are written to disk as
+a sorted run and the memory is freed. The runs are merged when the
+counts are read, so the corpus may have many more distinct n-grams than
+fit in memory:
+
+  counter = pyannotation.ngrams.NgramCounter(maxN = 3, key = "gloss")
+  counter.addFiles(glob.glob("corpus/*.eaf"), pyannotation.data.EAF)
+  for ngram, count in counter.ngrams(2, minCount = 5):
+      ...
+  for ngram, count, pmi, loglikelihood in counter.collocations(2, minCount = 5):
+      ...
+  counter.close()
+
+The unigram counts, i.e. the vocabulary, are always kept in memory.
+"""
+
+import os
+import io
+import re
+import math
+import heapq
+import shutil
+import tempfile
+from collections import Counter
+
+import pyannotation.corpusreader
+from pyannotation.concordance import TOKENIZERS
+
+# separates the tokens of an n-gram in the keys and run files
+SEPARATOR = u"\x1f"
+
+# the maximal number of runs merged at once
+MAX_OPEN_RUNS = 64
+
+
+# control characters sort before the separator, so they are removed
+# from the tokens to keep each n-gram next to its extensions in the runs
+CONTROL_CHARACTERS = re.compile(u"[\x00-\x1f]")
+
+def cleanToken(token):
+    return CONTROL_CHARACTERS.sub(u" ", token)
+
+def readRun(path):
+    """Yields the (key, count) tuples of a run file."""
+    f = io.open(path, "r", encoding = "utf-8")
+    try:
+        for line in f:
+            key, count = line.rstrip(u"\n").rsplit(u"\t", 1)
+            yield key, int(count)
+    finally:
+        f.close()
+
+def writeRun(path, items):
+    """Writes the sorted (key, count) tuples to a run file."""
+    f = io.open(path, "w", encoding = "utf-8")
+    try:
+        for key, count in items:
+            f.write(u"%s\t%i\n" % (key, count))
+    finally:
+        f.close()
+
+def mergeItems(iterables):
+    """Merges sorted iterables of (key, count) tuples and adds the counts
+    of equal keys."""
+    lastKey = None
+    lastCount = 0
+    for key, count in heapq.merge(*iterables):
+        if key == lastKey:
+            lastCount = lastCount + count
+        else:
+            if lastKey != None:
+                yield lastKey, lastCount
+            lastKey = key
+            lastCount = count
+    if lastKey != None:
+        yield lastKey, lastCount
+
+def logLikelihood(o11, c1, c2, n):
+    """Dunning's log-likelihood ratio G2 of a 2x2 contingency table with
+    the joint count o11, the marginal counts c1 and c2 and the total n."""
+    observed = [ o11, c1 - o11, c2 - o11, n - c1 - c2 + o11 ]
+    expected = [ float(c1) * c2 / n, float(c1) * (n - c2) / n,
+                 float(n - c1) * c2 / n, float(n - c1) * (n - c2) / n ]
+    g2 = 0.0
+    for o, e in zip(observed, expected):
+        if o > 0 and e > 0:
+            g2 = g2 + o * math.log(o / e)
+    return 2.0 * g2
+
+
+class NgramCounter(object):
+    """
+    Counts the n-grams of token sequences with a bounded number of
+    n-grams in memory.
+    maxN: the highest order of the n-grams.
+    key: "word", "morpheme" or "gloss", the tokens taken from the
+        utterances of corpus readers.
+    memoryBudget: the maximal number of distinct n-grams in memory
+        before they are written to a run on disk.
+    directory: the directory for the runs, by default a new temporary
+        directory that is removed by close().
+    """
+
+    def __init__(self, maxN = 3, key = "word", memoryBudget = 1000000, directory = None):
+        if key not in TOKENIZERS:
+            raise ValueError("unknown key: %s" % key)
+        self.maxN = maxN
+        self.key = key
+        self.memoryBudget = memoryBudget
+        self.ownDirectory = directory == None
+        if self.ownDirectory:
+            directory = tempfile.mkdtemp(prefix = "pyannotation-ngrams-")
+        self.directory = directory
+        self.counts = {}
+        self.unigrams = Counter()
+        # order -> number of n-grams of that order in the corpus
+        self.totals = Counter()
+        self.runs = []
+        self.merged = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def close(self):
+        """Removes the runs from disk."""
+        for path in self.runs:
+            if os.path.exists(path):
+                os.remove(path)
+        self.runs = []
+        self.merged = None
+        if self.ownDirectory and os.path.exists(self.directory):
+            shutil.rmtree(self.directory)
+
+    def addSequence(self, tokens):
+        """Counts the n-grams of one sequence of tokens."""
+        tokens = [ cleanToken(t) for t in tokens ]
+        self.unigrams.update(tokens)
+        counts = self.counts
+        for i in range(len(tokens)):
+            key = tokens[i]
+            for n in range(2, self.maxN + 1):
+                if i + n > len(tokens):
+                    break
+                key = key + SEPARATOR + tokens[i + n - 1]
+                counts[key] = counts.get(key, 0) + 1
+        for n in range(1, self.maxN + 1):
+            self.totals[n] += max(0, len(tokens) - n + 1)
+        self.merged = None
+        if len(counts) > self.memoryBudget:
+            self.spill()
+
+    def addUtterance(self, utterance):
+        self.addSequence(TOKENIZERS[self.key](utterance))
+
+    def addReader(self, reader):
+        """Counts the utterances of the corpus reader that pass its locale
+        and participant filters."""
+        for (filepath, tree) in reader.annotationtrees:
+            self.addTree(reader, tree)
+
+    def addTree(self, reader, tree):
+        for utterance in reader.filteredUtterances(tree):
+            self.addUtterance(utterance)
+
+    def addFiles(self, filepaths, filetype, readerClass = None, backend = None, **readerArgs):
+        """Reads the files one after the other and counts their
+        utterances, without keeping the trees. The other keyword
+        arguments are passed to the constructor of the reader, a
+        GlossCorpusReader by default."""
+        if readerClass == None:
+            readerClass = pyannotation.corpusreader.GlossCorpusReader
+        reader = readerClass(**readerArgs)
+        for filepath in filepaths:
+            tree = reader.createAnnotationTree(filepath, filetype, backend = backend)
+            if tree != None:
+                self.addTree(reader, tree)
+
+    def spill(self):
+        """Writes the n-grams in memory to a sorted run on disk."""
+        if len(self.counts) == 0:
+            return
+        path = os.path.join(self.directory, "run-%i.txt" % len(self.runs))
+        while os.path.exists(path):
+            path = path + "_"
+        writeRun(path, sorted(self.counts.items()))
+        self.runs.append(path)
+        self.counts = {}
+
+    def merge(self):
+        """Merges all runs into one and returns its path."""
+        if self.merged != None:
+            return self.merged
+        self.spill()
+        # merge in several passes if there are too many runs to open
+        while len(self.runs) > MAX_OPEN_RUNS:
+            runs = self.runs[:MAX_OPEN_RUNS]
+            path = runs[-1] + "m"
+            writeRun(path, mergeItems([ readRun(p) for p in runs ]))
+            for p in runs:
+                os.remove(p)
+            self.runs = self.runs[MAX_OPEN_RUNS:] + [ path ]
+        if len(self.runs) > 1:
+            path = self.runs[-1] + "m"
+            writeRun(path, mergeItems([ readRun(p) for p in self.runs ]))
+            for p in self.runs:
+                os.remove(p)
+            self.runs = [ path ]
+        if len(self.runs) == 1:
+            self.merged = self.runs[0]
+        return self.merged
+
+    def items(self):
+        """Yields the sorted (key, count) tuples of all n-grams of order 2
+        or higher."""
+        path = self.merge()
+        if path == None:
+            return iter([])
+        return readRun(path)
+
+    def ngrams(self, n, minCount = 1):
+        """Yields (n-gram, count) tuples for all n-grams of order n that
+        occur at least minCount times. The n-grams are tuples of tokens,
+        sorted by their tokens."""
+        if n < 1 or n > self.maxN:
+            raise ValueError("n must be between 1 and %i" % self.maxN)
+        if n == 1:
+            for token in sorted(self.unigrams):
+                if self.unigrams[token] >= minCount:
+                    yield (token,), self.unigrams[token]
+            return
+        for key, count in self.items():
+            if count >= minCount and key.count(SEPARATOR) == n - 1:
+                yield tuple(key.split(SEPARATOR)), count
+
+    def collocations(self, n = 2, minCount = 1):
+        """
+        Yields (n-gram, count, pmi, log-likelihood) tuples for the n-grams
+        of order n that occur at least minCount times. An n-gram is scored
+        as the collocation of its first n - 1 tokens with its last token:
+        pmi is the pointwise mutual information in bits, log-likelihood
+        Dunning's G2. The merged run is read once, the counts of the
+        prefixes come from the same pass because a prefix is sorted
+        directly before the n-grams that extend it.
+        """
+        if n < 2 or n > self.maxN:
+            raise ValueError("n must be between 2 and %i" % self.maxN)
+        total = self.totals[n]
+        # the last key and count of each order, i.e. the current prefixes
+        prefixes = {}
+        for key, count in self.items():
+            order = key.count(SEPARATOR) + 1
+            if order < n:
+                prefixes[order] = (key, count)
+                continue
+            if order > n or count < minCount:
+                continue
+            tokens = key.split(SEPARATOR)
+            if n == 2:
+                prefixCount = self.unigrams[tokens[0]]
+            else:
+                prefixKey, prefixCount = prefixes[n - 1]
+            suffixCount = self.unigrams[tokens[-1]]
+            pmi = math.log(float(count) * total / (prefixCount * suffixCount), 2)
+            yield tuple(tokens), count, pmi, logLikelihood(count, prefixCount, suffixCount, total)
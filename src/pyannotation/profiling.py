@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+# (C) 2011 copyright by Peter Bouda
+"""
+Opt-in counters and cumulative timers for the stages of loading and
+accessing a corpus: XML parsing, tier resolution, annotation lookups,
+tree building, filters and serialisation.
+
+The instrumentation is switched off by default and costs nothing then:
+enable() replaces the methods listed in INSTRUMENTED_METHODS with timed
+wrappers, disable() puts the original methods back.
+
+  import pyannotation, pyannotation.profiling
+  with pyannotation.profiling.measure() as m:
+      cr.addFile("corpus.eaf", pyannotation.data.EAF)
+  print(m.stats["Eaf.getAnnotationValueForAnnotation"])
+
+The times are cumulative, i.e. the time of a method includes the time of
+all instrumented methods it calls. pyannotation.stats() returns the
+counters collected since the last reset().
+"""
+
+import sys
+import timeit
+
+# stages
+(XML, TIERS, LOOKUP, TREE, FILTER, SERIALISATION) = ("xml", "tiers", "lookup", "tree", "filter", "serialisation")
+
+# module, class, method and stage of every instrumented method
+INSTRUMENTED_METHODS = [
+    ("pyannotation.corpusreader", "CorpusReader", "addFile", TREE),
+    ("pyannotation.data", "AnnotationTree", "parse", TREE),
+    ("pyannotation.data", "AnnotationTree", "appendFilter", FILTER),
+    ("pyannotation.data", "AnnotationTree", "resetFilters", FILTER),
+    ("pyannotation.data", "AnnotationTreeFilter", "utterancePassesFilter", FILTER),
+    ("pyannotation.elan.data", "Eaf", "__init__", XML),
+    ("pyannotation.elan.data", "EafPythonic", "load", XML),
+    ("pyannotation.elan.data", "EafPythonic", "loadStreaming", XML),
+    ("pyannotation.elan.data", "EafPythonic", "buildIndexes", XML),
+    ("pyannotation.elan.data", "EafAnnotationFileTierHandler", "getTierTree", TIERS),
+    ("pyannotation.elan.data", "EafAnnotationFileTierHandler", "getTierIdsForRole", TIERS),
+    ("pyannotation.elan.data", "Eaf", "getAnnotationIndex", LOOKUP),
+    ("pyannotation.elan.data", "Eaf", "getAnnotationValueForAnnotation", LOOKUP),
+    ("pyannotation.elan.data", "Eaf", "getSubAnnotationIdsForAnnotationInTier", LOOKUP),
+    ("pyannotation.elan.data", "Eaf", "getAlignableAnnotationIdsForTier", LOOKUP),
+    ("pyannotation.elan.data", "Eaf", "getRefAnnotationIdsForTier", LOOKUP),
+    ("pyannotation.elan.data", "Eaf", "getRefAnnotationIdForAnnotationId", LOOKUP),
+    ("pyannotation.elan.data", "EafPythonic", "getAnnotationValueForAnnotation", LOOKUP),
+    ("pyannotation.elan.data", "EafPythonic", "getSubAnnotationIdsForAnnotationInTier", LOOKUP),
+    ("pyannotation.elan.data", "EafPythonic", "getAlignableAnnotationIdsForTier", LOOKUP),
+    ("pyannotation.elan.data", "EafPythonic", "getRefAnnotationIdsForTier", LOOKUP),
+    ("pyannotation.elan.data", "EafPythonic", "getRefAnnotationIdForAnnotationId", LOOKUP),
+    ("pyannotation.elan.data", "EafAnnotationFileParser", "parse", TREE),
+    ("pyannotation.elan.data", "EafAnnotationFileParser", "getIlElementForWordId", TREE),
+    ("pyannotation.elan.data", "EafAnnotationFileParser", "getFuncElementForMorphemeId", TREE),
+    ("pyannotation.elan.data", "EafAnnotationFileParserPos", "getIlElementForWordId", TREE),
+    ("pyannotation.elan.data", "EafFromToolboxAnnotationFileParser", "parse", TREE),
+    ("pyannotation.toolbox.data", "ToolboxAnnotationFileParser", "parse", TREE),
+    ("pyannotation.elan.data", "EafAnnotationFileParser", "getAsEafXml", SERIALISATION),
+    ("pyannotation.elan.data", "Eaf", "tostring", SERIALISATION),
+    ("pyannotation.elan.data", "Eaf", "writeToFile", SERIALISATION),
+]
+
+# name -> [stage, calls, seconds]
+counters = {}
+
+# (class, method name) -> original function, while enabled
+originalMethods = {}
+
+
+def isEnabled():
+    return len(originalMethods) > 0
+
+def timedMethod(name, stage, function):
+    def timed(*args, **kwargs):
+        start = timeit.default_timer()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            counter = counters.get(name)
+            if counter == None:
+                counter = counters[name] = [stage, 0, 0.0]
+            counter[1] = counter[1] + 1
+            counter[2] = counter[2] + timeit.default_timer() - start
+    timed.__name__ = function.__name__
+    timed.__doc__ = function.__doc__
+    return timed
+
+def enable():
+    """Replaces the instrumented methods with timed wrappers."""
+    if isEnabled():
+        return
+    for moduleName, className, methodName, stage in INSTRUMENTED_METHODS:
+        __import__(moduleName)
+        cls = getattr(sys.modules[moduleName], className)
+        function = cls.__dict__[methodName]
+        originalMethods[(cls, methodName)] = function
+        setattr(cls, methodName, timedMethod("%s.%s" % (className, methodName), stage, function))
+
+def disable():
+    """Puts the original methods back."""
+    for (cls, methodName), function in originalMethods.items():
+        setattr(cls, methodName, function)
+    originalMethods.clear()
+
+def reset():
+    counters.clear()
+
+def stats():
+    """Returns a snapshot of the counters as dict: name of the method ->
+    dict with the stage, the number of calls and the cumulative seconds."""
+    ret = {}
+    for name, (stage, calls, seconds) in counters.items():
+        ret[name] = { 'stage' : stage, 'calls' : calls, 'seconds' : seconds }
+    return ret
+
+
+class measure(object):
+    """
+    Context manager that enables the instrumentation for the code in its
+    scope. Afterwards the attribute stats contains only the calls and
+    times of that scope, in the format of stats().
+    """
+
+    def __init__(self):
+        self.stats = {}
+        self.wasEnabled = False
+        self.before = {}
+
+    def __enter__(self):
+        self.wasEnabled = isEnabled()
+        self.before = stats()
+        enable()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        after = stats()
+        if not self.wasEnabled:
+            disable()
+        self.stats = {}
+        for name, counter in after.items():
+            before = self.before.get(name, { 'calls' : 0, 'seconds' : 0.0 })
+            if counter['calls'] > before['calls']:
+                self.stats[name] = {
+                    'stage' : counter['stage'],
+                    'calls' : counter['calls'] - before['calls'],
+                    'seconds' : counter['seconds'] - before['seconds']
+                }
+        return False
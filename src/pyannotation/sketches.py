@@ -0,0 +1,432 @@
+# -*- coding: utf-8 -*-
+# (C) 2011 copyright by Peter Bouda
+"""
+Probabilistic sketches for approximate corpus statistics.
+
+HyperLogLog estimates the number of distinct tokens, CountMinSketch the
+frequency of any token and SpaceSaving finds the most frequent tokens.
+All three use a fixed amount of memory and are mergeable: the sketch of
+two files is the merge of the sketches of each file. A CorpusSketch
+holds the three sketches for the words, morphemes and glosses of each
+locale:
+
+  sketch = pyannotation.sketches.sketchFiles(glob.glob("corpus/*.eaf"), pyannotation.data.EAF, processes = 4)
+  sketch.distinct("morpheme", locale = "tr")
+  sketch.top("gloss", 20)
+  sketch.frequency("morpheme", "lar")
+
+sketchFiles() saves the sketch of each file next to the file, as
+"<file>.sketch.json", and only reads the files that changed since.
+"""
+
+import os
+import json
+import math
+import heapq
+import base64
+import struct
+import hashlib
+import multiprocessing
+from array import array
+
+import pyannotation.corpusreader
+from pyannotation.concordance import TOKENIZERS
+
+# the extension of the sketch files saved next to the corpus files
+SKETCH_EXTENSION = ".sketch.json"
+
+MASK64 = (1 << 64) - 1
+
+
+def hash64(item):
+    """Returns a 64 bit hash of a string that is the same in every
+    process and Python version."""
+    if not isinstance(item, bytes):
+        item = item.encode("utf-8")
+    return struct.unpack(">Q", hashlib.md5(item).digest()[:8])[0]
+
+
+class HyperLogLog(object):
+    """
+    Estimates the number of distinct items with 2^precision registers of
+    one byte. The standard error is about 1.04 / sqrt(2^precision), 0.8%
+    for the default precision of 14.
+    """
+
+    def __init__(self, precision = 14):
+        if precision < 4 or precision > 18:
+            raise ValueError("precision must be between 4 and 18")
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, item):
+        self.addHash(hash64(item))
+
+    def addHash(self, h):
+        index = h >> (64 - self.precision)
+        w = (h << self.precision) & MASK64
+        if w == 0:
+            rank = 64 - self.precision + 1
+        else:
+            rank = 64 - w.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1.0 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(b"\x00")
+        if estimate <= 2.5 * m and zeros > 0:
+            # linear counting for small cardinalities
+            estimate = m * math.log(float(m) / zeros)
+        return int(round(estimate))
+
+    def merge(self, other):
+        """Adds the items of the other sketch to this one."""
+        if other.precision != self.precision:
+            raise ValueError("cannot merge sketches with different precision")
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+        return self
+
+    def toDict(self):
+        return { 'precision' : self.precision,
+                 'registers' : base64.b64encode(bytes(self.registers)).decode("ascii") }
+
+    @classmethod
+    def fromDict(cls, data):
+        sketch = cls(data['precision'])
+        sketch.registers = bytearray(base64.b64decode(data['registers']))
+        return sketch
+
+
+class CountMinSketch(object):
+    """
+    Estimates the frequency of items in width * depth counters. The
+    estimate is never too small; it is too large by at most 2.7 / width
+    of the total count with probability 1 - e^-depth.
+    """
+
+    def __init__(self, width = 2048, depth = 5):
+        self.width = width
+        self.depth = depth
+        self.total = 0
+        self.rows = [ array('l', [0]) * width for i in range(depth) ]
+
+    def columns(self, h):
+        # double hashing: depth columns from the two halves of the hash
+        h1 = h & 0xffffffff
+        h2 = h >> 32
+        return [ (h1 + i * h2) % self.width for i in range(self.depth) ]
+
+    def add(self, item, count = 1):
+        self.addHash(hash64(item), count)
+
+    def addHash(self, h, count = 1):
+        self.total = self.total + count
+        for row, column in zip(self.rows, self.columns(h)):
+            row[column] += count
+
+    def estimate(self, item):
+        return min(row[column] for row, column in zip(self.rows, self.columns(hash64(item))))
+
+    def merge(self, other):
+        if other.width != self.width or other.depth != self.depth:
+            raise ValueError("cannot merge sketches with different dimensions")
+        self.total = self.total + other.total
+        for row, otherRow in zip(self.rows, other.rows):
+            for i in range(self.width):
+                row[i] += otherRow[i]
+        return self
+
+    def toDict(self):
+        return { 'width' : self.width, 'depth' : self.depth, 'total' : self.total,
+                 'rows' : [ row.tolist() for row in self.rows ] }
+
+    @classmethod
+    def fromDict(cls, data):
+        sketch = cls(data['width'], data['depth'])
+        sketch.total = data['total']
+        sketch.rows = [ array('l', row) for row in data['rows'] ]
+        return sketch
+
+
+class SpaceSaving(object):
+    """
+    Keeps the capacity most frequent items of a stream. Each item has a
+    count, which may be too large by at most its error. Every item that
+    occurs more often than total / capacity is kept.
+    """
+
+    def __init__(self, capacity = 100):
+        self.capacity = capacity
+        # item -> [count, error]
+        self.counters = {}
+        # (count, item) entries, some of them outdated, to find the
+        # item with the smallest count
+        self.heap = []
+
+    def add(self, item, count = 1):
+        if item in self.counters:
+            self.counters[item][0] += count
+        elif len(self.counters) < self.capacity:
+            self.counters[item] = [count, 0]
+        else:
+            # replace the item with the smallest count
+            minimum, minItem = self.popMinimum()
+            del self.counters[minItem]
+            self.counters[item] = [minimum + count, minimum]
+        heapq.heappush(self.heap, (self.counters[item][0], item))
+        if len(self.heap) > 4 * self.capacity:
+            self.heap = [ (c[0], i) for i, c in self.counters.items() ]
+            heapq.heapify(self.heap)
+
+    def popMinimum(self):
+        while True:
+            count, item = heapq.heappop(self.heap)
+            if item in self.counters and self.counters[item][0] == count:
+                return count, item
+
+    def minimum(self):
+        if len(self.counters) < self.capacity:
+            return 0
+        return min(c[0] for c in self.counters.values())
+
+    def top(self, n = None):
+        """Returns the (item, count, error) tuples of the n most frequent
+        items."""
+        items = sorted(self.counters.items(), key = lambda i: (-i[1][0], i[0]))
+        return [ (item, c[0], c[1]) for item, c in items[:n] ]
+
+    def merge(self, other):
+        """Merges the summaries: items missing in one summary are counted
+        with its smallest count, then the largest counts are kept."""
+        minimum = self.minimum()
+        otherMinimum = other.minimum()
+        counters = {}
+        for item in set(self.counters) | set(other.counters):
+            count, error = self.counters.get(item, [minimum, minimum])
+            otherCount, otherError = other.counters.get(item, [otherMinimum, otherMinimum])
+            counters[item] = [count + otherCount, error + otherError]
+        items = sorted(counters.items(), key = lambda i: (-i[1][0], i[0]))[:self.capacity]
+        self.counters = dict(items)
+        self.heap = [ (c[0], i) for i, c in self.counters.items() ]
+        heapq.heapify(self.heap)
+        return self
+
+    def toDict(self):
+        return { 'capacity' : self.capacity,
+                 'counters' : [ [item, c[0], c[1]] for item, c in self.counters.items() ] }
+
+    @classmethod
+    def fromDict(cls, data):
+        sketch = cls(data['capacity'])
+        sketch.counters = dict((item, [count, error]) for item, count, error in data['counters'])
+        sketch.heap = [ (c[0], i) for i, c in sketch.counters.items() ]
+        heapq.heapify(sketch.heap)
+        return sketch
+
+
+class TokenSketch(object):
+    """The HyperLogLog, Count-Min and Space-Saving sketch of one stream
+    of tokens."""
+
+    def __init__(self, precision = 14, width = 2048, depth = 5, capacity = 100):
+        self.hyperLogLog = HyperLogLog(precision)
+        self.countMin = CountMinSketch(width, depth)
+        self.spaceSaving = SpaceSaving(capacity)
+
+    def add(self, token):
+        h = hash64(token)
+        self.hyperLogLog.addHash(h)
+        self.countMin.addHash(h)
+        self.spaceSaving.add(token)
+
+    def merge(self, other):
+        self.hyperLogLog.merge(other.hyperLogLog)
+        self.countMin.merge(other.countMin)
+        self.spaceSaving.merge(other.spaceSaving)
+        return self
+
+    def toDict(self):
+        return { 'hyperLogLog' : self.hyperLogLog.toDict(),
+                 'countMin' : self.countMin.toDict(),
+                 'spaceSaving' : self.spaceSaving.toDict() }
+
+    @classmethod
+    def fromDict(cls, data):
+        sketch = cls.__new__(cls)
+        sketch.hyperLogLog = HyperLogLog.fromDict(data['hyperLogLog'])
+        sketch.countMin = CountMinSketch.fromDict(data['countMin'])
+        sketch.spaceSaving = SpaceSaving.fromDict(data['spaceSaving'])
+        return sketch
+
+
+class CorpusSketch(object):
+    """
+    The token sketches of the words, morphemes and glosses of a corpus,
+    one for each locale. The parameters are passed to the TokenSketches.
+    """
+
+    def __init__(self, precision = 14, width = 2048, depth = 5, capacity = 100):
+        self.parameters = { 'precision' : precision, 'width' : width,
+                            'depth' : depth, 'capacity' : capacity }
+        # key -> locale -> TokenSketch
+        self.sketches = dict((key, {}) for key in TOKENIZERS)
+
+    def sketchFor(self, key, locale):
+        if locale not in self.sketches[key]:
+            self.sketches[key][locale] = TokenSketch(**self.parameters)
+        return self.sketches[key][locale]
+
+    def addUtterance(self, utterance):
+        for key, tokenize in TOKENIZERS.items():
+            sketch = self.sketchFor(key, utterance[4])
+            for token in tokenize(utterance):
+                sketch.add(token)
+
+    def addTree(self, reader, tree):
+        for utterance in reader.filteredUtterances(tree):
+            self.addUtterance(utterance)
+
+    def addReader(self, reader):
+        for (filepath, tree) in reader.annotationtrees:
+            self.addTree(reader, tree)
+
+    def merge(self, other):
+        for key in other.sketches:
+            for locale, sketch in other.sketches[key].items():
+                if locale in self.sketches[key]:
+                    self.sketches[key][locale].merge(sketch)
+                else:
+                    self.sketches[key][locale] = TokenSketch.fromDict(sketch.toDict())
+        return self
+
+    def locales(self):
+        return sorted(set(locale for key in self.sketches for locale in self.sketches[key]))
+
+    def merged(self, key, locale = None):
+        """Returns the TokenSketch of the key for the locale, or of all
+        locales if locale is None."""
+        if locale != None:
+            return self.sketchFor(key, locale)
+        sketch = TokenSketch(**self.parameters)
+        for s in self.sketches[key].values():
+            sketch.merge(s)
+        return sketch
+
+    def distinct(self, key, locale = None):
+        """Estimates the number of distinct words, morphemes or glosses."""
+        return self.merged(key, locale).hyperLogLog.count()
+
+    def top(self, key, n = 10, locale = None):
+        """Returns (token, count, error) tuples of the most frequent
+        tokens."""
+        return self.merged(key, locale).spaceSaving.top(n)
+
+    def frequency(self, key, token, locale = None):
+        """Estimates how often the token occurs, never too low."""
+        return self.merged(key, locale).countMin.estimate(token)
+
+    def total(self, key, locale = None):
+        return self.merged(key, locale).countMin.total
+
+    def toDict(self):
+        return { 'parameters' : self.parameters,
+                 'sketches' : dict((key, [ [locale, s.toDict()] for locale, s in self.sketches[key].items() ])
+                                   for key in self.sketches) }
+
+    @classmethod
+    def fromDict(cls, data):
+        sketch = cls(**data['parameters'])
+        for key, sketches in data['sketches'].items():
+            for locale, s in sketches:
+                sketch.sketches[key][locale] = TokenSketch.fromDict(s)
+        return sketch
+
+    def save(self, path, source = None):
+        """Saves the sketch as JSON; source describes how the sketch was
+        created, see isSketchCurrent()."""
+        data = self.toDict()
+        if source != None:
+            data['source'] = source
+        f = open(path, "w")
+        json.dump(data, f)
+        f.close()
+
+    @classmethod
+    def load(cls, path):
+        f = open(path)
+        data = json.load(f)
+        f.close()
+        return cls.fromDict(data)
+
+
+def sketchPath(filepath):
+    return filepath + SKETCH_EXTENSION
+
+def sketchSource(readerArgs, backend):
+    """Returns the reader arguments and the backend a sketch was created
+    with, in the form they have after saving as JSON."""
+    return json.loads(json.dumps({ 'readerArgs' : readerArgs, 'backend' : backend }))
+
+def isSketchCurrent(filepath, sketchParameters, source = None):
+    """True if the sketch file of the file is newer than the file and
+    was created with the same parameters and from the same source, the
+    reader arguments (locale, participant) and the backend, see
+    sketchSource()."""
+    path = sketchPath(filepath)
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(filepath):
+        return False
+    f = open(path)
+    data = json.load(f)
+    f.close()
+    return data['parameters'] == sketchParameters and data.get('source') == source
+
+def sketchFile(args):
+    """Creates and saves the sketch of one file; runs in the worker
+    processes."""
+    filepath, filetype, parameters, readerArgs, backend, save = args
+    reader = pyannotation.corpusreader.GlossCorpusReader(**readerArgs)
+    sketch = CorpusSketch(**parameters)
+    tree = reader.createAnnotationTree(filepath, filetype, backend = backend)
+    if tree != None:
+        sketch.addTree(reader, tree)
+    if save:
+        sketch.save(sketchPath(filepath), sketchSource(readerArgs, backend))
+    return sketch.toDict()
+
+def sketchFiles(filepaths, filetype, processes = None, cache = True, backend = None,
+                precision = 14, width = 2048, depth = 5, capacity = 100, **readerArgs):
+    """
+    Returns the merged CorpusSketch of the files.
+    processes: the number of worker processes, by default the number of
+        CPUs.
+    cache: if True, the sketch of each file is saved next to the file
+        and read from there as long as the file, the parameters, the
+        backend and the reader arguments do not change.
+    The other keyword arguments are passed to the GlossCorpusReader.
+    """
+    parameters = { 'precision' : precision, 'width' : width, 'depth' : depth, 'capacity' : capacity }
+    source = sketchSource(readerArgs, backend)
+    sketch = CorpusSketch(**parameters)
+    tasks = []
+    for filepath in filepaths:
+        if cache and isSketchCurrent(filepath, parameters, source):
+            sketch.merge(CorpusSketch.load(sketchPath(filepath)))
+        else:
+            tasks.append((filepath, filetype, parameters, readerArgs, backend, cache))
+    if processes == None:
+        processes = multiprocessing.cpu_count()
+    if processes == 1 or len(tasks) <= 1:
+        for task in tasks:
+            sketch.merge(CorpusSketch.fromDict(sketchFile(task)))
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            for data in pool.imap_unordered(sketchFile, tasks):
+                sketch.merge(CorpusSketch.fromDict(data))
+        finally:
+            pool.close()
+            pool.join()
+    return sketch
@@ -14,6 +14,7 @@ http://nltk.googlecode.com/svn/trunk/doc/howto/corpus.html
 
 import re
 import pyannotation.data
+from pyannotation.compression import openAnnotationFile
 
 ############################ Builders
 
@@ -47,16 +48,23 @@ class ToolboxAnnotationFileParser(pyannotation.data.AnnotationFileParser):
         #self.parse(file, wordSep, morphemeSep, glossSep)
         #print self.tree
 
+    def readLines(self):
+        """Yields the decoded lines of the file and closes it at the end."""
+        f = openAnnotationFile(self.annotationFileObject.getFilepath())
+        try:
+            for line in f:
+                yield line.decode(self.annotationFileObject.encoding)
+        finally:
+            f.close()
+
     def parse(self):
-        f = open(self.annotationFileObject.getFilepath(), 'r')
         strInRef = ""
         strText = ""
         strMorph = ""
         strGloss = ""
         strTrans = ""
         tree = []    
-        for line in f:
-            line = unicode(line, self.annotationFileObject.encoding)
+        for line in self.readLines():
             if re.search(r"^\\ref ", line):
                 # new ref starts, so process data
                 if strInRef != "":
@@ -71,21 +79,10 @@ class ToolboxAnnotationFileParser(pyannotation.data.AnnotationFileParser):
                     strText = re.sub(r"\r\n", " ", strText)
                     strMorph = re.sub(r"\r\n", " ", strMorph)
                     strGloss = re.sub(r"\r\n", " ", strGloss)
-                    arrTextWords = re.split(self.WORD_BOUNDARY_PARSE, strText)
-                    arrTextWords = filter(lambda i: i != '', arrTextWords)
-                    arrMorphWords = re.split(self.WORD_BOUNDARY_PARSE, strMorph)
-                    arrMorphWords = filter(lambda i: i != '', arrMorphWords)
-                    arrGlossWords = re.split(self.WORD_BOUNDARY_PARSE, strGloss)
-                    arrGlossWords = filter(lambda i: i != '', arrGlossWords)
-                    ilElements = []
-                    for i,word in enumerate(arrTextWords):
-                        morphemes = ""
-                        glosses = ""
-                        if i < len(arrMorphWords):
-                            morphemes = arrMorphWords[i]
-                        if i < len(arrGlossWords):
-                            glosses = arrGlossWords[i]
-                        ilElements.append(self.ilElementForString("%s %s %s" % (word, morphemes, glosses)))
+                    arrTextWords = [ w for w in self.splitWords(strText) if w != '' ]
+                    arrMorphWords = [ w for w in self.splitWords(strMorph) if w != '' ]
+                    arrGlossWords = [ w for w in self.splitWords(strGloss) if w != '' ]
+                    ilElements = self.ilElementsForWords(arrTextWords, arrMorphWords, arrGlossWords)
                     if len(ilElements) == 0:
                         ilElements = [ ['', '',  [ ['', '',  [ ['',  ''] ] ] ] ] ]
                     tree.append([ strInRef,  strText,  ilElements, [["a%i" % self.useNextAnnotationId(), strTrans]], "", "", "" ])